@@ -0,0 +1,85 @@
+"""Compare the native overwrite engine against the old dd-based pass.
+
+Creates a sparse image (or uses an existing file / loop device) and writes it
+end to end with both methods, printing MB/s for each.
+
+    python benchmarks/bench_overwrite.py --size 4G
+    sudo python benchmarks/bench_overwrite.py --target /dev/loop0
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from usbzero import engine
+
+
+def parse_size(text):
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def make_image(size, directory=None):
+    fd, path = tempfile.mkstemp(prefix="usbzero_bench_", suffix=".img", dir=directory)
+    os.ftruncate(fd, size)
+    os.close(fd)
+    return path
+
+
+def bench_dd(target, size):
+    """Time the legacy dd pass, extended to cover the whole target."""
+    count = size // (1024 * 1024)
+    start = time.perf_counter()
+    subprocess.run(
+        ['dd', 'if=/dev/urandom', f'of={target}', 'bs=1M', f'count={count}',
+         'conv=fsync,notrunc'],
+        check=True, capture_output=True
+    )
+    seconds = time.perf_counter() - start
+    return count * 1024 * 1024, seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="2G", help="image size when no --target is given")
+    parser.add_argument("--target", help="existing file or loop device to overwrite")
+    parser.add_argument("--dir", help="directory for the temporary image")
+    parser.add_argument("--block-size", default="4M")
+    parser.add_argument("--depth", type=int, default=engine.PIPELINE_DEPTH,
+                        help="buffers in flight between generator and writer")
+    parser.add_argument("--direct", action="store_true", help="use O_DIRECT writes")
+    parser.add_argument("--skip-dd", action="store_true")
+    args = parser.parse_args(argv)
+
+    target = args.target or make_image(parse_size(args.size), args.dir)
+    try:
+        result = engine.write_pass(target, block_size=parse_size(args.block_size),
+                                   direct=args.direct, depth=args.depth)
+        mode = "direct" if result.direct else "buffered"
+        print(f"engine: {result.bytes_written / 1e6:.0f} MB in {result.seconds:.2f}s "
+              f"= {result.mb_per_s:.1f} MB/s ({mode})")
+        stats = result.stats
+        print(f"        waiting on generator {stats.writer_wait_seconds:.2f}s, "
+              f"waiting on device {stats.generator_wait_seconds:.2f}s "
+              f"({stats.bottleneck}-bound)")
+
+        if not args.skip_dd and shutil.which("dd"):
+            written, seconds = bench_dd(target, result.bytes_written)
+            print(f"dd:     {written / 1e6:.0f} MB in {seconds:.2f}s "
+                  f"= {written / seconds / 1e6:.1f} MB/s")
+    finally:
+        if not args.target:
+            os.remove(target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Microbenchmark of the random pattern sources.
+
+Fills the same reusable buffer repeatedly with os.urandom and with every
+available KeyedStream backend and prints the throughput of each.
+
+    python benchmarks/bench_rng.py --total 2G --block-size 4M
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from usbzero import rng
+from bench_overwrite import parse_size
+
+
+def urandom_fill(buf, offset):
+    buf[:] = os.urandom(len(buf))
+
+
+def measure(fill, total, block_size):
+    buf = memoryview(bytearray(block_size))
+    offset = 0
+    start = time.perf_counter()
+    while offset < total:
+        fill(buf, offset)
+        offset += block_size
+    return offset / (time.perf_counter() - start) / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", default="1G", help="bytes to generate per source")
+    parser.add_argument("--block-size", default="4M")
+    args = parser.parse_args(argv)
+    total = parse_size(args.total)
+    block_size = parse_size(args.block_size)
+
+    sources = [("os.urandom", urandom_fill)]
+    for backend in rng.available_backends():
+        sources.append((backend, rng.KeyedStream(backend=backend).fill))
+
+    baseline = None
+    for name, fill in sources:
+        mb_s = measure(fill, total, block_size)
+        baseline = baseline or mb_s
+        print(f"{name:<14} {mb_s:9.1f} MB/s  ({mb_s / baseline:.1f}x os.urandom)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Benchmark suite for the wipe path, with baseline comparison.
+
+Runs every wipe algorithm through wipe.run_passes() (the code path of the
+GUI and the CLI) on a sparse image, or on a loop device backed by one, and
+sweeps block size, buffer count, stripe count (1 is the sequential path),
+direct vs buffered I/O and rng backend.
+Each case runs in a child process so its CPU time and peak RSS are its own.
+Results (MB/s, CPU%, peak RSS and per-pass seconds) go to a JSON file that
+a later run can be compared against:
+
+    python benchmarks/bench_suite.py --size 256M --output base.json
+    python benchmarks/bench_suite.py --size 256M --baseline base.json
+    sudo python benchmarks/bench_suite.py --loop --algorithms random,dod --passes 1
+    python benchmarks/bench_suite.py --algorithms random --passes 1 --stripes 1,2,4,8
+
+The rng backend only matters for algorithms with random passes, so fixed
+pattern algorithms run once per backend-independent case. --passes caps
+the pass count (Gutmann is 35 passes otherwise).
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from usbzero import __version__, patterns, rng, wipe
+from bench_overwrite import make_image, parse_size
+
+ALGORITHM_NAMES = {
+    "random": patterns.ALGO_RANDOM,
+    "zeros": patterns.ALGO_ZEROS,
+    "ones": patterns.ALGO_ONES,
+    "dod": patterns.ALGO_DOD,
+    "gutmann": patterns.ALGO_GUTMANN,
+}
+IO_MODES = ("direct", "buffered")
+DEFAULT_TOLERANCE = 0.10  # Slowdown (or RSS growth) that counts as a regression
+
+
+def case_key(case):
+    # Results from before stripes were swept ran the sequential path
+    case = dict(case, stripes=case.get("stripes", 1))
+    return "|".join(str(case[k]) for k in ("algorithm", "passes", "block_size", "depth", "stripes",
+                                           "io", "rng"))
+
+
+def build_cases(args):
+    algorithms = [ALGORITHM_NAMES[name] for name in args.algorithms.split(",")]
+    block_sizes = [parse_size(s) for s in args.block_sizes.split(",")]
+    depths = [int(d) for d in args.depths.split(",")]
+    stripes = [int(n) for n in args.stripes.split(",")]
+    io_modes = args.io.split(",")
+    backends = args.rng.split(",") if args.rng else rng.available_backends()
+    cases = []
+    for algorithm in algorithms:
+        passes = patterns.DEFAULT_PASSES[algorithm]
+        if args.passes:
+            passes = min(passes, args.passes)
+        schedule = patterns.build_schedule(algorithm, passes)
+        has_random = any(p.is_random for p in schedule)
+        for block_size, depth, stripe_count, io, backend in itertools.product(
+                block_sizes, depths, stripes, io_modes, backends if has_random else [None]):
+            cases.append({"algorithm": algorithm, "passes": passes, "block_size": block_size,
+                          "depth": depth, "stripes": stripe_count, "io": io, "rng": backend})
+    return cases
+
+
+def run_case(case, target):
+    """Run one case in this process and return its measurements."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    results = wipe.run_passes(target, case["algorithm"], case["passes"],
+                              direct=case["io"] == "direct",
+                              rng_backend=case["rng"], block_size=case["block_size"],
+                              depth=case["depth"], stripes=case["stripes"])
+    seconds = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime)
+    written = sum(r.bytes_written for r in results)
+    return dict(case,
+                direct_granted=all(r.direct for r in results),
+                bytes_written=written,
+                seconds=round(seconds, 3),
+                mb_per_s=round(written / seconds / 1e6, 1),
+                cpu_percent=round(100 * cpu / seconds, 1),
+                peak_rss_mb=round(after.ru_maxrss / 1024, 1),  # ru_maxrss is KiB on Linux
+                pass_seconds=[round(r.seconds, 3) for r in results],
+                bottlenecks=[r.stats.bottleneck for r in results])
+
+
+def run_child(case, target):
+    # A fresh interpreter per case keeps peak RSS and CPU time separate
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case),
+                             "--target", target], check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def attach_loop(image):
+    output = subprocess.run(["losetup", "--find", "--show", image], check=True,
+                            capture_output=True, text=True)
+    return output.stdout.strip()
+
+
+def compare(results, baseline, tolerance):
+    """Return lines describing regressions of results against baseline."""
+    before = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = before.get(case_key(result))
+        if old is None:
+            continue
+        speed = result["mb_per_s"] / old["mb_per_s"] if old["mb_per_s"] else 1.0
+        if speed < 1 - tolerance:
+            regressions.append(f"{case_key(result)}: {old['mb_per_s']} -> {result['mb_per_s']} MB/s "
+                               f"({speed - 1:+.0%})")
+        if result["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{case_key(result)}: peak RSS {old['peak_rss_mb']} -> "
+                               f"{result['peak_rss_mb']} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="256M", help="image size when no --target is given")
+    parser.add_argument("--target", help="existing file or loop device to overwrite")
+    parser.add_argument("--dir", help="directory for the temporary image")
+    parser.add_argument("--loop", action="store_true",
+                        help="attach the temporary image to a loop device (needs root)")
+    parser.add_argument("--algorithms", default=",".join(ALGORITHM_NAMES),
+                        help="comma-separated subset of %(default)s")
+    parser.add_argument("--passes", type=int, help="cap on passes per algorithm")
+    parser.add_argument("--block-sizes", default="1M,4M,16M")
+    parser.add_argument("--depths", default="1,2,4", help="buffer counts")
+    parser.add_argument("--stripes", default="1,4", help="stripe counts; 1 is the sequential path")
+    parser.add_argument("--io", default=",".join(IO_MODES))
+    parser.add_argument("--rng", help="comma-separated rng backends (default: all available)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case), args.target)))
+        return 0
+
+    image = None if args.target else make_image(parse_size(args.size), args.dir)
+    target = args.target or image
+    loop = None
+    try:
+        if args.loop and image:
+            target = loop = attach_loop(image)
+        cases = build_cases(args)
+        results = []
+        for number, case in enumerate(cases, 1):
+            result = run_child(case, target)
+            results.append(result)
+            print(f"[{number}/{len(cases)}] {case_key(case):<64} {result['mb_per_s']:8.1f} MB/s "
+                  f"{result['cpu_percent']:6.1f}% CPU {result['peak_rss_mb']:7.1f} MB RSS")
+    finally:
+        if loop:
+            subprocess.run(["losetup", "--detach", loop], check=False)
+        if image:
+            os.remove(image)
+
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "target": "loop" if loop else args.target or "image",
+        "size": results[0]["bytes_written"] // results[0]["passes"] if results else None,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions against {args.baseline} "
+              f"(tolerance {args.tolerance:.0%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Shared fixtures: sparse image files and a fake device backend.
+
+FakeDevice stands in for a failing or counterfeit drive on top of an
+ordinary image file. Its write() and read() have the signatures of
+engine.write_at and verify.read_at, so it can be passed as write_pass()'s
+writer or patched in for the capacity probe with install().
+"""
+
+import errno
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from usbzero import engine, verify  # noqa: E402
+
+_write_at = engine.write_at
+_read_at = verify.read_at
+
+MODE_WRAP = "wrap"  # Offsets past real_size land at offset % real_size
+MODE_DROP = "drop"  # Writes past real_size vanish, reads there return zeros
+MODE_EIO = "eio"    # Writes and reads past real_size fail
+
+
+def media_error():
+    return OSError(errno.EIO, os.strerror(errno.EIO))
+
+
+class FakeDevice:
+    """An image file that misbehaves like a bad or fake drive.
+
+    bad is a list of (start, end) byte ranges where every write and read
+    fails with EIO; failures counts down extra failing attempts per range
+    before it starts to work, to model a flaky sector.
+    """
+
+    def __init__(self, real_size=None, mode=MODE_WRAP, bad=(), failures=None):
+        self.real_size = real_size
+        self.mode = mode
+        self.bad = list(bad)
+        self.failures = dict(failures or {})
+        self.writes = 0
+
+    def _check_bad(self, offset, length):
+        for start, end in self.bad:
+            if start < offset + length and offset < end:
+                left = self.failures.get((start, end))
+                if left is None:
+                    raise media_error()
+                if left > 0:
+                    self.failures[(start, end)] = left - 1
+                    raise media_error()
+
+    def _pieces(self, offset, length):
+        # (position in the buffer, device offset, length) of each stretch
+        # that maps contiguously onto the image, or None as device offset
+        # for a stretch that does not exist
+        pos = 0
+        while pos < length:
+            at = offset + pos
+            if self.real_size is None or at < self.real_size:
+                stop = length if self.real_size is None else min(length, pos + self.real_size - at)
+                yield pos, at, stop - pos
+            elif self.mode == MODE_WRAP:
+                mapped = at % self.real_size
+                stop = min(length, pos + self.real_size - mapped)
+                yield pos, mapped, stop - pos
+            else:
+                stop = length
+                yield pos, None, stop - pos
+            pos = stop
+
+    def write(self, fd, data, offset):
+        self.writes += 1
+        view = memoryview(data)
+        self._check_bad(offset, len(view))
+        for pos, at, length in self._pieces(offset, len(view)):
+            if at is not None:
+                _write_at(fd, view[pos:pos + length], at)
+            elif self.mode == MODE_EIO:
+                raise media_error()
+
+    def read(self, fd, buf, offset):
+        view = memoryview(buf)
+        self._check_bad(offset, len(view))
+        for pos, at, length in self._pieces(offset, len(view)):
+            if at is not None:
+                _read_at(fd, view[pos:pos + length], at)
+            elif self.mode == MODE_EIO:
+                raise media_error()
+            else:
+                view[pos:pos + length] = bytes(length)
+        return len(view)
+
+    def install(self, monkeypatch):
+        """Route the module-level write_at/read_at used by capacity.probe()."""
+        monkeypatch.setattr(engine, "write_at", self.write)
+        monkeypatch.setattr(verify, "read_at", self.read)
+        return self
+
+
+@pytest.fixture
+def image(tmp_path):
+    """Return a function creating a sparse image file of a given size."""
+
+    def make(size, name="disk.img"):
+        path = tmp_path / name
+        with open(path, "wb") as f:
+            f.truncate(size)
+        return str(path)
+
+    return make
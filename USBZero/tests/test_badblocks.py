@@ -0,0 +1,121 @@
+import errno
+import os
+
+import pytest
+
+from conftest import FakeDevice
+from usbzero import badblocks, engine, verify
+
+SECTOR = 4096
+BLOCK = 64 * 1024
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_bad_regions_merge_touching_ranges():
+    bad = badblocks.BadRegions(512)
+    bad.add(1024, 1536)
+    bad.add(0, 512)
+    bad.add(512, 1024)
+    bad.add(4096, 4608)
+    assert bad.ranges == [(0, 1536), (4096, 4608)]
+    assert bad.bytes == 2048
+    assert bad.to_dict()["sectors"] == [[0, 2], [8, 8]]
+
+
+def test_bisection_maps_single_bad_sector(image):
+    path = image(BLOCK)
+    device = FakeDevice(bad=[(3 * SECTOR, 4 * SECTOR)])
+    data = os.urandom(BLOCK)
+    bad = badblocks.BadRegions(SECTOR, retries=2)
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        lost = badblocks.write_tolerant(device.write, fd, data, 0, bad)
+    finally:
+        os.close(fd)
+
+    assert lost == SECTOR
+    assert bad.ranges == [(3 * SECTOR, 4 * SECTOR)]
+    written = read_file(path)
+    assert written[:3 * SECTOR] == data[:3 * SECTOR]
+    assert written[4 * SECTOR:] == data[4 * SECTOR:]
+    assert written[3 * SECTOR:4 * SECTOR] == bytes(SECTOR)
+
+
+def test_retries_recover_flaky_sector(image):
+    path = image(BLOCK)
+    flaky = (SECTOR, 2 * SECTOR)
+    device = FakeDevice(bad=[flaky], failures={flaky: 2})
+    data = os.urandom(BLOCK)
+    bad = badblocks.BadRegions(SECTOR, retries=2)
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        # The first, whole-block attempt is the one the engine already made
+        with pytest.raises(OSError):
+            device.write(fd, data, 0)
+        badblocks.write_tolerant(device.write, fd, data, 0, bad)
+    finally:
+        os.close(fd)
+
+    assert bad.ranges == []
+    assert bad.errors >= 2
+    assert read_file(path) == data
+
+
+def test_spent_budget_records_whole_block(image):
+    path = image(BLOCK)
+    device = FakeDevice(bad=[(0, SECTOR)])
+    bad = badblocks.BadRegions(SECTOR, budget=0)
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        badblocks.write_tolerant(device.write, fd, os.urandom(BLOCK), 0, bad)
+    finally:
+        os.close(fd)
+    assert bad.ranges == [(0, BLOCK)]
+    assert bad.exhausted
+
+
+def test_other_errors_are_not_mapped(image):
+    path = image(BLOCK)
+
+    def full(fd, data, offset):
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        with pytest.raises(OSError) as excinfo:
+            badblocks.write_tolerant(full, fd, os.urandom(BLOCK), 0, badblocks.BadRegions(SECTOR))
+    finally:
+        os.close(fd)
+    assert excinfo.value.errno == errno.ENOSPC
+
+
+@pytest.mark.parametrize("stripes", [1, 3])
+def test_tolerant_pass_skips_bad_sectors(image, stripes):
+    size = 1024 * 1024
+    path = image(size)
+    holes = [(5 * SECTOR, 6 * SECTOR), (700 * 1024, 700 * 1024 + 2 * SECTOR)]
+    device = FakeDevice(bad=holes)
+    fill = engine.rng.KeyedStream().fill
+
+    result = engine.write_pass(path, fill, block_size=BLOCK, direct=True, stripes=stripes,
+                               tolerate_errors=True, writer=device.write)
+
+    assert result.bad_regions.ranges == holes
+    assert result.bytes_written == size
+    # Everything around the holes was written; the holes are skipped
+    checked = verify.verify_pass(path, fill, block_size=BLOCK, skip=result.bad_regions.ranges)
+    assert checked.ok
+    unskipped = verify.verify_pass(path, fill, block_size=BLOCK)
+    assert unskipped.mismatch_bytes == sum(end - start for start, end in holes)
+
+
+def test_strict_pass_fails_on_first_error(image):
+    path = image(1024 * 1024)
+    device = FakeDevice(bad=[(BLOCK, BLOCK + SECTOR)])
+    with pytest.raises(OSError) as excinfo:
+        engine.write_pass(path, block_size=BLOCK, writer=device.write)
+    assert excinfo.value.errno == errno.EIO
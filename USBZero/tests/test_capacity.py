@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import MODE_DROP, MODE_EIO, MODE_WRAP, FakeDevice
+from usbzero import capacity
+
+MIB = 1024 * 1024
+SIZE = 256 * MIB
+
+
+def test_probe_offsets_are_sorted_aligned_and_in_bounds():
+    window = capacity.wrap_window(SIZE)
+    offsets = capacity.probe_offsets(SIZE)
+    assert offsets == sorted(set(offsets))
+    assert offsets[0] >= window
+    assert offsets[-1] == SIZE - capacity.PROBE_SIZE
+    assert all(o % capacity.PROBE_SIZE == 0 for o in offsets)
+    # One probe at least every window length, so a wrap always hits the window
+    gaps = [b - a for a, b in zip([window] + offsets, offsets)]
+    assert max(gaps) <= window
+
+
+def test_genuine_image_is_ok(image, monkeypatch):
+    FakeDevice().install(monkeypatch)
+    result = capacity.probe(image(SIZE))
+    assert result.mode == capacity.MODE_OK
+    assert not result.fake
+    assert result.usable_size == SIZE
+    assert result.bad_blocks == []
+
+
+@pytest.mark.parametrize("real_size", [100 * MIB + 12 * 1024, 3 * MIB + 4096, 200 * MIB])
+def test_wrapping_drive_reports_exact_size(image, monkeypatch, real_size):
+    FakeDevice(real_size, MODE_WRAP).install(monkeypatch)
+    result = capacity.probe(image(SIZE))
+    assert result.mode == capacity.MODE_WRAPS
+    assert result.usable_size == real_size
+    assert result.bad_blocks == []
+
+
+@pytest.mark.parametrize("mode", [MODE_DROP, MODE_EIO])
+@pytest.mark.parametrize("real_size", [77 * MIB + 5 * capacity.PROBE_SIZE, 255 * MIB])
+def test_lost_writes_are_bisected_to_the_block(image, monkeypatch, mode, real_size):
+    FakeDevice(real_size, mode).install(monkeypatch)
+    result = capacity.probe(image(SIZE))
+    assert result.mode == capacity.MODE_LOST
+    assert result.usable_size == real_size
+    assert result.rounds > 0
+    assert "loses writes" in result.describe()
+
+
+def test_isolated_bad_sector_is_not_fake(image, monkeypatch):
+    FakeDevice(bad=[(MIB, MIB + 4096)]).install(monkeypatch)
+    result = capacity.probe(image(SIZE))
+    assert result.mode == capacity.MODE_OK
+    assert result.usable_size == SIZE
+    assert result.bad_blocks == [MIB]
+    assert result.to_dict()["bad_blocks"] == [MIB]
+
+
+def test_bad_sector_below_lost_tail_does_not_shorten_it(image, monkeypatch):
+    real_size = 200 * MIB
+    FakeDevice(real_size, MODE_DROP, bad=[(64 * MIB, 64 * MIB + 4096)]).install(monkeypatch)
+    result = capacity.probe(image(SIZE))
+    assert result.mode == capacity.MODE_LOST
+    assert result.usable_size == real_size
+    assert 64 * MIB in result.bad_blocks
@@ -0,0 +1,98 @@
+import pytest
+
+from usbzero import journal, merkle, patterns, tuning, wipe
+
+BLOCK = 64 * 1024
+SIZE = 4 * 1024 * 1024
+
+
+class Interrupted(Exception):
+    pass
+
+
+def identity(path):
+    return {"device": path, "serial": "TEST0001", "model": "Image", "size": SIZE}
+
+
+def interrupt_after(pass_index, blocks):
+    def on_progress(index, done, total):
+        if index == pass_index and done >= blocks * BLOCK:
+            raise Interrupted()
+    return on_progress
+
+
+def file_root(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return merkle.fold([merkle.leaf_hash(data[i:i + BLOCK]) for i in range(0, len(data), BLOCK)])
+
+
+def run(path, j, passes, **options):
+    return wipe.run_passes(path, patterns.ALGO_RANDOM, passes, journal=j, verify="last",
+                           block_size=BLOCK, checkpoint_interval=0, **options)
+
+
+def test_interrupted_pass_resumes_from_checkpoint(image, tmp_path):
+    path = image(SIZE)
+    ident = identity(path)
+    j = journal.Journal.create(ident, patterns.ALGO_RANDOM, 1, journal_dir=tmp_path)
+    with pytest.raises(Interrupted):
+        run(path, j, 1, on_progress=interrupt_after(0, 20))
+
+    resumed = journal.Journal.load(ident, journal_dir=tmp_path)
+    assert resumed.matches(patterns.ALGO_RANDOM, 1)
+    assert resumed.pass_index == 0
+    assert 0 < resumed.offset < SIZE
+    assert resumed.seed is not None
+    checkpoint = resumed.offset
+
+    results = run(path, resumed, 1)
+    result = results[0]
+    assert result.start_offset == checkpoint - checkpoint % BLOCK > 0
+    assert result.bytes_written == SIZE - result.start_offset
+    # The same stream continued, so the whole device reads back as one pass
+    assert result.verify.ok
+    assert result.verify.bytes_checked == SIZE
+    assert result.merkle.root() == file_root(path)
+    assert journal.Journal.load(ident, journal_dir=tmp_path).pass_index == 1
+
+
+def test_finished_passes_come_from_the_journal(image, tmp_path):
+    path = image(SIZE)
+    ident = identity(path)
+    j = journal.Journal.create(ident, patterns.ALGO_RANDOM, 2, journal_dir=tmp_path)
+    with pytest.raises(Interrupted):
+        run(path, j, 2, on_progress=interrupt_after(1, 10))
+
+    resumed = journal.Journal.load(ident, journal_dir=tmp_path)
+    assert resumed.pass_index == 1
+    assert len(resumed.completed) == 1
+
+    started = []
+    results = run(path, resumed, 2, on_pass=lambda index, wipe_pass: started.append(index))
+    assert started == [1]
+    assert len(results) == 2
+    assert results[0].bytes_written == SIZE
+    assert results[1].start_offset > 0
+    assert results[1].verify.ok
+    assert results[1].merkle.root() == file_root(path)
+
+
+def test_resume_keeps_the_recorded_tuning(tmp_path):
+    ident = {"device": "/dev/null", "serial": "TEST0002", "model": "Image", "size": SIZE}
+    recorded = tuning.Tuning(BLOCK, 2, stripes=1)
+    j = journal.Journal.create(ident, patterns.ALGO_RANDOM, 1, journal_dir=tmp_path,
+                               tuning=recorded.to_dict())
+    loaded = journal.Journal.load(ident, journal_dir=tmp_path)
+    tuned = tuning.for_resume(loaded, ident, str(tmp_path / "tuning.json"))
+    assert tuned.options() == recorded.options()
+    assert tuned.cached
+    j.remove()
+    assert journal.Journal.load(ident, journal_dir=tmp_path) is None
+
+
+def test_journal_for_another_size_is_refused(tmp_path):
+    ident = {"device": "/dev/null", "serial": "TEST0003", "model": "Image", "size": SIZE}
+    journal.Journal.create(ident, patterns.ALGO_RANDOM, 1, journal_dir=tmp_path)
+    with pytest.raises(journal.JournalError):
+        journal.Journal.load(dict(ident, size=SIZE * 2), journal_dir=tmp_path)
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from conftest import FakeDevice
+from usbzero import engine, patterns, verify
+
+SECTOR = 4096
+BLOCK = 64 * 1024
+SIZE = 1024 * 1024
+
+
+def written_image(image, fill):
+    path = image(SIZE)
+    engine.write_pass(path, fill, block_size=BLOCK)
+    return path
+
+
+def corrupt(path, offset, length):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(os.urandom(length))
+
+
+def test_outside_splits_around_skip_ranges():
+    skip = [(100, 200), (300, 400), (900, 1000)]
+    assert list(verify.outside(0, 500, skip)) == [(0, 100), (200, 100), (400, 100)]
+    assert list(verify.outside(150, 100, skip)) == [(200, 50)]
+    assert list(verify.outside(500, 100, skip)) == [(500, 100)]
+    assert list(verify.outside(320, 50, skip)) == []
+    assert list(verify.outside(0, 10, None)) == [(0, 10)]
+
+
+def test_full_verify_passes_on_written_image(image):
+    fill = patterns.fixed_pattern(b"\x55").fill
+    path = written_image(image, fill)
+    result = verify.verify_pass(path, fill, block_size=BLOCK)
+    assert result.ok
+    assert result.bytes_checked == SIZE
+
+
+def test_skip_ranges_hide_only_what_they_cover(image):
+    fill = patterns.fixed_pattern(b"\x00").fill
+    path = written_image(image, fill)
+    skipped = (3 * SECTOR, 5 * SECTOR)
+    corrupt(path, skipped[0], skipped[1] - skipped[0])
+
+    assert verify.verify_pass(path, fill, block_size=BLOCK, skip=[skipped]).ok
+
+    stray = 200 * SECTOR
+    corrupt(path, stray, 10)
+    result = verify.verify_pass(path, fill, block_size=BLOCK, skip=[skipped])
+    assert not result.ok
+    assert result.mismatches == [(stray, stray + engine.SECTOR_SIZE)]
+    assert result.mismatch_bytes == engine.SECTOR_SIZE
+
+
+def test_sampled_verify_respects_skip_ranges(image):
+    fill = patterns.fixed_pattern(b"\xff").fill
+    path = written_image(image, fill)
+    skipped = (0, SECTOR)
+    corrupt(path, 0, SECTOR)
+    result = verify.sample_pass(path, fill, samples=4, sample_size=BLOCK, skip=[skipped])
+    assert result.ok
+    # A device this small is read completely, so nothing is left to chance
+    assert result.fully_covered
+    assert result.confidence == 1.0
+
+
+def test_unreadable_blocks_are_reported(image, monkeypatch):
+    fill = patterns.fixed_pattern(b"\x00").fill
+    path = written_image(image, fill)
+    bad = (2 * BLOCK, 2 * BLOCK + SECTOR)
+    FakeDevice(bad=[bad]).install(monkeypatch)
+
+    result = verify.verify_pass(path, fill, block_size=BLOCK)
+    assert not result.ok
+    assert result.mismatch_bytes == 0
+    assert result.unreadable == [(2 * BLOCK, 3 * BLOCK)]
+    assert result.unreadable_bytes == BLOCK
+
+    # Known bad regions from the wipe are skipped, so the rest of the block is read
+    result = verify.verify_pass(path, fill, block_size=BLOCK, skip=[bad])
+    assert result.ok
+
+
+@pytest.mark.parametrize("data", [verify.VerifyResult("x", SIZE, 1.0, [(0, SECTOR)], SECTOR,
+                                                       [(BLOCK, BLOCK + SECTOR)], SECTOR)])
+def test_result_round_trips_through_dict(data):
+    again = verify.VerifyResult.from_dict("x", data.to_dict())
+    assert again.mismatches == data.mismatches
+    assert again.unreadable == data.unreadable
+    assert again.ok == data.ok
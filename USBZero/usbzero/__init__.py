@@ -0,0 +1,7 @@
+"""Core wipe logic shared by the USBZero front ends.
+
+Modules in this package must not import customtkinter, tkinter or PIL so
+they stay usable on headless wipe stations.
+"""
+
+__version__ = "1.0.1"
@@ -0,0 +1,5 @@
+import sys
+
+from usbzero.cli import main
+
+sys.exit(main())
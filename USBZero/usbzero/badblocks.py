@@ -0,0 +1,149 @@
+"""Error-tolerant writes that map unwritable regions.
+
+A single I/O error used to abort the whole pass, which on an ageing stick
+threw away hours of work for one bad sector. With tolerant writes the engine
+hands a block whose write failed to write_tolerant(), which bisects it: each
+half is written again, and halves that still fail are split further, down
+to one logical sector. A sector gets RETRIES more attempts before it is
+recorded as bad; everything around it is written normally and the pass
+carries on at full speed with the next block.
+
+Only media errors (EIO) are handled this way. Anything else, such as the
+device disappearing, still aborts the pass. The time spent bisecting is
+bounded by a per-pass TIME_BUDGET; once it is used up, failing blocks are
+recorded as bad in one piece without further attempts.
+
+The write call only reports errors with O_DIRECT. Buffered writes report
+them at the final fsync, where they cannot be mapped, so tolerant passes
+rely on direct I/O (the default). Failures can be injected for testing with
+a device-mapper error or flakey target, or by giving engine.write_pass() a
+writer that raises EIO for chosen offsets.
+"""
+
+import errno
+import os
+import stat
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+RETRIES = 2  # Extra attempts at a single failing sector
+TIME_BUDGET = 300.0  # Seconds of error handling per pass
+MEDIA_ERRORS = (errno.EIO,)
+SECTOR_SIZE = 512
+BLKSSZGET = 0x1268  # linux/fs.h: logical sector size of a block device
+
+
+def logical_sector_size(fd, default=SECTOR_SIZE):
+    """Return the logical sector size of an open block device, or default."""
+    if fcntl is None or not stat.S_ISBLK(os.fstat(fd).st_mode):
+        return default
+    try:
+        size = int.from_bytes(fcntl.ioctl(fd, BLKSSZGET, bytes(4)), "little")
+    except OSError:
+        return default
+    return size or default
+
+
+class BadRegions:
+    """Unwritable byte ranges found during one pass."""
+
+    def __init__(self, sector_size=SECTOR_SIZE, retries=RETRIES, budget=TIME_BUDGET):
+        self.sector_size = sector_size
+        self.retries = retries
+        self.budget = budget
+        self.ranges = []  # Sorted, merged (start, end) byte ranges
+        self.errors = 0  # Failed write calls, retries included
+        self.seconds = 0.0  # Time spent handling errors
+        self._lock = threading.Lock()  # Stripes report concurrently
+
+    def add(self, start, end):
+        with self._lock:
+            merged = []
+            for begin, stop in sorted(self.ranges + [(start, end)]):
+                if merged and begin <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+                else:
+                    merged.append((begin, stop))
+            self.ranges = merged
+
+    def failed(self):
+        with self._lock:
+            self.errors += 1
+
+    def spent(self, seconds):
+        with self._lock:
+            self.seconds += seconds
+
+    @property
+    def exhausted(self):
+        return self.seconds >= self.budget
+
+    @property
+    def bytes(self):
+        return sum(end - start for start, end in self.ranges)
+
+    def to_dict(self):
+        return {
+            "bytes": self.bytes,
+            "sector_size": self.sector_size,
+            # Inclusive [first, last] sector numbers
+            "sectors": [[start // self.sector_size, (end - 1) // self.sector_size]
+                        for start, end in self.ranges],
+            "write_errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "budget_exhausted": self.exhausted,
+        }
+
+
+def _try_write(writer, fd, data, offset, bad, attempts):
+    for _ in range(attempts):
+        try:
+            writer(fd, data, offset)
+            return True
+        except OSError as e:
+            if e.errno not in MEDIA_ERRORS:
+                raise
+            bad.failed()
+    return False
+
+
+def write_tolerant(writer, fd, data, offset, bad):
+    """Rewrite a block whose write failed, recording what stays unwritable.
+
+    writer(fd, data, offset) is the write that failed for data at offset.
+    The block is bisected down to bad.sector_size; failing sectors go into
+    bad. Returns the number of bytes recorded as bad by this call.
+    """
+    sector = bad.sector_size
+    before = bad.bytes
+    began = time.monotonic()
+    start_seconds = bad.seconds
+
+    def out_of_time():
+        return start_seconds + time.monotonic() - began >= bad.budget
+
+    def bisect(view, start):
+        if out_of_time():
+            bad.add(start, start + len(view))
+        elif len(view) <= sector:
+            if not _try_write(writer, fd, view, start, bad, 1 + bad.retries):
+                bad.add(start, start + len(view))
+        else:
+            half = max(sector, len(view) // 2 // sector * sector)
+            for piece, piece_start in ((view[:half], start), (view[half:], start + half)):
+                if piece and not _try_write(writer, fd, piece, piece_start, bad, 1):
+                    bisect(piece, piece_start)
+
+    bad.failed()  # The write that brought us here
+    view = memoryview(data)
+    try:
+        bisect(view, offset)
+    finally:
+        view.release()
+        bad.spent(time.monotonic() - began)
+    return bad.bytes - before
@@ -0,0 +1,60 @@
+"""Page-aligned buffer pool for the overwrite engine.
+
+Buffers are anonymous mmap regions, which the kernel always hands out on a
+page boundary, so they satisfy O_DIRECT alignment rules. A pool holds a
+fixed number of them and recycles them for every block, keeping the memory
+footprint of a pass constant regardless of device size.
+"""
+
+import mmap
+import queue
+
+
+class BufferPool:
+    """A fixed set of reusable, page-aligned buffers."""
+
+    def __init__(self, count, size):
+        if count < 1:
+            raise ValueError("Buffer pool needs at least one buffer")
+        if size % mmap.PAGESIZE:
+            raise ValueError(f"Buffer size must be a multiple of the page size ({mmap.PAGESIZE})")
+        self.size = size
+        self._maps = [mmap.mmap(-1, size) for _ in range(count)]
+        self._views = [memoryview(m) for m in self._maps]
+        self._free = queue.SimpleQueue()
+        for view in self._views:
+            self._free.put(view)
+
+    def __len__(self):
+        return len(self._views)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def footprint(self):
+        """Total bytes held by the pool."""
+        return self.size * len(self._views)
+
+    def acquire(self, timeout=None):
+        """Take a free buffer, blocking until one is released."""
+        return self._free.get(timeout=timeout)
+
+    def release(self, buf):
+        self._free.put(buf)
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        for m in self._maps:
+            try:
+                m.close()
+            except BufferError:
+                # A slice is still alive (e.g. held by a traceback); the map
+                # is freed when it is collected.
+                pass
+        self._views = []
+        self._maps = []
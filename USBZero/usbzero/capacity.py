@@ -0,0 +1,356 @@
+"""Fast detection of fake-capacity drives.
+
+Counterfeit sticks report far more space than they have flash for. Writes
+past the real end are either lost (dropped, or failing with I/O errors) or
+wrap around onto flash that already holds data, and a full write-and-verify
+takes hours to show it. probe() writes uniquely tagged blocks instead: each
+PROBE_SIZE block starts with a header holding a random run id and its own
+offset, and the rest is the keyed random stream at that offset, so a block
+cannot be mistaken for one from an earlier run or for another block.
+
+Tagged blocks go to
+  * a contiguous window at the start of the device,
+  * offsets spaced logarithmically across the reported capacity
+    (STEPS_PER_DOUBLING per power of two, plus the last block), and
+  * one offset every window length across the whole capacity.
+The window comes first and the rest in ascending order, so a write that
+wraps around always lands on a block that was tagged before it. If the
+drive wraps at any size R, the first probe at or above R sits less than a
+window past it and lands inside the window, where the read-back finds its
+header: the drive wraps at (written offset - found offset). A window of
+sqrt(size * PROBE_SIZE) balances its length against the number of probes;
+that is about 2 x 50 MB for a 64 GB drive and much less for small ones.
+
+Lost writes show up as probes that read back anything but their own tag.
+A drive only loses writes past its real end if the failures run on to the
+reported end: a tail of at least MIN_TAIL failed blocks in which good
+blocks are rare (see _lost_tail), topped up with more blocks past the
+highest good one if too few were checked there. The real end then lies
+between the highest good block below the tail and its first block, less
+than a window apart, and bisection narrows it down to one block. After each
+bisection write the part of the window it could have wrapped onto is read
+again, so every size reported has been checked against both kinds of fake.
+Failed blocks outside such a tail are bad sectors on a genuine drive; they
+are listed in the result but do not limit the capacity, and neither do
+fewer than MIN_TAIL failing blocks at the very end.
+
+All I/O is direct where the device allows it, so the read-back sees the
+media and not the page cache. The probed blocks are overwritten, so the
+probe belongs before a wipe.
+"""
+
+import errno
+import math
+import os
+import time
+
+from usbzero import engine, rng, verify
+from usbzero.buffers import BufferPool
+
+PROBE_SIZE = 32 * 1024
+CHUNK = 1024 * 1024  # Write size for the window
+MIN_WINDOW = 1024 * 1024
+STEPS_PER_DOUBLING = 4
+MAX_RECORDED = 64  # Failed blocks and aliases kept in a result
+GOOD_WEIGHT = 9  # Failed blocks a good one outweighs in a tail of lost writes
+MIN_TAIL = 4  # Failed blocks needed to call a tail lost
+MAGIC = b"USBZPRB1"
+_PREFIX = len(MAGIC) + 8  # Magic and run id
+_HEADER = _PREFIX + 8  # Plus the block's offset
+
+MODE_OK = "ok"
+MODE_WRAPS = "wraps"  # Writes past the real end land on lower blocks
+MODE_LOST = "lost"    # Writes past the real end are dropped or fail
+
+
+class FakeCapacityError(Exception):
+    """Raised when a drive has less usable space than it reports."""
+
+
+class ProbeResult:
+    """Outcome of a capacity probe."""
+
+    def __init__(self, device_path, reported_size, usable_size, mode, seconds,
+                 block_size=PROBE_SIZE, window=0, probes=0, failed=None, aliases=None,
+                 rounds=0, bad_blocks=None):
+        self.device_path = device_path
+        self.reported_size = reported_size
+        self.usable_size = usable_size
+        self.mode = mode
+        self.seconds = seconds
+        self.block_size = block_size
+        self.window = window
+        self.probes = probes  # Tagged blocks outside the window
+        self.failed = failed or []  # Offsets of blocks that did not read back their tag
+        self.aliases = aliases or []  # [(found_at, written_at), ...] of wrapped writes
+        self.rounds = rounds  # Bisection steps
+        self.bad_blocks = bad_blocks or []  # Failed blocks below the usable size
+
+    @property
+    def fake(self):
+        return self.mode != MODE_OK
+
+    def describe(self):
+        if not self.fake:
+            bad = (f", {len(self.bad_blocks)} probed blocks unreadable (bad sectors)"
+                   if self.bad_blocks else "")
+            return (f"Capacity OK: {self.reported_size / 1e9:.2f} GB confirmed by "
+                    f"{self.probes} probes{bad} ({self.seconds:.1f} s)")
+        how = "wraps around" if self.mode == MODE_WRAPS else "loses writes"
+        return (f"Fake capacity: {self.reported_size / 1e9:.2f} GB reported, only "
+                f"{self.usable_size / 1e9:.2f} GB usable, {how} past that "
+                f"({self.seconds:.1f} s)")
+
+    def to_dict(self):
+        return {
+            "reported_size": self.reported_size,
+            "usable_size": self.usable_size,
+            "fake": self.fake,
+            "mode": self.mode,
+            "block_size": self.block_size,
+            "window": self.window,
+            "probes": self.probes,
+            "failed_blocks": len(self.failed),
+            "failed": self.failed[:MAX_RECORDED],
+            "aliases": [{"found_at": found, "written_at": written}
+                        for found, written in self.aliases[:MAX_RECORDED]],
+            "bad_blocks": self.bad_blocks[:MAX_RECORDED],
+            "rounds": self.rounds,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def wrap_window(size, block_size=PROBE_SIZE):
+    """Return the length of the tagged window at the start of a device."""
+    end = size - size % block_size
+    window = max(MIN_WINDOW, math.isqrt(size * block_size))
+    return min(-(-window // block_size) * block_size, end)
+
+
+def probe_offsets(size, block_size=PROBE_SIZE, window=None, steps=STEPS_PER_DOUBLING):
+    """Return the sorted, block-aligned offsets probe() writes past the window."""
+    end = size - size % block_size
+    if window is None:
+        window = wrap_window(size, block_size)
+    if end - window < block_size:
+        return []
+    offsets = set(range(window, end, window))
+    offsets.add(end - block_size)
+    power = block_size
+    while power < end:
+        for step in range(steps):
+            offset = power + power * step // steps
+            if offset % block_size == 0:
+                offsets.add(offset)
+        power *= 2
+    return sorted(o for o in offsets if window <= o <= end - block_size)
+
+
+class _Prober:
+    # Writes and reads tagged blocks on one open device
+
+    def __init__(self, device_path, block_size):
+        self.device_path = device_path
+        self.block_size = block_size
+        self.run_id = os.urandom(8)
+        self.stream = rng.KeyedStream()
+        self.write_fd, self.direct = engine.open_device(device_path, direct=True)
+        self.read_fd = None
+        self.chunk = max(CHUNK - CHUNK % block_size, block_size)
+        self.pool = BufferPool(2, self.chunk)
+        self.expected = self.pool.acquire()
+        self.actual = self.pool.acquire()
+
+    def close(self):
+        self.pool.release(self.expected)
+        self.pool.release(self.actual)
+        self.pool.close()
+        os.close(self.write_fd)
+        if self.read_fd is not None:
+            os.close(self.read_fd)
+
+    def tag(self, offset, length):
+        """Put the tagged blocks for offset..offset+length in self.expected."""
+        self.stream.fill(self.expected[:length], offset)
+        for pos in range(0, length, self.block_size):
+            self.expected[pos:pos + _HEADER] = (MAGIC + self.run_id
+                                                + (offset + pos).to_bytes(8, "little"))
+
+    def write(self, offset, length):
+        """Write tagged blocks. Returns the offsets of blocks that failed with
+        a media error."""
+        self.tag(offset, length)
+        try:
+            engine.write_at(self.write_fd, self.expected[:length], offset)
+        except OSError as e:
+            if e.errno != errno.EIO:
+                raise
+            if length <= self.block_size:
+                return [offset]
+            # Find the failing blocks, so one bad sector costs one block
+            return [failed for pos in range(offset, offset + length, self.block_size)
+                    for failed in self.write(pos, self.block_size)]
+        return []
+
+    def sync(self):
+        os.fsync(self.write_fd)
+        if not self.direct:
+            engine.drop_cache(self.write_fd)
+        if self.read_fd is None:
+            self.read_fd, _ = verify.open_for_read(self.device_path)
+
+    def check(self, offset, length, failed, aliases):
+        """Read tagged blocks back, adding bad block offsets to failed and
+        (found_at, written_at) pairs of foreign headers to aliases."""
+        actual = self.actual[:length]
+        try:
+            got = verify.read_at(self.read_fd, actual, offset)
+        except OSError as e:
+            if e.errno != errno.EIO:
+                raise
+            if length <= self.block_size:
+                failed.append(offset)
+            else:
+                for pos in range(offset, offset + length, self.block_size):
+                    self.check(pos, self.block_size, failed, aliases)
+            return
+        self.tag(offset, length)
+        prefix = MAGIC + self.run_id
+        for pos in range(0, length, self.block_size):
+            end = pos + self.block_size
+            if end <= got and actual[pos:end] == self.expected[pos:end]:
+                continue
+            failed.append(offset + pos)
+            block = actual[pos:min(end, got)].tobytes()
+            found = block.find(prefix)
+            while found >= 0:
+                written = int.from_bytes(block[found + _PREFIX:found + _HEADER], "little")
+                if written != offset + pos + found:
+                    aliases.append((offset + pos + found, written))
+                found = block.find(prefix, found + 1)
+
+
+def _wrap_size(aliases):
+    # Each alias was written at a multiple of the wrap size past where it
+    # was found; the smallest distance is the wrap size itself
+    distances = [written - found for found, written in aliases if written > found]
+    return min(distances) if distances else None
+
+
+def _lost_tail(checked, failed):
+    # Start of the run of failed blocks up to the end, or None. Each failed
+    # block counts +1 and each good one -GOOD_WEIGHT, and the tail is the
+    # suffix of checked blocks with the highest score, so isolated bad
+    # sectors below the real end or a few good blocks past it (served
+    # from the drive's cache) do not move it
+    tail = None
+    best = score = 0
+    for offset in reversed(checked):
+        score += 1 if offset in failed else -GOOD_WEIGHT
+        if score >= best and score > 0:
+            best, tail = score, offset
+    return tail
+
+
+def _tail_failures(checked, failed, tail):
+    return sum(1 for offset in checked if offset >= tail and offset in failed)
+
+
+def _tail_blocks(start, end, checked, block_size, count=2 * MIN_TAIL):
+    # Up to count unchecked blocks spread evenly over start..end
+    blocks = (end - start) // block_size
+    extra = {start + i * blocks // count * block_size for i in range(count)}
+    return sorted(extra - set(checked))
+
+
+def probe(device_path, block_size=PROBE_SIZE, on_status=None):
+    """Find the usable size of device_path. Returns a ProbeResult.
+
+    Overwrites the probed blocks.
+    """
+    if block_size <= 0 or block_size % engine.DIRECT_ALIGN:
+        raise ValueError(f"Probe size must be a positive multiple of {engine.DIRECT_ALIGN}")
+    start = time.perf_counter()
+    prober = _Prober(device_path, block_size)
+    try:
+        size = engine.get_device_size(prober.write_fd)
+        window = wrap_window(size, block_size)
+        offsets = probe_offsets(size, block_size, window)
+        if on_status:
+            on_status(f"Probing capacity: {window // (1024 * 1024)} MiB window and "
+                      f"{len(offsets)} probes...")
+
+        # Window first, then ascending, so wrapped writes land on tagged blocks
+        failed = []
+        aliases = []
+        unwritten = set()
+        for offset in range(0, window, prober.chunk):
+            unwritten.update(prober.write(offset, min(prober.chunk, window - offset)))
+        for offset in offsets:
+            unwritten.update(prober.write(offset, block_size))
+        prober.sync()
+        for offset in range(0, window, prober.chunk):
+            prober.check(offset, min(prober.chunk, window - offset), failed, aliases)
+        for offset in offsets:
+            prober.check(offset, block_size, failed, aliases)
+        failed = set(failed) | unwritten
+        checked = sorted(set(range(0, window, block_size)) | set(offsets))
+
+        rounds = 0
+        high = _lost_tail(checked, failed)
+        if high is not None and _tail_failures(checked, failed, high) < MIN_TAIL:
+            # Too few blocks to tell lost writes from bad sectors at the end;
+            # check more between the highest good block and the end
+            good = [o for o in checked if o < high and o not in failed]
+            extra = _tail_blocks(good[-1] + block_size if good else 0,
+                                 size - size % block_size, checked, block_size)
+            for offset in extra:
+                failed.update(prober.write(offset, block_size))
+            prober.sync()
+            bad = []
+            for offset in extra:
+                prober.check(offset, block_size, bad, aliases)
+            failed.update(bad)
+            checked = sorted(set(checked) | set(extra))
+            high = _lost_tail(checked, failed)
+            if high is not None and _tail_failures(checked, failed, high) < MIN_TAIL:
+                high = None
+        wraps = _wrap_size(aliases)
+        if wraps is not None:
+            mode, usable = MODE_WRAPS, wraps
+        elif high is None:
+            mode, usable = MODE_OK, size
+        else:
+            mode = MODE_LOST
+            good = [o for o in checked if o < high and o not in failed]
+            low = good[-1] + block_size if good else 0
+            if on_status:
+                on_status(f"Probe failed at {high / 1e9:.2f} GB, narrowing down...")
+            while high - low >= block_size:
+                middle = low + (high - low) // block_size // 2 * block_size
+                written = not prober.write(middle, block_size)
+                prober.sync()
+                bad = []
+                if written:
+                    prober.check(middle, block_size, bad, aliases)
+                    # Where middle lands if the drive wraps anywhere above low
+                    reach = min(window, middle - low + block_size)
+                    for offset in range(0, reach, prober.chunk):
+                        prober.check(offset, min(prober.chunk, reach - offset), bad, aliases)
+                rounds += 1
+                if _wrap_size(aliases) is not None:
+                    mode, low = MODE_WRAPS, _wrap_size(aliases)
+                    break
+                if written and middle not in bad:
+                    low = middle + block_size
+                else:
+                    high = middle
+            usable = low
+        failed = sorted(failed)
+        # Blocks overwritten by wrapped writes are not bad
+        bad_blocks = [offset for offset in failed if offset < usable] if mode != MODE_WRAPS else []
+        return ProbeResult(device_path, size, usable, mode, time.perf_counter() - start,
+                           block_size, window, len(offsets), failed, aliases, rounds,
+                           bad_blocks)
+    finally:
+        prober.close()
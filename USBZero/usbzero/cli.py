@@ -0,0 +1,705 @@
+"""Headless command line interface.
+
+    python -m usbzero list
+    sudo python -m usbzero wipe /dev/sdb --algorithm dod --yes
+    sudo python -m usbzero wipe /dev/sdb --json > wipe.jsonl
+    sudo python -m usbzero wipe /dev/sdb --resume --yes
+    sudo python -m usbzero batch --all --max-workers 8 --bus-limit 40 --yes
+
+Progress is printed as text, or as one JSON object per line with --json so
+wipe stations can feed it to other tools. Nothing here imports the GUI
+toolkits.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+from usbzero import __version__, patterns, progress
+
+ALGORITHM_ALIASES = {
+    "random": patterns.ALGO_RANDOM,
+    "zeros": patterns.ALGO_ZEROS,
+    "ones": patterns.ALGO_ONES,
+    "dod": patterns.ALGO_DOD,
+    "gutmann": patterns.ALGO_GUTMANN,
+}
+
+PROGRESS_INTERVAL = 0.5  # Seconds between progress lines
+TABLE_INTERVAL = 5.0  # Seconds between batch tables in text mode
+
+
+def parse_algorithm(text):
+    if text in patterns.ALGORITHMS:
+        return text
+    try:
+        return ALGORITHM_ALIASES[text.lower()]
+    except KeyError:
+        raise argparse.ArgumentTypeError(
+            f"unknown algorithm '{text}' (choose from {', '.join(ALGORITHM_ALIASES)})")
+
+
+def parse_logged_algorithm(text):
+    from usbzero import erase
+
+    # Wipes done by sanitize or discard are logged under the strategy
+    if text in erase.FAST_STRATEGIES:
+        return text
+    return parse_algorithm(text)
+
+
+def parse_block_size(text):
+    from usbzero import engine
+
+    size = parse_size(text)
+    if size <= 0 or size % engine.DIRECT_ALIGN:
+        raise argparse.ArgumentTypeError(
+            f"block size must be a positive multiple of {engine.DIRECT_ALIGN}, not '{text}'")
+    return size
+
+
+def parse_count(text):
+    try:
+        count = int(text)
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be a whole number of at least 1, not '{text}'")
+    return count
+
+
+def parse_rate(text):
+    try:
+        rate = float(text)
+    except ValueError:
+        rate = 0
+    if not rate > 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number, not '{text}'")
+    return rate
+
+
+def parse_size(text):
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}'")
+
+
+class Reporter:
+    """Prints wipe events as text or JSON lines."""
+
+    def __init__(self, json_lines=False, stream=None):
+        self.json_lines = json_lines
+        self.stream = stream or sys.stdout
+        self._tty = not json_lines and self.stream.isatty()
+
+    def event(self, kind, message=None, **fields):
+        if self.json_lines:
+            record = {"event": kind, "time": round(time.time(), 3)}
+            if message:
+                record["message"] = message
+            record.update(fields)
+            self.stream.write(json.dumps(record) + "\n")
+        else:
+            if self._tty:
+                self.stream.write("\r\033[K")
+            self.stream.write((message or kind) + "\n")
+        self.stream.flush()
+
+    def progress(self, snapshot):
+        if self.json_lines:
+            self.event("progress", **snapshot)
+            return
+        line = progress.format_status(snapshot)
+        self.stream.write(("\r\033[K" + line) if self._tty else line + "\n")
+        self.stream.flush()
+
+    @contextlib.contextmanager
+    def watch(self, tracker):
+        """Print tracker snapshots every PROGRESS_INTERVAL until the block exits."""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(PROGRESS_INTERVAL):
+                if tracker.active:
+                    self.progress(tracker.snapshot())
+
+        thread = threading.Thread(target=run, name="usbzero-progress", daemon=True)
+        thread.start()
+        try:
+            yield tracker
+        finally:
+            stop.set()
+            thread.join()
+
+
+def confirm(device, assume_yes):
+    if assume_yes:
+        return True
+    if not sys.stdin.isatty():
+        print("Refusing to wipe without --yes when not attached to a terminal.", file=sys.stderr)
+        return False
+    answer = input(f"WARNING: All data on {device} will be PERMANENTLY DELETED.\n"
+                   "Type 'yes' to continue: ")
+    return answer.strip().lower() == "yes"
+
+
+def cmd_list(args):
+    from usbzero import inventory
+
+    found = inventory.removable()
+    if args.json:
+        for drive in found:
+            print(json.dumps(drive.to_dict()))
+    elif not found:
+        print("No USB found")
+    else:
+        for drive in found:
+            print(f"{drive.path}\t{drive.size / 1e9:.1f} GB\t{drive.model}\t{drive.serial or ''}")
+    return 0
+
+
+def cmd_wipe(args):
+    from usbzero import capacity, drives, engine, erase, journal, logs, tuning, wipe
+
+    journal_dir = os.path.join(args.log_dir, "journal")
+    try:
+        identity = journal.identify(args.device)
+        resumed = journal.Journal.load(identity, journal_dir) if args.resume else None
+    except (OSError, journal.JournalError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if args.resume and resumed is None:
+        print(f"No interrupted wipe of {args.device} to resume.", file=sys.stderr)
+        return 1
+
+    algorithm = args.algorithm or (resumed.algorithm if resumed else patterns.ALGO_RANDOM)
+    passes = args.passes or (resumed.passes if resumed and algorithm == resumed.algorithm
+                             else patterns.DEFAULT_PASSES[algorithm])
+    if not 1 <= passes <= 35:
+        print("Pass count must be between 1 and 35.", file=sys.stderr)
+        return 2
+    if resumed and not resumed.matches(algorithm, passes):
+        print(f"The interrupted wipe used {resumed.algorithm} with {resumed.passes} passes; "
+              "run --resume without -a/-p or with the same values.", file=sys.stderr)
+        return 2
+    if not confirm(args.device, args.yes):
+        return 1
+
+    reporter = Reporter(args.json)
+    if resumed:
+        reporter.event("start", f"Resuming {args.device} with {algorithm} ({passes} passes) at "
+                       f"pass {resumed.pass_index + 1}, {resumed.fraction():.1%} done",
+                       device=args.device, algorithm=algorithm, passes=passes,
+                       resume_pass=resumed.pass_index + 1, resume_offset=resumed.offset)
+    else:
+        reporter.event("start", f"Wiping {args.device} with {algorithm} ({passes} passes)",
+                       device=args.device, algorithm=algorithm, passes=passes)
+    hpa_dco_status = resumed.info.get("hpa_dco_cleaned", False) if resumed else False
+    probed = None
+    tuned = None
+    explicit = args.block_size is not None or args.depth is not None or args.stripes is not None
+    tuning_path = os.path.join(args.log_dir, "tuning.json")
+    try:
+        checkpoints = resumed
+        if resumed:
+            # Calibration writes trial data at offset 0, which the resumed
+            # pass would never overwrite
+            if args.tune and not explicit:
+                tuned = tuning.for_resume(resumed, identity, tuning_path)
+        else:
+            # An interrupted wipe is past this step already
+            if args.hpa_dco:
+                drives.remove_hpa_dco(args.device, lambda msg: reporter.event("status", msg))
+                hpa_dco_status = True
+            if args.probe:
+                probed = capacity.probe(args.device,
+                                        on_status=lambda msg: reporter.event("status", msg))
+                reporter.event("capacity", probed.describe(), **probed.to_dict())
+            if args.tune and not explicit:
+                tuned = tuning.tune(args.device, identity, tuning_path,
+                                    on_status=lambda msg: reporter.event("status", msg),
+                                    recalibrate=args.retune)
+            checkpoints = journal.Journal.create(identity, algorithm, passes, journal_dir,
+                                                 hpa_dco_cleaned=hpa_dco_status,
+                                                 tuning=tuned.to_dict() if tuned else None)
+        if tuned:
+            reporter.event("tuning", f"Using {tuned.describe()}", **tuned.to_dict())
+
+        def on_pass(index, wipe_pass):
+            reporter.event("pass", f"Pass {index + 1}/{passes}: Writing {wipe_pass.label} data...",
+                           pass_index=index + 1, passes=passes, pattern=wipe_pass.label)
+
+        def on_verify(index):
+            reporter.event("verify", f"Pass {index + 1}/{passes}: Verifying written data...",
+                           pass_index=index + 1, passes=passes)
+
+        options = dict(direct=args.direct, on_pass=on_pass, on_verify=on_verify,
+                       journal=checkpoints, tolerate_errors=args.tolerate_errors,
+                       error_retries=args.error_retries, error_budget=args.error_budget,
+                       block_size=args.block_size or (tuned.block_size if tuned else engine.BLOCK_SIZE),
+                       depth=args.depth or (tuned.depth if tuned else engine.PIPELINE_DEPTH),
+                       stripes=args.stripes or (tuned.stripes if tuned else engine.STRIPES))
+        with reporter.watch(progress.ProgressTracker(passes)) as tracker:
+            if resumed:
+                outcome = None
+                results = wipe.run_passes(args.device, algorithm, passes, verify=args.verify,
+                                          samples=args.samples, tracker=tracker, **options)
+            else:
+                outcome = erase.erase(args.device, algorithm, passes, args.erase,
+                                      on_status=lambda msg: reporter.event("status", msg),
+                                      verify=args.verify, samples=args.samples, tracker=tracker,
+                                      **options)
+                results = outcome.results
+    except (OSError, ValueError, engine.OverwriteError, drives.DriveError, erase.EraseError) as e:
+        reporter.event("error", f"Error: {e}", error=str(e))
+        return 1
+
+    summary = outcome.summarize() if outcome else wipe.summarize(results)
+    for line in summary:
+        reporter.event("status", line)
+    failed = wipe.verification_failed(results)
+    unwritable = wipe.unwritable(results)
+    if unwritable:
+        reporter.event("unwritable", f"Warning: {unwritable['bytes']} bytes in "
+                       f"{len(unwritable['sectors'])} ranges could not be written and may still "
+                       "hold old data", **unwritable)
+    fake = probed is not None and probed.fake
+    formatted = None
+    if fake and args.format != drives.FORMAT_NONE:
+        reporter.event("status", "Not formatting a drive with fake capacity.")
+    elif args.format != drives.FORMAT_NONE and not failed:
+        reporter.event("status", f"Formatting drive ({args.format})...")
+        try:
+            formatted = drives.format_drive(args.device, args.format)
+        except drives.DriveError as e:
+            reporter.event("error", f"Error: {e}", error=str(e))
+            return 1
+        reporter.event("format", f"Formatted {formatted['partition']} as {args.format} in "
+                       f"{formatted['seconds']:.2f} s (mkfs {formatted['mkfs_seconds']:.2f} s)",
+                       **formatted)
+    if args.log:
+        extra = {"pass_results": [r.to_dict() for r in results],
+                 "serial": identity["serial"]}
+        logged = (algorithm, passes)
+        if outcome:
+            extra["erase"] = outcome.to_dict()
+            logged = outcome.method(algorithm, passes)
+        if tuned:
+            extra["tuning"] = tuned.to_dict()
+        if formatted:
+            extra["format"] = formatted
+        if resumed:
+            extra["resumed"] = True
+        if args.verify:
+            extra["verified"] = not failed
+        if unwritable:
+            extra["unwritable"] = unwritable
+        if probed:
+            extra["capacity"] = probed.to_dict()
+        path = logs.save_log(args.device, *logged, summary,
+                             hpa_dco_status, identity["model"], log_dir=args.log_dir, extra=extra,
+                             merkle_tree=wipe.final_merkle(results),
+                             on_status=lambda msg: reporter.event("status", msg))
+        reporter.event("log", f"Log written to {path}", path=path)
+    checkpoints.remove()
+    if failed:
+        reporter.event("error", "Error: Read-back verification failed.",
+                       error="verification failed", results=[r.to_dict() for r in results])
+        return 1
+    if fake:
+        reporter.event("error", f"Error: {probed.describe()}", error="fake capacity",
+                       results=[r.to_dict() for r in results])
+        return 1
+    if unwritable:
+        reporter.event("error", "Error: Some sectors could not be written.",
+                       error="unwritable sectors", results=[r.to_dict() for r in results])
+        return 1
+    reporter.event("done", "Process completed successfully.",
+                   results=[r.to_dict() for r in results])
+    return 0
+
+
+def cmd_batch(args):
+    from usbzero import drives, inventory, journal, logs, scheduler, wipe
+
+    if args.devices and args.all:
+        print("Name the devices to wipe or use --all, not both.", file=sys.stderr)
+        return 2
+    if not (args.devices or args.all):
+        print("Name the devices to wipe, or use --all.", file=sys.stderr)
+        return 2
+    devices = args.devices or [drive.path for drive in inventory.removable()]
+    if not devices:
+        print("No USB found", file=sys.stderr)
+        return 1
+    algorithm = args.algorithm or patterns.ALGO_RANDOM
+    passes = args.passes or patterns.DEFAULT_PASSES[algorithm]
+    if not 1 <= passes <= 35:
+        print("Pass count must be between 1 and 35.", file=sys.stderr)
+        return 2
+    if not confirm(", ".join(devices), args.yes):
+        return 1
+
+    reporter = Reporter(args.json)
+    reporter.event("start", f"Wiping {len(devices)} drives with {algorithm} ({passes} passes), "
+                   f"{args.max_workers} at a time"
+                   + (f", at most {args.bus_limit:g} MB/s per hub" if args.bus_limit else ""),
+                   devices=devices, algorithm=algorithm, passes=passes,
+                   max_workers=args.max_workers, bus_limit_mb_s=args.bus_limit)
+
+    def finish(job):
+        fake = job.capacity is not None and job.capacity.fake
+        formatted = None
+        if args.format != drives.FORMAT_NONE and not fake:
+            formatted = drives.format_drive(job.device_path, args.format)
+        if not args.log:
+            return
+        identity = journal.identify(job.device_path)
+        extra = {"pass_results": [r.to_dict() for r in job.results],
+                 "serial": identity["serial"], "erase": job.erase.to_dict()}
+        if job.tuning:
+            extra["tuning"] = job.tuning.to_dict()
+        if job.capacity:
+            extra["capacity"] = job.capacity.to_dict()
+        if formatted:
+            extra["format"] = formatted
+        if args.verify:
+            extra["verified"] = True  # Failed read-backs never get here
+        unwritable = wipe.unwritable(job.results)
+        if unwritable:
+            extra["unwritable"] = unwritable
+        path = logs.save_log(job.device_path, *job.erase.method(algorithm, passes),
+                             job.erase.summarize(), False, identity["model"],
+                             log_dir=args.log_dir, extra=extra,
+                             merkle_tree=wipe.final_merkle(job.results),
+                             on_status=lambda msg: reporter.event("status", msg))
+        reporter.event("log", f"{job.device_path}: log written to {path}",
+                       device=job.device_path, path=path)
+
+    batch = scheduler.Scheduler(args.max_workers,
+                                args.bus_limit * 1e6 if args.bus_limit else None,
+                                direct=args.direct, verify=args.verify, finish=finish,
+                                erase_strategy=args.erase, tune=args.tune, probe=args.probe)
+    for device in devices:
+        batch.add(device, algorithm, passes)
+    batch.start()
+    interval = PROGRESS_INTERVAL if args.json else TABLE_INTERVAL
+    while not batch.wait(interval):
+        rows = batch.snapshot()
+        reporter.event("jobs", scheduler.format_table(rows), rows=rows)
+
+    rows = batch.snapshot()
+    failed = [row for row in rows if row["state"] == scheduler.FAILED]
+    reporter.event("jobs", scheduler.format_table(rows), rows=rows)
+    if failed:
+        reporter.event("error", f"Error: {len(failed)} of {len(rows)} drives failed: "
+                       + ", ".join(row["device"] for row in failed),
+                       error="drives failed", devices=[row["device"] for row in failed])
+        return 1
+    reporter.event("done", f"All {len(rows)} drives were successfully processed.")
+    return 0
+
+
+def cmd_probe(args):
+    from usbzero import capacity
+
+    if not confirm(args.device, args.yes):
+        return 1
+    reporter = Reporter(args.json)
+    try:
+        result = capacity.probe(args.device, on_status=lambda msg: reporter.event("status", msg))
+    except OSError as e:
+        reporter.event("error", f"Error: {e}", error=str(e))
+        return 1
+    reporter.event("capacity", result.describe(), **result.to_dict())
+    return 1 if result.fake else 0
+
+
+def cmd_audit(args):
+    from usbzero import verify
+
+    if args.log:
+        return audit_merkle(args)
+    fill = patterns.fixed_pattern(args.pattern).fill
+    reporter = Reporter(args.json)
+    tracker = progress.ProgressTracker(1)
+    tracker.begin(0, 0, progress.PHASE_VERIFY, f"0x{args.pattern.hex().upper()}")
+
+    try:
+        with reporter.watch(tracker):
+            if args.full:
+                result = verify.verify_pass(args.device, fill, on_progress=tracker.update)
+            else:
+                result = verify.sample_pass(args.device, fill, samples=args.samples,
+                                            unwiped_fraction=args.unwiped_fraction,
+                                            on_progress=tracker.update)
+            tracker.finish()
+    except OSError as e:
+        reporter.event("error", f"Error: {e}", error=str(e))
+        return 1
+
+    summary = f"{result.bytes_checked} bytes checked at {result.mb_per_s:.1f} MB/s"
+    if isinstance(result, verify.SampleResult):
+        summary += (f", {result.coverage:.2%} coverage, {result.confidence:.1%} confidence that "
+                    f"no more than {args.unwiped_fraction:.2%} of the drive was missed")
+    outcome = "matches" if result.ok else "DOES NOT match"
+    reporter.event("done" if result.ok else "error",
+                   f"{args.device} {outcome} pattern 0x{args.pattern.hex().upper()}: {summary}",
+                   result=result.to_dict())
+    return 0 if result.ok else 1
+
+
+def audit_merkle(args):
+    from usbzero import merkle
+
+    reporter = Reporter(args.json)
+    try:
+        with open(args.log, encoding="utf-8") as f:
+            record = json.load(f).get("merkle")
+        if not record:
+            reporter.event("error", f"{args.log} has no Merkle root", error="no merkle root")
+            return 1
+        tree = merkle.MerkleTree.load(merkle.leaves_path(args.log), record)
+        result = merkle.spot_check(args.device, tree, blocks=args.blocks, samples=args.samples)
+    except (OSError, ValueError, merkle.MerkleError) as e:
+        reporter.event("error", f"Error: {e}", error=str(e))
+        return 1
+
+    outcome = "matches" if result.ok else f"DOES NOT match ({len(result.mismatches)} blocks differ)"
+    reporter.event("done" if result.ok else "error",
+                   f"{args.device} {outcome} Merkle root {record['root'][:16]}...: "
+                   f"{len(result.checked)} of {tree.count} blocks checked in {result.seconds:.2f} s",
+                   result=result.to_dict())
+    return 0 if result.ok else 1
+
+
+def cmd_logs(args):
+    from usbzero import logstore
+
+    store = logstore.open_store(args.log_dir)
+    if args.show:
+        record = store.get(int(args.show) if args.show.isdigit() else args.show)
+        if record is None:
+            print(f"No log '{args.show}'.", file=sys.stderr)
+            return 1
+        print(json.dumps(record, indent=4, ensure_ascii=False))
+        return 0
+
+    rows = store.query(limit=args.limit, serial=args.serial, since=args.since, until=args.until,
+                       result=args.result, algorithm=args.algorithm)
+    for row in rows:
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['id']:>6}  {row['timestamp'][:19]}  {row['result']:<6}  "
+                  f"{row['device'] or '':<12}  {row['serial'] or '-':<20}  {row['algorithm']}")
+    return 0
+
+
+def cmd_import_logs(args):
+    from usbzero import logstore
+
+    added, skipped = logstore.LogStore(args.log_dir).import_dir(args.source or args.log_dir)
+    print(f"Indexed {added} log files ({skipped} skipped).")
+    return 0
+
+
+def cmd_verify_logs(args):
+    from usbzero import signing
+
+    if not signing.available():
+        print("Checking signatures needs the cryptography package.", file=sys.stderr)
+        return 1
+    try:
+        key_files = args.keys or [path for path in
+                                  [os.path.join(signing.KEY_DIR, signing.PUBLIC_KEY_NAME)]
+                                  if os.path.exists(path)]
+        trusted = [signing.read_public_key(path) for path in key_files]
+    except (OSError, signing.SigningError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    paths = signing.find_logs(args.paths or [args.log_dir])
+    if not trusted:
+        print("No trusted key given; use --key, or run this where keys/ holds the station's "
+              "key. Logs with good signatures are reported as untrusted.", file=sys.stderr)
+
+    counts = dict.fromkeys(signing.STATUSES, 0)
+    for path, status, key in signing.verify_logs(paths, trusted, args.jobs):
+        counts[status] += 1
+        if args.json:
+            print(json.dumps({"log": path, "status": status, "key": key}))
+        elif status != signing.STATUS_VALID or args.all:
+            print(f"{status:<10}  {path}")
+    bad = len(paths) - counts[signing.STATUS_VALID]
+    if not args.json:
+        print(f"{len(paths)} logs checked: " +
+              ", ".join(f"{n} {status}" for status, n in counts.items() if n))
+    return 1 if bad else 0
+
+
+def parse_pattern(text):
+    try:
+        pattern = bytes.fromhex(text[2:] if text.lower().startswith("0x") else text)
+    except ValueError:
+        pattern = b""
+    if not pattern:
+        raise argparse.ArgumentTypeError(f"invalid hex pattern '{text}'")
+    return pattern
+
+
+def build_parser():
+    from usbzero import badblocks, drives, erase, scheduler, verify
+    from usbzero.logs import LOG_DIR
+
+    parser = argparse.ArgumentParser(prog="usbzero", description="USBZero secure USB drive wiper")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("list", help="list removable drives")
+    p.add_argument("--json", action="store_true", help="print one JSON object per drive")
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser("wipe", help="wipe a drive")
+    p.add_argument("device", help="block device, loop device or image file")
+    p.add_argument("-a", "--algorithm", type=parse_algorithm,
+                   help="random, zeros, ones, dod or gutmann (default: random)")
+    p.add_argument("-p", "--passes", type=int, help="pass count (default depends on algorithm)")
+    p.add_argument("--block-size", type=parse_block_size,
+                   help="write size (default: calibrated per drive model, else 4M)")
+    p.add_argument("--depth", type=parse_count,
+                   help="buffers in flight (default: calibrated, else 2)")
+    p.add_argument("--stripes", type=parse_count,
+                   help="regions written concurrently (default: calibrated, else 1)")
+    p.add_argument("--no-tune", dest="tune", action="store_false",
+                   help="skip calibration and use 4M blocks, 2 buffers and 1 stripe unless given")
+    p.add_argument("--retune", action="store_true",
+                   help="calibrate again even if this drive model has cached settings")
+    p.add_argument("--no-probe", dest="probe", action="store_false",
+                   help="skip the fake-capacity probe before the wipe")
+    p.add_argument("--no-direct", dest="direct", action="store_false",
+                   help="write through the page cache instead of O_DIRECT")
+    p.add_argument("--strict", dest="tolerate_errors", action="store_false",
+                   help="abort on the first write error instead of mapping bad sectors")
+    p.add_argument("--error-retries", type=int, default=badblocks.RETRIES,
+                   help="extra attempts at a failing sector (default: %(default)s)")
+    p.add_argument("--error-budget", type=float, default=badblocks.TIME_BUDGET,
+                   help="seconds per pass spent mapping bad sectors (default: %(default)s)")
+    p.add_argument("--verify", choices=verify.VERIFY_MODES,
+                   help="read back the last pass, every pass, or random samples of the last pass")
+    p.add_argument("--samples", type=int, default=verify.DEFAULT_SAMPLES,
+                   help="random blocks read by --verify sample")
+    p.add_argument("--erase", choices=erase.STRATEGIES, default=erase.STRATEGY_OVERWRITE,
+                   help="use sanitize or (secure) discard instead of overwriting where the "
+                        "device supports it; 'auto' picks the strongest (default: overwrite)")
+    p.add_argument("--format", nargs="?", choices=drives.FORMAT_PROFILES,
+                   default=drives.FORMAT_NONE, const=drives.FORMAT_EXT4,
+                   help="create one partition with this filesystem after the wipe "
+                        "(bare --format means ext4; default: none)")
+    p.add_argument("--hpa-dco", action="store_true", help="permanently remove HPA/DCO first")
+    p.add_argument("--no-log", dest="log", action="store_false", help="do not write a log file")
+    p.add_argument("--log-dir", default=LOG_DIR)
+    p.add_argument("--json", action="store_true", help="print progress as JSON lines")
+    p.add_argument("--resume", action="store_true",
+                   help="continue an interrupted wipe of this drive from its last checkpoint")
+    p.add_argument("-y", "--yes", action="store_true", help="do not ask for confirmation")
+    p.set_defaults(func=cmd_wipe)
+
+    p = commands.add_parser("batch", help="wipe several drives in parallel")
+    p.add_argument("devices", nargs="*", help="block devices or image files")
+    p.add_argument("--all", action="store_true", help="wipe every removable drive")
+    p.add_argument("-a", "--algorithm", type=parse_algorithm,
+                   help="random, zeros, ones, dod or gutmann (default: random)")
+    p.add_argument("-p", "--passes", type=int, help="pass count (default depends on algorithm)")
+    p.add_argument("--max-workers", type=parse_count, default=scheduler.DEFAULT_MAX_WORKERS,
+                   help="drives wiped at the same time (default: %(default)s)")
+    p.add_argument("--bus-limit", type=parse_rate, metavar="MB/S",
+                   help="combined write rate of the drives on one USB hub (default: no limit)")
+    p.add_argument("--no-tune", dest="tune", action="store_false",
+                   help="skip calibration and use 4M blocks, 2 buffers and 1 stripe")
+    p.add_argument("--no-probe", dest="probe", action="store_false",
+                   help="skip the fake-capacity probe before each wipe")
+    p.add_argument("--no-direct", dest="direct", action="store_false",
+                   help="write through the page cache instead of O_DIRECT")
+    p.add_argument("--verify", choices=verify.VERIFY_MODES,
+                   help="read back the last pass, every pass, or random samples of the last pass")
+    p.add_argument("--erase", choices=erase.STRATEGIES, default=erase.STRATEGY_OVERWRITE,
+                   help="use sanitize or (secure) discard where supported (default: overwrite)")
+    p.add_argument("--format", nargs="?", choices=drives.FORMAT_PROFILES,
+                   default=drives.FORMAT_NONE, const=drives.FORMAT_EXT4,
+                   help="create one partition with this filesystem after each wipe")
+    p.add_argument("--no-log", dest="log", action="store_false", help="do not write log files")
+    p.add_argument("--log-dir", default=LOG_DIR)
+    p.add_argument("--json", action="store_true", help="print the jobs table as JSON lines")
+    p.add_argument("-y", "--yes", action="store_true", help="do not ask for confirmation")
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser("probe", help="detect fake capacity in seconds (overwrites "
+                                          "the probed blocks)")
+    p.add_argument("device")
+    p.add_argument("--json", action="store_true", help="print the result as JSON lines")
+    p.add_argument("-y", "--yes", action="store_true", help="do not ask for confirmation")
+    p.set_defaults(func=cmd_probe)
+
+    p = commands.add_parser("audit", help="check that a drive holds a fixed pattern")
+    p.add_argument("device")
+    p.add_argument("--pattern", type=parse_pattern, default=b"\x00",
+                   help="expected hex pattern (default 00)")
+    p.add_argument("--samples", type=int, default=verify.DEFAULT_SAMPLES,
+                   help="random blocks to read (default %(default)s)")
+    p.add_argument("--unwiped-fraction", type=float, default=verify.DEFAULT_UNWIPED_FRACTION,
+                   help="fraction of missed data the confidence figure refers to")
+    p.add_argument("--full", action="store_true", help="read the whole drive instead of sampling")
+    p.add_argument("--log", metavar="LOG",
+                   help="check blocks against the Merkle tree of this wipe log instead of a pattern")
+    p.add_argument("--block", type=int, action="append", dest="blocks", metavar="INDEX",
+                   help="with --log: block to check (repeatable; default: random blocks)")
+    p.add_argument("--json", action="store_true", help="print progress as JSON lines")
+    p.set_defaults(func=cmd_audit)
+
+    from usbzero import logstore
+
+    p = commands.add_parser("logs", help="search the wipe log store")
+    p.add_argument("--serial")
+    p.add_argument("--since", help="YYYY-MM-DD or ISO timestamp")
+    p.add_argument("--until", help="YYYY-MM-DD (inclusive) or ISO timestamp")
+    p.add_argument("--result", choices=logstore.RESULTS)
+    p.add_argument("-a", "--algorithm", type=parse_logged_algorithm,
+                   help="overwrite algorithm, or sanitize, secure-discard or discard")
+    p.add_argument("--limit", type=int, default=logstore.DEFAULT_LIMIT)
+    p.add_argument("--show", metavar="KEY", help="print one log by id, uuid or file name")
+    p.add_argument("--log-dir", default=LOG_DIR)
+    p.add_argument("--json", action="store_true", help="print one JSON object per log")
+    p.set_defaults(func=cmd_logs)
+
+    p = commands.add_parser("import-logs", help="index existing JSON/.sig log files")
+    p.add_argument("source", nargs="?", help="directory with log files (default: --log-dir)")
+    p.add_argument("--log-dir", default=LOG_DIR)
+    p.set_defaults(func=cmd_import_logs)
+
+    p = commands.add_parser("verify-logs", help="check the signatures of wipe logs")
+    p.add_argument("paths", nargs="*", help="log files or directories (default: --log-dir)")
+    p.add_argument("--key", action="append", dest="keys", metavar="PUB",
+                   help="trusted public key file (repeatable; default: this station's key)")
+    p.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    p.add_argument("--all", action="store_true", help="list valid logs too")
+    p.add_argument("--log-dir", default=LOG_DIR)
+    p.add_argument("--json", action="store_true", help="print one JSON object per log")
+    p.set_defaults(func=cmd_verify_logs)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
@@ -0,0 +1,233 @@
+"""Linux drive discovery and preparation helpers.
+
+These used to live in usbzero_linux.py. They raise DriveError instead of
+showing dialogs so the GUI and the CLI can report failures their own way.
+"""
+
+import errno
+import os
+import re
+import stat
+import subprocess
+import time
+
+from usbzero import inventory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PARTITION_TIMEOUT = 10.0  # Seconds to wait for a new partition's device node
+PARTITION_POLL = 0.02
+BLKRRPART = 0x125F  # linux/fs.h: _IO(0x12, 95), re-read partition table
+
+FORMAT_NONE = "none"
+FORMAT_EXFAT = "exfat"
+FORMAT_VFAT = "vfat"
+FORMAT_EXT4 = "ext4"
+FORMAT_PROFILES = (FORMAT_NONE, FORMAT_EXFAT, FORMAT_VFAT, FORMAT_EXT4)
+
+# Partition table, parted filesystem type and mkfs command per profile. The
+# drive has just been wiped, so mkfs must not discard it again, and ext4
+# leaves inode table and journal zeroing to the kernel after mounting.
+_FORMAT_COMMANDS = {
+    FORMAT_EXFAT: ('msdos', 'ntfs', ['mkfs.exfat']),
+    FORMAT_VFAT: ('msdos', 'fat32', ['mkfs.vfat', '-F', '32']),
+    FORMAT_EXT4: ('gpt', 'ext4', ['mkfs.ext4', '-F', '-E',
+                                  'lazy_itable_init=1,lazy_journal_init=1,nodiscard']),
+}
+
+
+class DriveError(Exception):
+    """Raised when a drive operation fails."""
+
+
+def check_hdparm_availability():
+    """Check if hdparm is installed."""
+    try:
+        subprocess.run(['which', 'hdparm'], check=True, capture_output=True)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+def check_sudo_privileges():
+    """Check if the script has sudo privileges."""
+    try:
+        subprocess.run(['sudo', '-n', 'true'], check=True, capture_output=True)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+def list_removable_drives():
+    """List available removable drives on Linux."""
+    return [drive.path for drive in inventory.removable()]
+
+
+def _udev_properties(device_path):
+    try:
+        result = subprocess.run(
+            ['udevadm', 'info', '--query=property', '--name=' + device_path],
+            capture_output=True, text=True, check=True
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return {}
+    return dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+
+
+def get_device_model(device_path):
+    """Get device model information on Linux."""
+    # sysfs has it for any real disk; udev is only asked for anything else
+    drive = inventory.lookup(device_path)
+    if drive is not None and drive.model != "Unknown":
+        return drive.model
+    model = _udev_properties(device_path).get('ID_MODEL')
+    return model.replace('_', ' ') if model else "Unknown"
+
+
+def get_device_serial(device_path):
+    """Get the device serial number, or None if it has none."""
+    drive = inventory.lookup(device_path)
+    if drive is not None and drive.serial:
+        return drive.serial
+    properties = _udev_properties(device_path)
+    return properties.get('ID_SERIAL_SHORT') or properties.get('ID_SERIAL') or None
+
+
+def remove_hpa_dco(device_path, update_status):
+    """Remove HPA and DCO from the device."""
+    try:
+        # First, restore DCO
+        update_status("Restoring DCO configuration...")
+        subprocess.run(['sudo', 'hdparm', '--dco-restore', device_path],
+                       capture_output=True, text=True, check=True)
+
+        # Get current max sectors
+        update_status("Reading maximum sector count...")
+        result = subprocess.run(['sudo', 'hdparm', '-N', device_path],
+                                capture_output=True, text=True, check=True)
+
+        # Parse the max sectors from output
+        match = re.search(r'max sectors\s+=\s+(\d+)', result.stdout)
+        if not match:
+            raise DriveError("Error during HPA/DCO removal: Could not determine maximum sector count")
+
+        max_sectors = match.group(1)
+
+        # Set HPA to maximum (effectively removing it)
+        update_status("Removing HPA configuration...")
+        subprocess.run(['sudo', 'hdparm', '-N', f'p{max_sectors}', device_path],
+                       capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise DriveError(f"Error during HPA/DCO removal: {e.stderr}")
+    except OSError as e:
+        raise DriveError(f"Error during HPA/DCO removal: {e}")
+
+
+def partition_path(device_path, number=1):
+    """Return the device node of a partition.
+
+    The kernel puts a "p" between the disk and partition number when the
+    disk name ends in a digit: sdb1, but mmcblk0p1, nvme0n1p1 and loop0p1.
+    Symlinks such as /dev/disk/by-id/... are resolved first, since their
+    names say nothing about the kernel's.
+    """
+    device_path = os.path.realpath(device_path)
+    separator = "p" if device_path[-1].isdigit() else ""
+    return f"{device_path}{separator}{number}"
+
+
+def _reread_partitions(device_path):
+    if fcntl is None:
+        return
+    try:
+        fd = os.open(device_path, os.O_RDONLY)
+        try:
+            fcntl.ioctl(fd, BLKRRPART)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        # EBUSY: a partition is in use, but then the kernel knows the table
+        if e.errno not in (errno.EBUSY, errno.EINVAL, errno.ENOTTY, errno.EACCES, errno.EPERM):
+            raise
+
+
+def _partition_ready(partition):
+    name = os.path.basename(partition)
+    if not os.path.exists(os.path.join("/sys/class/block", name)):
+        return False
+    try:
+        return stat.S_ISBLK(os.stat(partition).st_mode)
+    except OSError:
+        return False
+
+
+def wait_for_partition(device_path, number=1, timeout=PARTITION_TIMEOUT):
+    """Wait until a freshly created partition can be used; returns its path.
+
+    Waits for udev to finish processing the events from the new partition
+    table, asks the kernel to re-read the table if the partition is still
+    unknown, and then polls for the device node until timeout.
+    """
+    partition = partition_path(device_path, number)
+    deadline = time.monotonic() + timeout
+    try:
+        subprocess.run(['udevadm', 'settle', f'--timeout={max(1, int(timeout))}'],
+                       capture_output=True, timeout=timeout + 1)
+    except (subprocess.SubprocessError, FileNotFoundError):
+        pass
+    if _partition_ready(partition):
+        return partition
+
+    try:
+        _reread_partitions(device_path)
+    except OSError as e:
+        raise DriveError(f"Could not re-read the partition table of {device_path}: {e}")
+    while not _partition_ready(partition):
+        if time.monotonic() > deadline:
+            raise DriveError(f"Partition {partition} did not appear within {timeout:g} s")
+        time.sleep(PARTITION_POLL)
+    return partition
+
+
+def format_drive(device_path, profile=FORMAT_EXT4):
+    """Partition and format the drive; returns the timings for the log.
+
+    profile is one of FORMAT_PROFILES. For FORMAT_NONE nothing is done and
+    None is returned.
+    """
+    if profile not in FORMAT_PROFILES:
+        raise ValueError(f"Unknown format profile: {profile}")
+    if profile == FORMAT_NONE:
+        return None
+    table, fs_type, mkfs = _FORMAT_COMMANDS[profile]
+    timings = {}
+    start = time.perf_counter()
+    try:
+        # Create a new partition table and one partition spanning the drive
+        subprocess.run(['sudo', 'parted', '-s', device_path, 'mklabel', table],
+                       check=True, capture_output=True)
+        subprocess.run(['sudo', 'parted', '-s', device_path, 'mkpart', 'primary', fs_type,
+                        '0%', '100%'], check=True, capture_output=True)
+        timings["partition_seconds"] = time.perf_counter() - start
+
+        # Wait for the system to recognize the new partition
+        step = time.perf_counter()
+        partition = wait_for_partition(device_path)
+        timings["wait_seconds"] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        subprocess.run(['sudo'] + mkfs + [partition], check=True, capture_output=True)
+        timings["mkfs_seconds"] = time.perf_counter() - step
+    except subprocess.CalledProcessError as e:
+        raise DriveError(f"Format error: {e.stderr.decode() if e.stderr else str(e)}")
+    except OSError as e:
+        raise DriveError(f"Format error: {e}")
+
+    result = {"profile": profile, "partition": partition, "table": table,
+              "seconds": time.perf_counter() - start}
+    result.update(timings)
+    return {key: round(value, 3) if isinstance(value, float) else value
+            for key, value in result.items()}
@@ -0,0 +1,340 @@
+"""In-process overwrite engine.
+
+Opens the target once, finds its real size and streams a pattern across the
+whole device with large writes, syncing once at the end of each pass. Works
+the same on block devices, loop devices and plain image files.
+
+With direct=True the device is opened with O_DIRECT so a pass neither fills
+RAM with dirty pages nor evicts the page cache. Filesystems that refuse
+O_DIRECT (tmpfs, for example) fall back to buffered writes, with the written
+range dropped from the cache after each pass.
+
+With stripes=N the device is cut into N block-aligned regions that are
+written at the same time, each by its own pipeline and os.pwrite on the
+shared descriptor. Bridges and enclosures that queue several commands
+(UAS, NVMe) are then kept busy instead of seeing one request at a time.
+
+With tolerate_errors=True a block that fails with a media error is bisected
+down to the failing sectors, which are skipped and recorded, and the pass
+goes on (see badblocks.py).
+"""
+
+import errno
+import os
+import threading
+import time
+
+from usbzero import badblocks, merkle as merkle_tree, pipeline, rng
+from usbzero.buffers import BufferPool
+
+BLOCK_SIZE = 4 * 1024 * 1024  # 4 MiB, a multiple of every common sector size
+SECTOR_SIZE = 512
+DIRECT_ALIGN = 4096  # Covers both 512e and 4Kn logical sectors
+PIPELINE_DEPTH = 2  # Double buffering: generate one block while writing another
+STRIPES = 1  # Regions written concurrently; 1 is the plain sequential pass
+CHECKPOINT_INTERVAL = 30.0  # Seconds between durable checkpoints when requested
+
+
+class OverwriteError(Exception):
+    """Raised when a pass cannot be written."""
+
+
+class PassResult:
+    """Outcome of a single overwrite pass."""
+
+    def __init__(self, device_path, bytes_written, seconds, direct=False, stats=None):
+        self.device_path = device_path
+        self.bytes_written = bytes_written
+        self.seconds = seconds
+        self.direct = direct
+        self.stats = stats
+        # Filled in by wipe.run_passes
+        self.pass_index = None
+        self.label = None
+        self.seed = None
+        self.verify = None
+        self.start_offset = 0  # Non-zero when the pass was resumed
+        self.merkle = None  # merkle.MerkleTree of the blocks, when requested
+        self.stripes = None  # [{"start", "end", "seconds", "mb_per_s"}, ...] for striped passes
+        self.bad_regions = None  # badblocks.BadRegions of a tolerant pass
+
+    @classmethod
+    def from_dict(cls, device_path, data):
+        """Rebuild a result recorded by to_dict(), e.g. from a checkpoint journal."""
+        result = cls(device_path, data["bytes_written"], data["seconds"], data.get("direct_io", False))
+        result.pass_index = data["pass"] - 1
+        result.label = data["pattern"]
+        result.start_offset = data.get("start_offset", 0)
+        return result
+
+    @property
+    def mb_per_s(self):
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes_written / self.seconds / 1e6
+
+    def to_dict(self):
+        return {
+            "pass": None if self.pass_index is None else self.pass_index + 1,
+            "pattern": self.label,
+            "bytes_written": self.bytes_written,
+            "start_offset": self.start_offset,
+            "seconds": round(self.seconds, 3),
+            "mb_per_s": round(self.mb_per_s, 1),
+            "direct_io": self.direct,
+            "pipeline": self.stats.to_dict() if self.stats else None,
+            "verify": self.verify.to_dict() if self.verify else None,
+            "merkle": self.merkle.to_dict() if self.merkle else None,
+            "stripes": self.stripes,
+            "bad_regions": self.bad_regions.to_dict() if self.bad_regions is not None else None,
+        }
+
+
+def open_device(device_path, direct=False):
+    """Open a block device or image file for writing without truncating it.
+
+    Returns (fd, direct) where direct tells whether O_DIRECT was granted.
+    """
+    flags = os.O_WRONLY | getattr(os, "O_BINARY", 0)
+    o_direct = getattr(os, "O_DIRECT", 0)
+    if direct and o_direct:
+        try:
+            return os.open(device_path, flags | o_direct), True
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+    return os.open(device_path, flags), False
+
+
+def drop_cache(fd):
+    """Ask the kernel to evict a synced file's pages from the page cache."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def get_device_size(fd):
+    """Return the size in bytes of an open block device or file."""
+    size = os.lseek(fd, 0, os.SEEK_END)
+    os.lseek(fd, 0, os.SEEK_SET)
+    return size
+
+
+def write_at(fd, data, offset):
+    """Write all of data at offset, retrying short writes."""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        if written <= 0:
+            raise OverwriteError(f"Device refused write at offset {offset}")
+        view = view[written:]
+        offset += written
+
+
+def write_pass(device_path, fill=None, block_size=BLOCK_SIZE, on_progress=None,
+               direct=False, depth=PIPELINE_DEPTH, start_offset=0, on_checkpoint=None,
+               checkpoint_interval=CHECKPOINT_INTERVAL, merkle=False, stripes=STRIPES,
+               tolerate_errors=False, error_retries=badblocks.RETRIES,
+               error_budget=badblocks.TIME_BUDGET, writer=write_at):
+    """Overwrite the whole device once.
+
+    fill(buf, offset) is called for every block and must fill the writable
+    memoryview it is given with the data for that device offset; it defaults
+    to a freshly keyed random stream. on_progress, if given, is called with
+    (bytes_done, total_bytes) after every block. direct requests O_DIRECT
+    writes, see the module docstring. depth is the number of buffers in
+    flight between the generator and writer threads; 1 disables overlap.
+
+    start_offset resumes an interrupted pass. When on_checkpoint is given
+    the device is synced every checkpoint_interval seconds and
+    on_checkpoint(offset) is called with the offset known to be durable.
+
+    merkle=True hashes every block into a merkle.MerkleTree, kept as the
+    result's .merkle. Blocks are hashed on merkle.HASH_WORKERS threads per
+    stripe while the pipeline goes on writing, each pipeline holding that
+    many extra buffers for blocks whose hash is still running; blocks before
+    start_offset are regenerated with fill and hashed without writing them
+    again.
+
+    stripes > 1 writes that many regions concurrently (see the module
+    docstring), each with its own depth buffers. on_progress then gets the
+    sum over all stripes, and checkpoints record how far the first stripe
+    got, the only prefix of the device known to be complete.
+
+    tolerate_errors=True maps blocks that fail with EIO down to the sector
+    instead of failing the pass, retrying each failing sector error_retries
+    times and spending at most error_budget seconds on it per pass. The
+    unwritable ranges are kept as the result's .bad_regions. writer(fd,
+    data, offset) does the writes; passing a wrapper of write_at that
+    raises EIO for chosen ranges simulates a failing device.
+    """
+    if block_size <= 0 or block_size % DIRECT_ALIGN:
+        raise ValueError(f"Block size must be a positive multiple of {DIRECT_ALIGN}")
+    if start_offset % block_size:
+        raise ValueError("Resume offset must be a multiple of the block size")
+    if fill is None:
+        fill = rng.KeyedStream().fill
+
+    fd, direct = open_device(device_path, direct)
+    try:
+        size = get_device_size(fd)
+        if size == 0:
+            raise OverwriteError(f"{device_path} reports a size of 0 bytes")
+
+        ranges = stripe_ranges(start_offset, size, block_size, stripes)
+        tree = merkle_tree.MerkleTree(size, block_size) if merkle else None
+        hash_depth = merkle_tree.HASH_WORKERS if merkle else 0
+        hasher = merkle_tree.Hasher(tree, hash_depth * len(ranges)) if merkle else None
+        abort = threading.Event()
+        bad = None
+        if tolerate_errors:
+            # O_DIRECT writes must stay aligned to the logical sector
+            sector = badblocks.logical_sector_size(fd, DIRECT_ALIGN) if direct else SECTOR_SIZE
+            bad = badblocks.BadRegions(sector, error_retries, error_budget)
+
+        def write(chunk, offset):
+            if abort.is_set():
+                raise OverwriteError("Pass aborted: another stripe failed")
+            if direct and len(chunk) % DIRECT_ALIGN:
+                # O_DIRECT cannot write an unaligned tail
+                _write_buffered(device_path, chunk, offset)
+            elif bad is None:
+                writer(fd, chunk, offset)
+            else:
+                try:
+                    writer(fd, chunk, offset)
+                except OSError as e:
+                    if e.errno not in badblocks.MEDIA_ERRORS:
+                        raise
+                    badblocks.write_tolerant(writer, fd, chunk, offset, bad)
+
+        last_checkpoint = [time.monotonic()]
+
+        def progress(done, total, durable=None):
+            if on_progress:
+                on_progress(done, total)
+            now = time.monotonic()
+            if on_checkpoint and now - last_checkpoint[0] >= checkpoint_interval and done < total:
+                os.fsync(fd)
+                on_checkpoint(done if durable is None else durable)
+                last_checkpoint[0] = now
+
+        if not (on_progress or on_checkpoint):
+            progress = None
+
+        start = time.perf_counter()
+        stripe_info = None
+        try:
+            if tree and start_offset:
+                with BufferPool(1, block_size) as pool:
+                    _hash_written(tree, fill, pool, start_offset)
+            if len(ranges) == 1:
+                with BufferPool(depth + hash_depth, block_size) as pool:
+                    stats = pipeline.run(size, fill, write, pool, progress, start_offset,
+                                         hasher, hash_depth)
+            else:
+                stats, stripe_info = _write_stripes(ranges, fill, write, depth, block_size,
+                                                    progress, abort, hasher, hash_depth)
+        finally:
+            if hasher:
+                hasher.close()
+
+        # One sync per pass instead of one per block
+        os.fsync(fd)
+        if not direct:
+            drop_cache(fd)
+        seconds = time.perf_counter() - start
+        result = PassResult(device_path, size - start_offset, seconds, direct, stats)
+        result.start_offset = start_offset
+        result.merkle = tree
+        result.stripes = stripe_info
+        result.bad_regions = bad
+        return result
+    finally:
+        os.close(fd)
+
+
+def stripe_ranges(start, end, block_size, stripes):
+    """Split start..end into at most stripes block-aligned (begin, end) ranges."""
+    blocks = -(-(end - start) // block_size)
+    count = max(1, min(stripes, blocks))
+    per_stripe = -(-blocks // count)
+    ranges = []
+    begin = start
+    while begin < end:
+        stop = min(end, begin + per_stripe * block_size)
+        ranges.append((begin, stop))
+        begin = stop
+    return ranges or [(start, end)]
+
+
+def _write_stripes(ranges, fill, write, depth, block_size, progress, abort, hasher=None,
+                   hash_depth=0):
+    # One pipeline (generator thread plus this writer thread) per stripe
+    done = [0] * len(ranges)
+    total = ranges[-1][1]
+    lock = threading.Lock()
+    results = [None] * len(ranges)
+    errors = []
+
+    def run(index):
+        begin, end = ranges[index]
+
+        def stripe_progress(position, _end):
+            with lock:
+                done[index] = position - begin
+                if progress:
+                    progress(ranges[0][0] + sum(done), total, ranges[0][0] + done[0])
+
+        try:
+            with BufferPool(depth + hash_depth, block_size) as pool:
+                began = time.perf_counter()
+                stats = pipeline.run(end, fill, write, pool, stripe_progress, begin, hasher,
+                                     hash_depth)
+                results[index] = (stats, time.perf_counter() - began)
+        except BaseException as e:
+            # Recorded before the abort, so errors[0] is the cause and not
+            # one of the stripes it stopped
+            errors.append(e)
+            abort.set()
+
+    threads = [threading.Thread(target=run, args=(i,), name=f"usbzero-stripe-{i}", daemon=True)
+               for i in range(len(ranges))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    stats = pipeline.PipelineStats.combine([stats for stats, _ in results])
+    info = [{"start": begin, "end": end, "seconds": round(seconds, 3),
+             "mb_per_s": round((end - begin) / seconds / 1e6, 1) if seconds > 0 else 0.0}
+            for (begin, end), (_, seconds) in zip(ranges, results)]
+    return stats, info
+
+
+def _hash_written(tree, fill, pool, end):
+    # Rebuild the leaves of the blocks an interrupted pass already wrote
+    buf = pool.acquire()
+    try:
+        for offset in range(0, end, pool.size):
+            fill(buf, offset)
+            tree.add(offset, buf)
+    finally:
+        pool.release(buf)
+
+
+def _write_buffered(device_path, data, offset):
+    fd, _ = open_device(device_path)
+    try:
+        write_at(fd, data, offset)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,400 @@
+"""Erase strategies: hardware fast paths with the overwrite engine as fallback.
+
+Flash media can often erase itself far faster than the host can overwrite
+it. probe() finds out what a block device offers:
+
+* sanitize - NVMe Sanitize or ATA SANITIZE (crypto scramble or block
+  erase), driven through nvme-cli and hdparm. Also reaches spare and
+  remapped blocks, which no host write can.
+* secure-discard - the BLKSECDISCARD ioctl, which eMMC/SD cards implement
+  by physically erasing the discarded blocks. Erased blocks read back as
+  all zeros or, on parts with ERASED_MEM_CONT=1, as all 0xFF.
+* discard - plain BLKDISCARD (TRIM). The device may keep the old data in
+  blocks it no longer maps, so it is only used when asked for explicitly,
+  and only counts when reads come back as zeros afterwards.
+* overwrite - the pass schedule of the chosen algorithm (engine.py).
+
+erase() tries the chosen strategy, or for "auto" the strongest supported
+one, and falls back to overwriting when a strategy is unavailable or fails.
+Every attempt and its timing ends up in EraseResult.to_dict() for the log.
+Loop devices support discard, so that path can be tried without a real
+drive.
+"""
+
+import errno
+import json
+import os
+import re
+import stat
+import struct
+import subprocess
+import time
+
+from usbzero import engine, patterns, progress, verify as verifier, wipe
+from usbzero.buffers import BufferPool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STRATEGY_AUTO = "auto"
+STRATEGY_SANITIZE = "sanitize"
+STRATEGY_SECURE_DISCARD = "secure-discard"
+STRATEGY_DISCARD = "discard"
+STRATEGY_OVERWRITE = "overwrite"
+STRATEGIES = (STRATEGY_AUTO, STRATEGY_SANITIZE, STRATEGY_SECURE_DISCARD, STRATEGY_DISCARD,
+              STRATEGY_OVERWRITE)
+AUTO_ORDER = (STRATEGY_SANITIZE, STRATEGY_SECURE_DISCARD)
+FAST_STRATEGIES = (STRATEGY_SANITIZE, STRATEGY_SECURE_DISCARD, STRATEGY_DISCARD)
+
+# linux/fs.h: _IO(0x12, 119) and _IO(0x12, 125)
+BLKDISCARD = 0x1277
+BLKSECDISCARD = 0x127D
+# What a discarded block may read back as; the first value is the default
+ERASED_VALUES = {
+    STRATEGY_SECURE_DISCARD: (b"\x00", b"\xff"),  # 0xFF on eMMC/SD with ERASED_MEM_CONT=1
+    STRATEGY_DISCARD: (b"\x00",),
+}
+
+DISCARD_CHUNK = 1024 ** 3  # Bytes per ioctl, so progress can be reported
+SANITIZE_TIMEOUT = 4 * 3600.0
+SANITIZE_POLL = 2.0
+
+# NVMe SANACT values and the SANICAP bits that advertise them
+_NVME_ACTIONS = (("crypto-erase", 4, 0x4), ("block-erase", 2, 0x2))
+# hdparm options for the ATA SANITIZE actions, fastest first
+_ATA_ACTIONS = (("crypto-scramble", "CRYPTO_SCRAMBLE_EXT", "--sanitize-crypto-scramble"),
+                ("block-erase", "BLOCK_ERASE_EXT", "--sanitize-block-erase"))
+
+
+class EraseError(Exception):
+    """Raised when an erase strategy cannot be carried out."""
+
+
+class Capabilities:
+    """What a device supports besides plain writes."""
+
+    def __init__(self, device_path):
+        self.device_path = device_path
+        self.block_device = False
+        self.discard = False
+        self.secure_discard = False
+        self.sanitize = None  # "nvme" or "ata"
+        self.sanitize_actions = []
+
+    def supports(self, strategy):
+        if strategy == STRATEGY_SANITIZE:
+            return bool(self.sanitize_actions)
+        if strategy == STRATEGY_SECURE_DISCARD:
+            return self.secure_discard
+        if strategy == STRATEGY_DISCARD:
+            return self.discard
+        return strategy == STRATEGY_OVERWRITE
+
+    def to_dict(self):
+        return {
+            "block_device": self.block_device,
+            "discard": self.discard,
+            "secure_discard": self.secure_discard,
+            "sanitize": self.sanitize,
+            "sanitize_actions": self.sanitize_actions,
+        }
+
+
+def _sysfs_queue(device_path, attribute):
+    name = os.path.basename(os.path.realpath(device_path))
+    try:
+        with open(f"/sys/class/block/{name}/queue/{attribute}") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _ioctl_range(fd, request, start, length):
+    fcntl.ioctl(fd, request, struct.pack("QQ", start, length))
+
+
+def _probe_secure_discard(device_path):
+    # A zero-length request erases nothing; the kernel still answers
+    # EOPNOTSUPP when the device cannot do secure erase
+    try:
+        fd = os.open(device_path, os.O_WRONLY)
+        try:
+            _ioctl_range(fd, BLKSECDISCARD, 0, 0)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        return e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EACCES, errno.EPERM)
+    return True
+
+
+def _run(args):
+    return subprocess.run(['sudo', '-n'] + args, capture_output=True, text=True, check=True)
+
+
+def _probe_nvme(device_path):
+    try:
+        result = _run(['nvme', 'id-ctrl', device_path, '-o', 'json'])
+        sanicap = int(json.loads(result.stdout).get("sanicap", 0))
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return []
+    return [name for name, _, bit in _NVME_ACTIONS if sanicap & bit]
+
+
+def _probe_ata(device_path):
+    try:
+        result = _run(['hdparm', '-I', device_path])
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return []
+    # A frozen drive refuses SANITIZE until it is power cycled
+    if "SANITIZE" not in result.stdout or re.search(r"^\s+frozen\s*$", result.stdout, re.M):
+        return []
+    return [name for name, command, _ in _ATA_ACTIONS if command in result.stdout]
+
+
+def probe(device_path):
+    """Return the Capabilities of device_path."""
+    caps = Capabilities(device_path)
+    try:
+        caps.block_device = stat.S_ISBLK(os.stat(device_path).st_mode)
+    except OSError:
+        return caps
+    if not caps.block_device or fcntl is None:
+        return caps
+
+    caps.discard = int(_sysfs_queue(device_path, "discard_max_bytes") or 0) > 0
+    caps.secure_discard = caps.discard and _probe_secure_discard(device_path)
+    name = os.path.basename(os.path.realpath(device_path))
+    if name.startswith("nvme"):
+        caps.sanitize_actions = _probe_nvme(device_path)
+        caps.sanitize = "nvme" if caps.sanitize_actions else None
+    else:
+        caps.sanitize_actions = _probe_ata(device_path)
+        caps.sanitize = "ata" if caps.sanitize_actions else None
+    return caps
+
+
+def discard(device_path, secure=False, on_progress=None):
+    """Discard the whole device in DISCARD_CHUNK pieces. Returns bytes discarded."""
+    request = BLKSECDISCARD if secure else BLKDISCARD
+    fd = os.open(device_path, os.O_WRONLY)
+    try:
+        size = engine.get_device_size(fd)
+        offset = 0
+        while offset < size:
+            length = min(DISCARD_CHUNK, size - offset)
+            _ioctl_range(fd, request, offset, length)
+            offset += length
+            if on_progress:
+                on_progress(offset, size)
+    finally:
+        os.close(fd)
+    return size
+
+
+def _nvme_sanitize_state(device_path):
+    result = _run(['nvme', 'sanitize-log', device_path, '-o', 'json'])
+    log = json.loads(result.stdout)
+    # Newer nvme-cli nests the log under the device name
+    if "sstat" not in log and len(log) == 1:
+        log = next(iter(log.values()))
+    return int(log["sstat"]) & 0x7  # 1 done, 2 in progress, 3 failed
+
+
+def sanitize(device_path, caps, timeout=SANITIZE_TIMEOUT):
+    """Start the fastest supported sanitize action and wait for it."""
+    action = caps.sanitize_actions[0]
+    deadline = time.monotonic() + timeout
+    try:
+        if caps.sanitize == "nvme":
+            sanact = dict((name, value) for name, value, _ in _NVME_ACTIONS)[action]
+            _run(['nvme', 'sanitize', device_path, f'--sanact={sanact}'])
+            while True:
+                state = _nvme_sanitize_state(device_path)
+                if state == 1:
+                    return action
+                if state == 3:
+                    raise EraseError("NVMe sanitize reported failure")
+                if time.monotonic() > deadline:
+                    raise EraseError("Timed out waiting for NVMe sanitize")
+                time.sleep(SANITIZE_POLL)
+
+        option = dict((name, opt) for name, _, opt in _ATA_ACTIONS)[action]
+        _run(['hdparm', '--yes-i-know-what-i-am-doing', option, device_path])
+        while True:
+            status = _run(['hdparm', '--sanitize-status', device_path]).stdout
+            if not re.search(r"In Process", status, re.IGNORECASE):
+                if re.search(r"Completed Without Error", status, re.IGNORECASE):
+                    return action
+                raise EraseError("ATA sanitize did not complete: " + status.strip())
+            if time.monotonic() > deadline:
+                raise EraseError("Timed out waiting for ATA sanitize")
+            time.sleep(SANITIZE_POLL)
+    except subprocess.CalledProcessError as e:
+        raise EraseError(f"Sanitize failed: {e.stderr.strip() if e.stderr else e}")
+    except (FileNotFoundError, ValueError, KeyError) as e:
+        raise EraseError(f"Sanitize failed: {e}")
+
+
+class Attempt:
+    """One strategy that was tried."""
+
+    def __init__(self, strategy, ok, seconds, detail=None, error=None):
+        self.strategy = strategy
+        self.ok = ok
+        self.seconds = seconds
+        self.detail = detail
+        self.error = error
+
+    def to_dict(self):
+        data = {"strategy": self.strategy, "ok": self.ok, "seconds": round(self.seconds, 3)}
+        if self.detail:
+            data["detail"] = self.detail
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class EraseResult:
+    """How a device was erased.
+
+    results holds the overwrite PassResults when the overwrite engine ran,
+    and check the read-back that confirmed a discard.
+    """
+
+    def __init__(self, device_path, strategy, capabilities, attempts, results=None, check=None):
+        self.device_path = device_path
+        self.strategy = strategy
+        self.capabilities = capabilities
+        self.attempts = attempts
+        self.results = results or []
+        self.check = check
+
+    def summarize(self):
+        """Lines for the log's deleted_files field."""
+        lines = []
+        for attempt in self.attempts:
+            if attempt.strategy == STRATEGY_OVERWRITE:
+                continue
+            name = attempt.strategy + (f" ({attempt.detail})" if attempt.detail else "")
+            if attempt.ok:
+                lines.append(f"Erase by {name} complete ({attempt.seconds:.2f} s)")
+            else:
+                lines.append(f"Erase by {name} unavailable: {attempt.error}")
+        if self.check is not None:
+            lines.append(f"Read-back after discard: {'OK' if self.check.ok else 'FAILED'} "
+                         f"({self.check.bytes_checked} bytes)")
+        return lines + wipe.summarize(self.results)
+
+    def method(self, algorithm, passes):
+        """Return the (algorithm, passes) to log for a wipe that asked for
+        algorithm and passes: the strategy with 0 passes if it did the job
+        instead of overwriting."""
+        if self.strategy == STRATEGY_OVERWRITE:
+            return algorithm, passes
+        return self.strategy, 0
+
+    def to_dict(self):
+        return {
+            "strategy": self.strategy,
+            "capabilities": self.capabilities.to_dict(),
+            "attempts": [a.to_dict() for a in self.attempts],
+            "check": self.check.to_dict() if self.check is not None else None,
+        }
+
+
+def plan(strategy, caps):
+    """Return the strategies to try, in order, ending with overwrite."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown erase strategy: {strategy}")
+    if strategy == STRATEGY_AUTO:
+        order = [s for s in AUTO_ORDER if caps.supports(s)]
+    elif strategy == STRATEGY_OVERWRITE:
+        order = []
+    else:
+        order = [strategy]
+    return order + [STRATEGY_OVERWRITE]
+
+
+def _erased_value(device_path, values):
+    # The first byte decides which of values the whole device must read as
+    fd, _ = verifier.open_for_read(device_path)
+    try:
+        with BufferPool(1, engine.DIRECT_ALIGN) as pool:
+            buf = pool.acquire()
+            verifier.read_at(fd, buf, 0)
+            first = bytes(buf[:1])
+            pool.release(buf)
+    finally:
+        os.close(fd)
+    return first if first in values else values[0]
+
+
+def _erased_check(device_path, value, verify, samples, tracker):
+    fill = patterns.fixed_pattern(value).fill
+    on_progress = tracker.update if tracker else None
+    if tracker:
+        tracker.begin(0, 0, progress.PHASE_VERIFY, f"0x{value.hex().upper()}")
+    if verify in (verifier.VERIFY_LAST, verifier.VERIFY_ALL):
+        return verifier.verify_pass(device_path, fill, on_progress=on_progress)
+    return verifier.sample_pass(device_path, fill, samples=samples, on_progress=on_progress)
+
+
+def erase(device_path, algorithm, passes, strategy=STRATEGY_AUTO, on_status=None,
+          verify=None, samples=verifier.DEFAULT_SAMPLES, tracker=None, **wipe_options):
+    """Erase device_path with strategy, falling back to overwriting.
+
+    Discards are confirmed by reading the device back (in full when verify
+    is "last" or "all", sampled otherwise): a plain discard must read back
+    as zeros, a secure discard uniformly as 0x00 or 0xFF. A discard that
+    does not counts as failed. The remaining arguments go to
+    wipe.run_passes() for the overwrite fallback. Returns an EraseResult.
+    """
+    caps = probe(device_path) if strategy != STRATEGY_OVERWRITE else Capabilities(device_path)
+    attempts = []
+
+    def status(message):
+        if on_status:
+            on_status(message)
+
+    for name in plan(strategy, caps):
+        if name == STRATEGY_OVERWRITE:
+            break
+        if not caps.supports(name):
+            attempts.append(Attempt(name, False, 0.0, error="not supported by the device"))
+            status(f"{device_path} does not support {name}; overwriting instead")
+            continue
+        status(f"Erasing {device_path} by {name}...")
+        start = time.perf_counter()
+        detail = check = None
+        try:
+            if name == STRATEGY_SANITIZE:
+                detail = sanitize(device_path, caps)
+            else:
+                discard(device_path, secure=name == STRATEGY_SECURE_DISCARD)
+                values = ERASED_VALUES[name]
+                value = _erased_value(device_path, values)
+                check = _erased_check(device_path, value, verify, samples, tracker)
+                if not check.ok:
+                    expected = " or ".join(f"0x{v.hex().upper()}" for v in values)
+                    raise EraseError(f"discarded blocks do not read back uniformly as {expected}")
+                detail = f"reads back as 0x{value.hex().upper()}"
+        except (OSError, EraseError) as e:
+            seconds = time.perf_counter() - start
+            attempts.append(Attempt(name, False, seconds, detail, str(e)))
+            status(f"{name} failed after {seconds:.1f} s: {e}")
+            continue
+        seconds = time.perf_counter() - start
+        attempts.append(Attempt(name, True, seconds, detail))
+        status(f"{name} finished in {seconds:.1f} s")
+        if tracker:
+            tracker.finish()
+        return EraseResult(device_path, name, caps, attempts, check=check)
+
+    start = time.perf_counter()
+    results = wipe.run_passes(device_path, algorithm, passes, verify=verify, samples=samples,
+                              tracker=tracker, **wipe_options)
+    attempts.append(Attempt(STRATEGY_OVERWRITE, True, time.perf_counter() - start,
+                            f"{algorithm}, {passes} passes"))
+    return EraseResult(device_path, STRATEGY_OVERWRITE, caps, attempts, results)
@@ -0,0 +1,235 @@
+"""Cached inventory of block devices, read straight from sysfs.
+
+Listing drives used to cost an lsblk run, and every log write a udevadm
+run for the model. Everything those tools report is a small file under
+/sys/block/<name>/ (removable, size, device/model, and the serial of the
+USB device, NVMe controller or MMC card further up the device tree), so
+scan() reads those directly in well under a millisecond.
+
+Inventory keeps the result cached and up to date in a background thread.
+It listens to kernel uevents on a netlink socket and re-reads only the disk
+an event names; where netlink is not available it rescans every
+POLL_INTERVAL seconds. Front ends compare Inventory.version with the value
+they last saw to notice hotplug without blocking.
+"""
+
+import os
+import socket
+import threading
+
+SYS_BLOCK = "/sys/block"
+POLL_INTERVAL = 1.0
+NETLINK_KOBJECT_UEVENT = 15
+_UEVENT_GROUP = 1  # Kernel (not udev) broadcasts
+
+
+class Drive:
+    """One whole-disk block device."""
+
+    def __init__(self, name, removable, size, model, serial, vendor=None):
+        self.name = name
+        self.path = "/dev/" + name
+        self.removable = removable
+        self.size = size  # Bytes
+        self.model = model
+        self.serial = serial
+        self.vendor = vendor
+
+    def __eq__(self, other):
+        return isinstance(other, Drive) and self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        return {
+            "device": self.path,
+            "removable": self.removable,
+            "size": self.size,
+            "model": self.model,
+            "serial": self.serial,
+            "vendor": self.vendor,
+        }
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _serial(sys_dir):
+    # NVMe and MMC expose the serial on the device itself; USB mass storage
+    # on the USB device a few levels up (the one with idVendor)
+    serial = _read(os.path.join(sys_dir, "device", "serial"))
+    if serial:
+        return serial
+    path = os.path.realpath(sys_dir)
+    if "/virtual/" in path:
+        return None
+    while path != "/sys/devices" and path != "/":
+        if os.path.exists(os.path.join(path, "idVendor")):
+            return _read(os.path.join(path, "serial"))
+        path = os.path.dirname(path)
+    return None
+
+
+def read_drive(name, sys_block=SYS_BLOCK):
+    """Read one disk from sysfs; returns None if it has gone away."""
+    sys_dir = os.path.join(sys_block, name)
+    size = _read(os.path.join(sys_dir, "size"))
+    if size is None:
+        return None
+    device = os.path.join(sys_dir, "device")
+    model = _read(os.path.join(device, "model")) or _read(os.path.join(device, "name"))
+    return Drive(
+        name.replace("!", "/"),
+        _read(os.path.join(sys_dir, "removable")) == "1",
+        int(size) * 512,
+        model or "Unknown",
+        _serial(sys_dir),
+        _read(os.path.join(device, "vendor")),
+    )
+
+
+def lookup(device_path, sys_block=SYS_BLOCK):
+    """Read the Drive behind device_path, or None if it is not a disk."""
+    name = os.path.basename(os.path.realpath(device_path)).replace("/", "!")
+    return read_drive(name, sys_block)
+
+
+def scan(sys_block=SYS_BLOCK):
+    """Return {name: Drive} for every disk in sys_block."""
+    drives = {}
+    try:
+        names = os.listdir(sys_block)
+    except OSError:
+        return drives
+    for name in names:
+        drive = read_drive(name, sys_block)
+        if drive is not None:
+            drives[name] = drive
+    return drives
+
+
+def removable(sys_block=SYS_BLOCK):
+    """Return the removable drives, sorted by device path, without caching."""
+    return sorted((d for d in scan(sys_block).values() if d.removable), key=lambda d: d.path)
+
+
+class Inventory:
+    """Cached view of the attached disks, kept current by a monitor thread."""
+
+    def __init__(self, sys_block=SYS_BLOCK):
+        self.sys_block = sys_block
+        self.version = 0  # Bumped on every change
+        self.mode = None  # "netlink" or "poll" once started
+        self._lock = threading.Lock()
+        self._drives = scan(sys_block)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def drives(self, removable_only=True):
+        """Return the cached drives, sorted by device path."""
+        with self._lock:
+            found = list(self._drives.values())
+        return sorted((d for d in found if d.removable or not removable_only),
+                      key=lambda d: d.path)
+
+    def get(self, device_path):
+        """Return the cached Drive for device_path, or None."""
+        name = os.path.basename(os.path.realpath(device_path)).replace("/", "!")
+        with self._lock:
+            return self._drives.get(name)
+
+    def refresh(self, name=None):
+        """Re-read one disk, or all of them. Returns True if anything changed."""
+        if name is None:
+            current = scan(self.sys_block)
+        else:
+            with self._lock:
+                current = dict(self._drives)
+            drive = read_drive(name, self.sys_block)
+            if drive is None:
+                current.pop(name, None)
+            else:
+                current[name] = drive
+        with self._lock:
+            if current == self._drives:
+                return False
+            self._drives = current
+            self.version += 1
+            return True
+
+    def start(self):
+        """Start following hotplug events in a daemon thread."""
+        if self._thread is not None:
+            return
+        sock = _open_uevent_socket()
+        self.mode = "netlink" if sock else "poll"
+        target = self._watch_netlink if sock else self._watch_poll
+        self._thread = threading.Thread(target=target, args=(sock,) if sock else (),
+                                        name="usbzero-inventory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch_poll(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            self.refresh()
+
+    def _watch_netlink(self, sock):
+        # Catch anything that changed between the first scan and the bind
+        self.refresh()
+        with sock:
+            while not self._stop.is_set():
+                try:
+                    message = sock.recv(16384)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    # e.g. ENOBUFS after an event storm: resynchronise
+                    self.refresh()
+                    continue
+                event = parse_uevent(message)
+                if event.get("SUBSYSTEM") == "block" and event.get("DEVTYPE") == "disk":
+                    self.refresh(event.get("DEVNAME", "").replace("/", "!") or None)
+
+
+def _open_uevent_socket():
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, _UEVENT_GROUP))
+    except OSError:
+        return None
+    sock.settimeout(POLL_INTERVAL)
+    return sock
+
+
+def parse_uevent(message):
+    """Turn a kernel uevent ("action@devpath\\0KEY=VALUE\\0...") into a dict."""
+    fields = {}
+    for part in message.split(b"\0")[1:]:
+        key, sep, value = part.partition(b"=")
+        if sep:
+            fields[key.decode(errors="replace")] = value.decode(errors="replace")
+    return fields
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """Return the process-wide Inventory, starting its monitor on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Inventory()
+            _shared.start()
+        return _shared
@@ -0,0 +1,177 @@
+"""Checkpoint journal for resumable wipes.
+
+A wipe of a large, slow drive can take hours, and an unplugged cable or a
+crash used to mean starting over. While a wipe runs, a small JSON journal
+records which pass it is on, the byte offset known to be on the media and
+the seed of the running random pass. The offset is only advanced after the
+device has been fsync'ed, so everything before it is durable; resuming
+rewrites at most one checkpoint interval.
+
+Journals are keyed by the drive's serial number, so a stick that comes back
+under another device name is still recognised. Image files and devices
+without a serial are keyed by their resolved path. The journal is removed
+once every pass has finished.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+
+from usbzero import drives, engine
+from usbzero.logs import LOG_DIR
+
+JOURNAL_DIR = os.path.join(LOG_DIR, "journal")
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class JournalError(Exception):
+    """Raised when a journal cannot be used to resume a wipe."""
+
+
+def identify(device_path):
+    """Return the identity a journal is matched against."""
+    fd = os.open(device_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = engine.get_device_size(fd)
+    finally:
+        os.close(fd)
+    return {
+        "device": device_path,
+        "serial": drives.get_device_serial(device_path),
+        "model": drives.get_device_model(device_path),
+        "size": size,
+    }
+
+
+def journal_path(identity, journal_dir=JOURNAL_DIR):
+    if identity["serial"]:
+        key = _UNSAFE.sub("_", identity["serial"])
+    else:
+        real = os.path.realpath(identity["device"])
+        key = "path-" + hashlib.sha256(real.encode()).hexdigest()[:16]
+    return os.path.join(journal_dir, key + ".json")
+
+
+class Journal:
+    """On-disk progress record of one wipe."""
+
+    def __init__(self, path, record):
+        self.path = path
+        self.record = record
+
+    @classmethod
+    def create(cls, identity, algorithm, passes, journal_dir=JOURNAL_DIR, **info):
+        """Start a new journal, replacing any earlier one for the same drive.
+
+        info is kept in the record for the final log (e.g. hpa_dco_cleaned).
+        """
+        record = dict(identity)
+        record.update({
+            "algorithm": algorithm,
+            "passes": passes,
+            "started": time.time(),
+            "pass_index": 0,
+            "offset": 0,
+            "seed": None,
+            "completed": [],
+            "info": info,
+        })
+        journal = cls(journal_path(identity, journal_dir), record)
+        journal._save()
+        return journal
+
+    @classmethod
+    def load(cls, identity, journal_dir=JOURNAL_DIR):
+        """Return the journal for identity, or None if there is none."""
+        path = journal_path(identity, journal_dir)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            raise JournalError(f"Journal {path} is damaged: {e}")
+        if record.get("size") != identity["size"]:
+            raise JournalError(f"Journal {path} was written for a drive of {record.get('size')} "
+                               f"bytes, but {identity['device']} has {identity['size']}")
+        return cls(path, record)
+
+    @property
+    def algorithm(self):
+        return self.record["algorithm"]
+
+    @property
+    def passes(self):
+        return self.record["passes"]
+
+    @property
+    def pass_index(self):
+        return self.record["pass_index"]
+
+    @property
+    def offset(self):
+        return self.record["offset"]
+
+    @property
+    def seed(self):
+        return self.record["seed"]
+
+    @property
+    def completed(self):
+        """to_dict() records of the passes that already finished."""
+        return self.record["completed"]
+
+    @property
+    def info(self):
+        return self.record.get("info", {})
+
+    def fraction(self):
+        """Share of the whole wipe already done, for prompts."""
+        size = self.record["size"] or 1
+        return (self.pass_index + self.offset / size) / self.passes
+
+    def matches(self, algorithm, passes):
+        return self.algorithm == algorithm and self.passes == passes
+
+    def start_pass(self, index, seed):
+        if index != self.pass_index or self.offset == 0:
+            self.record.update(pass_index=index, offset=0, seed=seed)
+            self._save()
+
+    def checkpoint(self, offset):
+        """Record that everything before offset is on the media."""
+        self.record["offset"] = offset
+        self._save()
+
+    def complete_pass(self, result):
+        self.record["completed"].append(result.to_dict())
+        self.record.update(pass_index=result.pass_index + 1, offset=0, seed=None)
+        self._save()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _save(self):
+        # Write a new file and rename it over the old one so a crash never
+        # leaves a half-written journal behind
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        self.record["updated"] = time.time()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.record, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
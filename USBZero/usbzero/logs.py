@@ -0,0 +1,75 @@
+"""Wipe log files (JSON record plus signed .sig), indexed in logstore."""
+
+import json
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+
+from usbzero import logstore, merkle, signing
+
+LOG_DIR = "logs"
+
+
+def save_log(device_path, algorithm, passes, deleted_files, hpa_dco_status, device_model,
+             log_dir=LOG_DIR, extra=None, merkle_tree=None, key_dir=signing.KEY_DIR,
+             on_status=None):
+    """Write the log for a finished wipe and return its path.
+
+    extra is merged into the record for callers that have more to report.
+    merkle_tree, the final pass's merkle.MerkleTree, puts its root in the
+    record and its leaves in a .merkle file next to the log. The log is
+    signed with the station key in key_dir (see signing.py); if that
+    fails the log is kept with a SHA-256 signature only and on_status, if
+    given, is called with the reason.
+    """
+    log = {
+        "uuid": str(uuid.uuid4()),
+        "drive": device_path,
+        "timestamp": datetime.now().isoformat(),
+        "algorithm": algorithm,
+        "passes": passes,
+        "deleted_files": deleted_files,
+        "hpa_dco_cleaned": hpa_dco_status,
+        "device_model": device_model
+    }
+    if extra:
+        log.update(extra)
+    if merkle_tree is not None:
+        log["merkle"] = merkle_tree.to_dict()
+
+    # Written as bytes so the signed data is exactly what is on disk
+    json_data = json.dumps(log, indent=4).encode()
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir, exist_ok=True)
+
+    # Batch jobs can finish within the same second, so never reuse a name
+    stem = os.path.join(log_dir, f"usbzero_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    filename = stem + ".json"
+    suffix = 0
+    while True:
+        try:
+            with open(filename, "xb") as f:
+                f.write(json_data)
+            break
+        except FileExistsError:
+            suffix += 1
+            filename = f"{stem}_{suffix}.json"
+
+    try:
+        signature = signing.sign(json_data, key_dir)
+    except signing.SigningError as e:
+        # Never lose the record of a finished wipe; it shows up as unsigned
+        if on_status:
+            on_status(f"Log not signed: {e}")
+        signature = signing.sign(json_data, key_dir=None)
+    with open(signing.signature_path(filename), "w") as f:
+        f.write(signature)
+    if merkle_tree is not None:
+        merkle_tree.save(merkle.leaves_path(filename))
+
+    try:
+        logstore.open_store(log_dir).add(log, os.path.basename(filename), signature)
+    except sqlite3.Error:
+        pass  # The files are what counts; import_dir() indexes them later
+    return filename
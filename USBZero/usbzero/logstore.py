@@ -0,0 +1,331 @@
+"""Indexed, append-only store of wipe logs.
+
+Every log written by logs.save_log() is also added to an SQLite database
+next to the JSON files, with the fields people search by (timestamp,
+device, model, serial, algorithm and outcome) in indexed columns and the
+full record alongside. Listing or filtering tens of thousands of logs is
+then an index lookup instead of a glob and a sort by mtime.
+
+Rows are never changed or removed; triggers reject UPDATE and DELETE. The
+JSON/.sig files stay the signed artefact handed out per drive, and
+import_dir() indexes ones written before the store existed.
+
+Views do not poll for new logs: subscribe() registers a callback that is
+called after every add() or import_dir() in this process, from whichever
+thread wrote the log.
+"""
+
+import contextlib
+import datetime
+import glob
+import json
+import os
+import sqlite3
+import threading
+
+STORE_NAME = "usbzero_logs.sqlite3"
+LOG_PATTERN = "usbzero_log_*.json"
+
+RESULT_PASSED = "passed"
+RESULT_FAILED = "failed"
+RESULTS = (RESULT_PASSED, RESULT_FAILED)
+
+DEFAULT_LIMIT = 100
+PAGE_SIZE = 50
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+_COLUMNS = ("id", "uuid", "timestamp", "device", "model", "serial", "algorithm", "passes",
+            "result", "file")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT UNIQUE,
+    timestamp TEXT NOT NULL,
+    device TEXT,
+    model TEXT,
+    serial TEXT,
+    algorithm TEXT,
+    passes INTEGER,
+    result TEXT NOT NULL,
+    file TEXT,
+    signature TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logs_timestamp ON logs (timestamp);
+CREATE INDEX IF NOT EXISTS logs_serial ON logs (serial, timestamp);
+CREATE INDEX IF NOT EXISTS logs_result ON logs (result, timestamp);
+CREATE INDEX IF NOT EXISTS logs_file ON logs (file);
+CREATE TRIGGER IF NOT EXISTS logs_no_update BEFORE UPDATE ON logs
+    BEGIN SELECT RAISE(ABORT, 'the log store is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS logs_no_delete BEFORE DELETE ON logs
+    BEGIN SELECT RAISE(ABORT, 'the log store is append-only'); END;
+"""
+
+
+def outcome(record):
+    """Return RESULT_PASSED or RESULT_FAILED for a log record.
+
+    Wipes that left unwritable sectors behind count as failed: those
+    sectors may still hold the old data. So do drives whose capacity probe
+    found less space than they report.
+    """
+    if record.get("result") in RESULTS:
+        return record["result"]
+    if (record.get("verified") is False or record.get("unwritable")
+            or (record.get("capacity") or {}).get("fake")):
+        return RESULT_FAILED
+    return RESULT_PASSED
+
+
+def subscribe(callback):
+    """Call callback(store_path) whenever logs are added to a store.
+
+    The callback runs on the thread that wrote the log, so GUIs must hand
+    it over to their main loop.
+    """
+    with _listeners_lock:
+        _listeners.append(callback)
+
+
+def unsubscribe(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def _notify(path):
+    with _listeners_lock:
+        callbacks = list(_listeners)
+    for callback in callbacks:
+        callback(path)
+
+
+def _bound(value, end=False):
+    # Accept dates, datetimes or ISO strings; a bare end date includes that day
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, datetime.date):
+        value = value.isoformat()
+    if end and len(value) == 10:
+        day = datetime.date.fromisoformat(value) + datetime.timedelta(days=1)
+        return day.isoformat()
+    return value
+
+
+class LogStore:
+    """The log database in log_dir."""
+
+    def __init__(self, log_dir, path=None):
+        self.log_dir = log_dir
+        self.path = path or os.path.join(log_dir, STORE_NAME)
+        self.created = not os.path.exists(self.path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per call: batch jobs log from several
+        # threads, and WAL lets the viewer read while a job writes
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _row(record, file=None, signature=None):
+        return (
+            record.get("uuid"),
+            record.get("timestamp") or datetime.datetime.now().isoformat(),
+            record.get("drive"),
+            record.get("device_model"),
+            record.get("serial"),
+            record.get("algorithm"),
+            record.get("passes"),
+            outcome(record),
+            file,
+            signature,
+            json.dumps(record),
+        )
+
+    def add(self, record, file=None, signature=None):
+        """Append one log record; returns its id."""
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO logs (uuid, timestamp, device, model, serial, algorithm, passes,"
+                " result, file, signature, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._row(record, file, signature))
+            log_id = cursor.lastrowid
+        _notify(self.path)
+        return log_id
+
+    @staticmethod
+    def _where(serial=None, since=None, until=None, result=None, algorithm=None, text=None):
+        clauses, params = [], []
+        if serial:
+            clauses.append("serial = ?")
+            params.append(serial)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(_bound(since))
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(_bound(until, end=True))
+        if result:
+            clauses.append("result = ?")
+            params.append(result)
+        if algorithm:
+            clauses.append("algorithm = ?")
+            params.append(algorithm)
+        if text:
+            clauses.append("(device LIKE ? OR model LIKE ? OR serial LIKE ? OR file LIKE ?)")
+            params.extend([f"%{text}%"] * 4)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, limit=DEFAULT_LIMIT, offset=0, **filters):
+        """Return summary rows (dicts without the full record), newest first.
+
+        filters are serial, since, until (dates or ISO timestamps; a bare
+        until date includes that day), result, algorithm and text, a
+        substring of device, model, serial or file name.
+        """
+        where, params = self._where(**filters)
+        sql = (f"SELECT {', '.join(_COLUMNS)} FROM logs{where}"
+               " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?")
+        with self._connect() as db:
+            rows = db.execute(sql, params + [limit if limit is not None else -1, offset])
+            return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM logs{where}", params).fetchone()[0]
+
+    def _lookup(self, field, key):
+        column = "id" if isinstance(key, int) else "file" if key.endswith(".json") else "uuid"
+        with self._connect() as db:
+            row = db.execute(f"SELECT {field} FROM logs WHERE {column} = ? ORDER BY id LIMIT 1",
+                             (key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, key):
+        """Return the full record for an id, uuid or JSON file name, or None."""
+        record = self._lookup("record", key)
+        return json.loads(record) if record else None
+
+    def signature(self, key):
+        """Return the stored .sig contents for an id, uuid or file name."""
+        return self._lookup("signature", key)
+
+    def import_dir(self, log_dir=None):
+        """Index JSON/.sig pairs not yet in the store. Returns (added, skipped)."""
+        log_dir = log_dir or self.log_dir
+        with self._connect() as db:
+            known = {row[0] for row in db.execute("SELECT file FROM logs WHERE file IS NOT NULL")}
+            known_uuids = {row[0] for row in db.execute("SELECT uuid FROM logs WHERE uuid IS NOT NULL")}
+        rows, skipped = [], 0
+        for path in sorted(glob.glob(os.path.join(log_dir, LOG_PATTERN))):
+            name = os.path.basename(path)
+            if name in known:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                skipped += 1
+                continue
+            if not isinstance(record, dict) or (record.get("uuid") and record["uuid"] in known_uuids):
+                skipped += 1
+                continue
+            try:
+                with open(path[:-len(".json")] + ".sig", encoding="utf-8") as f:
+                    signature = f.read()
+            except OSError:
+                signature = None
+            known_uuids.add(record.get("uuid"))
+            rows.append(self._row(record, name, signature))
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO logs (uuid, timestamp, device, model, serial, algorithm, passes,"
+                " result, file, signature, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows)
+        if rows:
+            _notify(self.path)
+        return len(rows), skipped
+
+
+class LogPager:
+    """Pages through a filtered query for list views.
+
+    Only one page of summary rows is fetched at a time, so a view over tens
+    of thousands of logs costs one indexed COUNT and one LIMIT query.
+    """
+
+    def __init__(self, store, page_size=PAGE_SIZE):
+        self.store = store
+        self.page_size = page_size
+        self.filters = {}
+        self.offset = 0
+        self.total = 0
+        self.rows = []
+
+    @property
+    def page(self):
+        return self.offset // self.page_size + 1
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.page_size))
+
+    def search(self, **filters):
+        """Apply new filters (empty values are ignored) and show the first page."""
+        self.filters = {key: value for key, value in filters.items() if value}
+        self.offset = 0
+        return self.load()
+
+    def load(self):
+        """(Re)load the current page, e.g. after new logs were added."""
+        self.total = self.store.count(**self.filters)
+        self.offset = min(self.offset, (self.pages - 1) * self.page_size)
+        self.rows = self.store.query(limit=self.page_size, offset=self.offset, **self.filters)
+        return self.rows
+
+    def next(self):
+        if self.offset + self.page_size < self.total:
+            self.offset += self.page_size
+            self.load()
+        return self.rows
+
+    def previous(self):
+        if self.offset:
+            self.offset = max(0, self.offset - self.page_size)
+            self.load()
+        return self.rows
+
+    def describe(self):
+        if not self.total:
+            return "No logs found"
+        return (f"{self.offset + 1}-{self.offset + len(self.rows)} of {self.total} logs "
+                f"(page {self.page}/{self.pages})")
+
+
+def format_row(row):
+    """One fixed-width line describing a summary row."""
+    return (f"{row['timestamp'][:19].replace('T', ' ')}  {row['result']:<6}  "
+            f"{row['device'] or '':<14}  {row['serial'] or '-':<20}  {row['algorithm'] or ''}")
+
+
+def open_store(log_dir):
+    """Open the store in log_dir, indexing existing log files the first time."""
+    store = LogStore(log_dir)
+    if store.created:
+        store.import_dir()
+    return store
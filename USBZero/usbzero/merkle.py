@@ -0,0 +1,198 @@
+"""Merkle tree over the blocks written by the final pass.
+
+The .sig of a log only shows that the log was not edited; it says nothing
+about what is on the drive. While the final pass is written, every block
+is hashed with BLAKE2b (hashlib, C code that releases the GIL) on a pool of
+HASH_WORKERS threads per stripe. The writer does not wait for the hash of a
+block before writing the next one (see pipeline.run), so hashing only slows
+a pass down once all workers are busy, and the leaves are folded into a
+single root that goes into the log.
+
+Leaves are kept next to the log in a .merkle file (32 bytes per block, so
+about 8 KiB per GiB at the default 4 MiB block size). The file is bound to
+the log by the root: anyone can recompute the root from it, and then check
+any block of the drive against its leaf with spot_check() without reading
+the rest of the device. Leaf and node hashes use different BLAKE2
+personalisations, so a leaf can never be passed off as an inner node.
+"""
+
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import random
+import threading
+import time
+
+ALGORITHM = "blake2b-256"
+DIGEST_SIZE = 32
+LEAF_PERSON = b"usbzero-leaf"
+NODE_PERSON = b"usbzero-node"
+LEAVES_SUFFIX = ".merkle"
+DEFAULT_SPOT_CHECKS = 16
+HASH_WORKERS = min(4, os.cpu_count() or 1)  # Per stripe; BLAKE2b runs at ~0.5-1 GB/s per core
+
+
+class MerkleError(Exception):
+    """Raised when a leaf file does not belong to a log."""
+
+
+def leaf_hash(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE, person=LEAF_PERSON).digest()
+
+
+def node_hash(left, right):
+    return hashlib.blake2b(left + right, digest_size=DIGEST_SIZE, person=NODE_PERSON).digest()
+
+
+def fold(level):
+    """Return the root of a list of leaf digests.
+
+    Pairs are hashed level by level; an odd node at the end of a level is
+    carried up unchanged.
+    """
+    if not level:
+        return leaf_hash(b"")
+    while len(level) > 1:
+        paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+class MerkleTree:
+    """Leaf digests of one pass over size bytes, one per block_size block."""
+
+    def __init__(self, size, block_size, leaves=None):
+        self.size = size
+        self.block_size = block_size
+        self.count = -(-size // block_size)
+        self.leaves = bytearray(leaves) if leaves is not None else bytearray(self.count * DIGEST_SIZE)
+        if len(self.leaves) != self.count * DIGEST_SIZE:
+            raise MerkleError(f"Expected {self.count} leaves, got {len(self.leaves) // DIGEST_SIZE}")
+        self.hash_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, offset, data):
+        """Hash the block written at offset (a multiple of block_size)."""
+        began = time.perf_counter()
+        index = offset // self.block_size
+        digest = leaf_hash(data)
+        with self._lock:
+            self.leaves[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE] = digest
+            self.hash_seconds += time.perf_counter() - began
+
+    def leaf(self, index):
+        return bytes(self.leaves[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE])
+
+    def root(self):
+        return fold([self.leaf(i) for i in range(self.count)])
+
+    def to_dict(self):
+        return {
+            "algorithm": ALGORITHM,
+            "root": self.root().hex(),
+            "block_size": self.block_size,
+            "size": self.size,
+            "leaves": self.count,
+            "hash_seconds": round(self.hash_seconds, 3),
+        }
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.leaves)
+
+    @classmethod
+    def load(cls, path, record):
+        """Read a .merkle file and check it against the "merkle" entry of a log."""
+        with open(path, "rb") as f:
+            tree = cls(record["size"], record["block_size"], f.read())
+        if tree.root().hex() != record["root"]:
+            raise MerkleError(f"{path} does not match the root recorded in the log")
+        return tree
+
+
+def leaves_path(log_path):
+    """Return the .merkle file belonging to a log's .json file."""
+    return os.path.splitext(log_path)[0] + LEAVES_SUFFIX
+
+
+class Hasher:
+    """Hashes blocks into a MerkleTree on worker threads.
+
+    submit() returns a future at once; the buffer must not be reused until
+    it is done. Striped passes share one Hasher with HASH_WORKERS workers
+    per stripe.
+    """
+
+    def __init__(self, tree, workers=HASH_WORKERS):
+        self.tree = tree
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers,
+                                                               thread_name_prefix="usbzero-hash")
+
+    def submit(self, offset, data):
+        return self._executor.submit(self.tree.add, offset, data)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class SpotCheckResult:
+    """Outcome of checking sampled blocks against their leaves."""
+
+    def __init__(self, device_path, checked, mismatches, seconds):
+        self.device_path = device_path
+        self.checked = checked        # Block indexes read
+        self.mismatches = mismatches  # Block indexes whose hash differs
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return not self.mismatches
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "blocks_checked": len(self.checked),
+            "mismatch_blocks": list(self.mismatches),
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def spot_check(device_path, tree, blocks=None, samples=DEFAULT_SPOT_CHECKS, rng=None):
+    """Read blocks of device_path and compare them with the tree's leaves.
+
+    blocks lists the block indexes to check; by default samples of them are
+    picked at random, always including the first and the last block.
+    """
+    from usbzero import verify
+
+    if blocks is None:
+        rng = rng or random.SystemRandom()
+        blocks = {0, tree.count - 1}
+        blocks.update(rng.randrange(tree.count) for _ in range(max(0, samples - 2)))
+    blocks = sorted(blocks)
+    if blocks and not 0 <= blocks[0] <= blocks[-1] < tree.count:
+        raise ValueError(f"Block indexes must be between 0 and {tree.count - 1}")
+    mismatches = []
+    start = time.perf_counter()
+    fd, _ = verify.open_for_read(device_path)
+    try:
+        buf = mmap.mmap(-1, tree.block_size)
+        try:
+            for index in blocks:
+                offset = index * tree.block_size
+                length = min(tree.block_size, tree.size - offset)
+                view = memoryview(buf)[:length]
+                try:
+                    read = verify.read_at(fd, view, offset)
+                    if read != length or leaf_hash(view) != tree.leaf(index):
+                        mismatches.append(index)
+                finally:
+                    view.release()
+        finally:
+            buf.close()
+    finally:
+        os.close(fd)
+    return SpotCheckResult(device_path, blocks, mismatches, time.perf_counter() - start)
@@ -0,0 +1,134 @@
+"""Per-pass pattern schedules for the wipe algorithms.
+
+Every algorithm offered in the GUI maps to a list of passes. Fixed patterns
+(single bytes, complements and the Gutmann 3-byte periodic patterns) are
+expanded once into a large reusable buffer, so filling a block is a plain
+memory copy. Random passes get a freshly keyed stream each time they run.
+"""
+
+from usbzero import rng
+
+ALGO_RANDOM = "Random (Recommended)"
+ALGO_ZEROS = "0x00"
+ALGO_ONES = "0xFF"
+ALGO_DOD = "DoD 5220.22-M"
+ALGO_GUTMANN = "Gutmann (35-pass)"
+
+ALGORITHMS = [ALGO_RANDOM, ALGO_ZEROS, ALGO_ONES, ALGO_DOD, ALGO_GUTMANN]
+
+DEFAULT_PASSES = {
+    ALGO_RANDOM: 3,
+    ALGO_ZEROS: 1,
+    ALGO_ONES: 1,
+    ALGO_DOD: 3,
+    ALGO_GUTMANN: 35,
+}
+
+PATTERN_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Passes 5-31 of Gutmann's method, in the order of the original paper
+GUTMANN_PATTERNS = [
+    b"\x55", b"\xaa",
+    b"\x92\x49\x24", b"\x49\x24\x92", b"\x24\x92\x49",
+] + [bytes([n * 0x11]) for n in range(16)] + [
+    b"\x92\x49\x24", b"\x49\x24\x92", b"\x24\x92\x49",
+    b"\x6d\xb6\xdb", b"\xb6\xdb\x6d", b"\xdb\x6d\xb6",
+]
+
+_pattern_cache = {}
+
+
+class FixedPattern:
+    """A short byte pattern repeated across the device."""
+
+    def __init__(self, pattern, buffer_size=PATTERN_BUFFER_SIZE):
+        self.pattern = bytes(pattern)
+        period = len(self.pattern)
+        reps = -(-buffer_size // period)
+        # One extra period so a block can start at any phase of the pattern
+        self._buffer = self.pattern * (reps + 1)
+        self._view = memoryview(self._buffer)
+        self._span = reps * period
+
+    def fill(self, buf, offset):
+        view = memoryview(buf)
+        period = len(self.pattern)
+        pos = 0
+        while pos < len(view):
+            phase = (offset + pos) % period
+            take = min(self._span, len(view) - pos)
+            view[pos:pos + take] = self._view[phase:phase + take]
+            pos += take
+
+
+def fixed_pattern(pattern):
+    """Return the shared FixedPattern for pattern, building it on first use."""
+    key = bytes(pattern)
+    cached = _pattern_cache.get(key)
+    if cached is None:
+        cached = _pattern_cache[key] = FixedPattern(key)
+    return cached
+
+
+class WipePass:
+    """One entry of a pass schedule."""
+
+    def __init__(self, label, pattern=None):
+        self.label = label
+        self.pattern = pattern  # None means random
+
+    @property
+    def is_random(self):
+        return self.pattern is None
+
+    def make_fill(self, seed=None, backend=None):
+        """Return (fill, seed) for running this pass.
+
+        seed is the random stream seed, or None for fixed patterns. Passing
+        the seed of an interrupted pass recreates its stream for resuming.
+        backend picks the rng backend of a new stream (default: fastest).
+        """
+        if self.is_random:
+            stream = rng.KeyedStream.from_seed(seed) if seed else rng.KeyedStream(backend=backend)
+            return stream.fill, stream.seed()
+        return fixed_pattern(self.pattern).fill, None
+
+    def to_dict(self):
+        return {"label": self.label, "pattern": None if self.is_random else self.pattern.hex()}
+
+
+def _fixed(pattern):
+    return WipePass(f"0x{pattern.hex().upper()}", pattern)
+
+
+def _random():
+    return WipePass("random")
+
+
+_BASE_SCHEDULES = {
+    ALGO_RANDOM: [_random()],
+    ALGO_ZEROS: [_fixed(b"\x00")],
+    ALGO_ONES: [_fixed(b"\xff")],
+    # Character, its complement, then random
+    ALGO_DOD: [_fixed(b"\x00"), _fixed(b"\xff"), _random()],
+    ALGO_GUTMANN: [_random() for _ in range(4)]
+                  + [_fixed(p) for p in GUTMANN_PATTERNS]
+                  + [_random() for _ in range(4)],
+}
+
+
+def build_schedule(algorithm, passes=None):
+    """Return the list of WipePass objects for algorithm.
+
+    When passes differs from the algorithm's natural length the base
+    schedule is cycled (or truncated) to that many passes.
+    """
+    try:
+        base = _BASE_SCHEDULES[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown wipe algorithm: {algorithm}")
+    if passes is None:
+        passes = DEFAULT_PASSES[algorithm]
+    if passes < 1:
+        raise ValueError("Pass count must be at least 1")
+    return [base[i % len(base)] for i in range(passes)]
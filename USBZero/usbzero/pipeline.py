@@ -0,0 +1,183 @@
+"""Producer/consumer pipeline for overwrite passes.
+
+A generator thread fills free buffers from a BufferPool with pattern data
+while the calling thread writes filled buffers to the device. Pattern
+generation (hashlib, cryptography) and os.pwrite both release the GIL, so
+with two or more buffers the stages overlap: buffer N+1 is generated while
+buffer N is being written.
+
+With a hasher (merkle.Hasher) each written block is also hashed on a worker
+thread. The hash starts together with the write and the writer moves on to
+the next block without waiting for it; the buffer only goes back to the
+pool once its hash is done, and the writer blocks only when hash_depth
+hashes are already outstanding. The pool needs hash_depth buffers on top of
+the pipeline depth for that.
+
+The stats record how long each stage spent blocked on the others, which
+shows whether a pass is limited by the pattern source, the hashing or the
+device.
+"""
+
+import collections
+import queue
+import threading
+import time
+
+_POLL = 0.1
+
+
+class PipelineStats:
+    """Timing breakdown of one pipelined pass."""
+
+    def __init__(self, depth, buffer_size):
+        self.depth = depth
+        self.buffer_size = buffer_size
+        self.blocks = 0
+        self.generate_seconds = 0.0
+        self.write_seconds = 0.0
+        self.writer_wait_seconds = 0.0     # device idle, waiting on the generator
+        self.generator_wait_seconds = 0.0  # generator idle, waiting on the device
+        self.hash_wait_seconds = 0.0       # writer idle, waiting on block hashes
+
+    @classmethod
+    def combine(cls, parts):
+        """Sum the stats of pipelines that ran side by side (striped passes)."""
+        total = cls(sum(p.depth for p in parts), parts[0].buffer_size)
+        for part in parts:
+            total.blocks += part.blocks
+            total.generate_seconds += part.generate_seconds
+            total.write_seconds += part.write_seconds
+            total.writer_wait_seconds += part.writer_wait_seconds
+            total.generator_wait_seconds += part.generator_wait_seconds
+            total.hash_wait_seconds += part.hash_wait_seconds
+        return total
+
+    @property
+    def bottleneck(self):
+        # While the writer waits on hashes the generator waits on the writer,
+        # so that part of the generator's wait is not the device's doing
+        waits = {"generator": self.writer_wait_seconds,
+                 "hash": self.hash_wait_seconds,
+                 "device": self.generator_wait_seconds - self.hash_wait_seconds}
+        return max(waits, key=waits.get)
+
+    def to_dict(self):
+        return {
+            "depth": self.depth,
+            "buffer_size": self.buffer_size,
+            "blocks": self.blocks,
+            "generate_seconds": round(self.generate_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "waiting_on_generator_seconds": round(self.writer_wait_seconds, 3),
+            "waiting_on_device_seconds": round(self.generator_wait_seconds, 3),
+            "waiting_on_hash_seconds": round(self.hash_wait_seconds, 3),
+            "bottleneck": self.bottleneck,
+        }
+
+
+def run(size, fill, write, pool, on_progress=None, start_offset=0, hasher=None, hash_depth=1):
+    """Stream bytes start_offset..size through fill() and write() using the
+    buffers in pool.
+
+    fill(buf, offset) produces the data for a block and write(buf, offset)
+    stores it. Blocks are pool.size bytes except for the last one. With a
+    hasher, hasher.submit(offset, buf) is called for every block, with at
+    most hash_depth of them outstanding. Returns a PipelineStats; the first
+    exception raised by any stage is re-raised here after all stages have
+    stopped.
+    """
+    stats = PipelineStats(len(pool), pool.size)
+    filled = queue.SimpleQueue()
+    stop = threading.Event()
+    hashing = collections.deque()  # (future, buf, chunk) in submission order
+
+    def release(buf, chunk):
+        chunk.release()
+        pool.release(buf)
+
+    def wait_hashes(limit):
+        # Hand back the buffers of finished hashes, waiting for the oldest
+        # while more than limit are outstanding
+        while hashing and (hashing[0][0].done() or len(hashing) > limit):
+            future, buf, chunk = hashing.popleft()
+            waited = time.perf_counter()
+            try:
+                future.result()
+            finally:
+                stats.hash_wait_seconds += time.perf_counter() - waited
+                release(buf, chunk)
+
+    def produce():
+        offset = start_offset
+        try:
+            while offset < size and not stop.is_set():
+                waited = time.perf_counter()
+                buf = None
+                while buf is None and not stop.is_set():
+                    try:
+                        buf = pool.acquire(timeout=_POLL)
+                    except queue.Empty:
+                        pass
+                if buf is None:
+                    break
+                began = time.perf_counter()
+                stats.generator_wait_seconds += began - waited
+
+                length = min(pool.size, size - offset)
+                chunk = buf[:length]
+                fill(chunk, offset)
+                chunk.release()
+                stats.generate_seconds += time.perf_counter() - began
+                filled.put((buf, offset, length))
+                offset += length
+        except BaseException as e:
+            filled.put(e)
+            return
+        filled.put(None)
+
+    producer = threading.Thread(target=produce, name="usbzero-generator", daemon=True)
+    producer.start()
+    try:
+        while True:
+            waited = time.perf_counter()
+            item = filled.get()
+            began = time.perf_counter()
+            stats.writer_wait_seconds += began - waited
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            buf, offset, length = item
+            chunk = buf[:length]
+            hashed = None
+            try:
+                if hasher:
+                    hashed = hasher.submit(offset, chunk)
+                write(chunk, offset)
+            finally:
+                if hashed is not None:
+                    hashing.append((hashed, buf, chunk))
+                else:
+                    release(buf, chunk)
+            stats.write_seconds += time.perf_counter() - began
+            stats.blocks += 1
+            wait_hashes(hash_depth)
+            if on_progress:
+                on_progress(offset + length, size)
+        wait_hashes(0)
+    finally:
+        stop.set()
+        producer.join()
+        # Buffers go back to the pool only after their hash, even on errors
+        for future, buf, chunk in hashing:
+            _settle(future)
+            release(buf, chunk)
+    return stats
+
+
+def _settle(future):
+    try:
+        future.result()
+    except BaseException:
+        pass  # Already failing; the first error is the one raised
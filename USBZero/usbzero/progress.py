@@ -0,0 +1,140 @@
+"""Progress counters for running wipes.
+
+The writer thread calls ProgressTracker.update() after every block; this
+only stores a counter and, a few times per second, a rate sample. Front ends
+read snapshot() on their own schedule (the GUI from a throttled app.after
+poll, the CLI at most twice a second), so reporting costs nothing per block
+even at GB/s rates.
+"""
+
+import collections
+import threading
+import time
+
+PHASE_WRITE = "write"
+PHASE_VERIFY = "verify"
+
+SAMPLE_INTERVAL = 0.2  # Seconds between rate samples
+CURRENT_WINDOW = 1.0   # Seconds used for the current rate
+AVERAGE_WINDOW = 10.0  # Seconds used for the moving average
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressTracker:
+    """Byte counters, throughput and ETA for one device."""
+
+    def __init__(self, passes):
+        self.passes = passes
+        self._lock = threading.Lock()
+        self._samples = collections.deque()
+        self.phase = None
+        self.label = None
+        self.pass_index = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.active = False
+        self.completed = False
+
+    def begin(self, index, total, phase=PHASE_WRITE, label=None, done=0):
+        """Start counting a new pass (or the read-back of one).
+
+        done is non-zero when a pass resumes part way through.
+        """
+        with self._lock:
+            self.active = True
+            self.phase = phase
+            self.label = label
+            self.pass_index = index
+            self.bytes_done = done
+            self.bytes_total = total
+            self._samples.clear()
+            self._samples.append((time.monotonic(), done))
+
+    def update(self, done, total=None):
+        now = time.monotonic()
+        with self._lock:
+            self.bytes_done = done
+            if total is not None:
+                self.bytes_total = total
+            if not self._samples or now - self._samples[-1][0] >= SAMPLE_INTERVAL:
+                self._samples.append((now, done))
+                while now - self._samples[0][0] > AVERAGE_WINDOW and len(self._samples) > 2:
+                    self._samples.popleft()
+
+    def finish(self, completed=True):
+        """Mark the wipe as over; completed is False when it failed."""
+        with self._lock:
+            self.active = False
+            self.completed = completed
+
+    def _rate(self, now, done, window):
+        # Bytes per second over the samples newer than window, ending at now
+        oldest = None
+        for t, value in self._samples:
+            if now - t <= window:
+                oldest = (t, value)
+                break
+        if oldest is None:
+            oldest = self._samples[-1] if self._samples else (now, done)
+        elapsed = now - oldest[0]
+        if elapsed <= 0:
+            return None
+        return (done - oldest[1]) / elapsed
+
+    def snapshot(self):
+        """Return the current state as a dict; safe to call from any thread."""
+        now = time.monotonic()
+        with self._lock:
+            done, total, index, phase = self.bytes_done, self.bytes_total, self.pass_index, self.phase
+            current = self._rate(now, done, CURRENT_WINDOW)
+            average = self._rate(now, done, AVERAGE_WINDOW)
+            label, active, completed = self.label, self.active, self.completed
+
+        pass_fraction = done / total if total else 0.0
+        if completed:
+            overall = 1.0
+        elif phase == PHASE_VERIFY:
+            overall = (index + 1) / self.passes
+        else:
+            overall = (index + pass_fraction) / self.passes
+
+        pass_eta = overall_eta = None
+        if average and active:
+            pass_eta = (total - done) / average
+            if phase == PHASE_WRITE:
+                overall_eta = pass_eta + (self.passes - index - 1) * total / average
+        return {
+            "phase": phase,
+            "label": label,
+            "pass_index": index + 1,
+            "passes": self.passes,
+            "bytes_done": done,
+            "bytes_total": total,
+            "pass_fraction": round(pass_fraction, 4),
+            "overall_fraction": round(overall, 4),
+            "mb_per_s": round(current / 1e6, 1) if current is not None else None,
+            "avg_mb_per_s": round(average / 1e6, 1) if average is not None else None,
+            "pass_eta_seconds": round(pass_eta, 1) if pass_eta is not None else None,
+            "eta_seconds": round(overall_eta, 1) if overall_eta is not None else None,
+            "active": active,
+            "completed": completed,
+        }
+
+
+def format_status(snapshot):
+    """One-line human readable description of a snapshot."""
+    verb = "Verifying" if snapshot["phase"] == PHASE_VERIFY else f"Writing {snapshot['label']} data"
+    text = (f"Pass {snapshot['pass_index']}/{snapshot['passes']}: {verb} "
+            f"{snapshot['pass_fraction'] * 100:5.1f}%")
+    if snapshot["mb_per_s"] is not None:
+        text += f" | {snapshot['mb_per_s']:.1f} MB/s (avg {snapshot['avg_mb_per_s']:.1f})"
+    text += f" | ETA pass {format_eta(snapshot['pass_eta_seconds'])}"
+    if snapshot["phase"] == PHASE_WRITE:
+        text += f", total {format_eta(snapshot['eta_seconds'])}"
+    return text
@@ -0,0 +1,227 @@
+"""Concurrent wipe jobs across several devices.
+
+Each device gets its own worker thread; a global cap limits how many run at
+once. Devices are grouped by the USB hub they hang off (read from sysfs),
+and an optional per-bus bandwidth limit is shared by every job on that hub
+so a full hub of sticks does not thrash itself. All job state is kept in
+one table that front ends can poll with snapshot().
+"""
+
+import os
+import re
+import threading
+import time
+
+from usbzero import capacity, erase, journal, tuning, verify as verifier, wipe
+from usbzero.progress import ProgressTracker, format_eta
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_MAX_WORKERS = 4
+
+_USB_PORT = re.compile(r"\d+-[\d.]+")
+
+
+def bus_of(device_path):
+    """Return a key for the USB hub a block device is attached to.
+
+    Devices that are not on USB (image files, loop devices) each get a key
+    of their own, so they never share a bandwidth limit.
+    """
+    name = os.path.basename(os.path.realpath(device_path))
+    sys_path = os.path.realpath(os.path.join("/sys/class/block", name))
+    ports = [part for part in sys_path.split("/") if _USB_PORT.fullmatch(part)]
+    if not ports:
+        return f"local:{name}"
+    port = ports[-1]
+    if "." in port:
+        return f"usb:{port.rsplit('.', 1)[0]}"
+    return f"usb:usb{port.split('-')[0]}"
+
+
+class BandwidthLimiter:
+    """Paces writers so their combined rate stays under bytes_per_s."""
+
+    def __init__(self, bytes_per_s):
+        self.rate = bytes_per_s
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, nbytes):
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now) + nbytes / self.rate
+            delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class WipeJob:
+    """State of one device in a batch."""
+
+    def __init__(self, device_path, algorithm, passes):
+        self.device_path = device_path
+        self.algorithm = algorithm
+        self.passes = passes
+        self.bus = bus_of(device_path)
+        self.state = QUEUED
+        self.tracker = ProgressTracker(passes)
+        self.started = None
+        self.finished = None
+        self.results = []
+        self.erase = None  # erase.EraseResult once the device is erased
+        self.tuning = None  # tuning.Tuning when the scheduler tunes devices
+        self.capacity = None  # capacity.ProbeResult when the scheduler probes devices
+        self.error = None
+
+    def to_row(self):
+        snap = self.tracker.snapshot()
+        mb_per_s = snap["mb_per_s"] if snap["active"] else None
+        if mb_per_s is None and self.results:
+            mb_per_s = round(self.results[-1].mb_per_s, 1)
+        return {
+            "device": self.device_path,
+            "bus": self.bus,
+            "state": self.state,
+            "pass": snap["pass_index"],
+            "passes": self.passes,
+            "percent": round(snap["overall_fraction"] * 100, 1),
+            "mb_per_s": mb_per_s,
+            "eta_seconds": snap["eta_seconds"],
+            "error": self.error,
+        }
+
+
+class Scheduler:
+    """Runs WipeJobs concurrently under a worker cap and per-bus limits.
+
+    prepare(job) and finish(job) are optional hooks run in the job's worker
+    before the first and after the last pass; raising from either fails the
+    job. erase_strategy is passed to erase.erase() for every device.
+
+    With tune=True each device gets its block size and depth from
+    tuning.tune(). Calibrations run one at a time, so they do not skew each
+    other and the next drive of the same model finds the cached result.
+
+    With probe=True each device's real capacity is probed first (see
+    capacity.py). A fake drive is still wiped and finish() still runs, so it
+    can log the result, but the job then fails.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, bus_bandwidth=None,
+                 direct=True, verify=None, prepare=None, finish=None,
+                 erase_strategy=erase.STRATEGY_OVERWRITE, tune=False, probe=False):
+        self.bus_bandwidth = bus_bandwidth
+        self.tune = tune
+        self.probe = probe
+        self.erase_strategy = erase_strategy
+        self.direct = direct
+        self.verify = verify
+        self.prepare = prepare
+        self.finish = finish
+        self.jobs = []
+        self._slots = threading.Semaphore(max_workers)
+        self._lock = threading.Lock()
+        self._limiters = {}
+        self._threads = []
+        self._tune_lock = threading.Lock()
+
+    def add(self, device_path, algorithm, passes):
+        job = WipeJob(device_path, algorithm, passes)
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def start(self):
+        for job in self.jobs:
+            thread = threading.Thread(target=self._run, args=(job,),
+                                      name=f"usbzero-wipe-{job.device_path}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def wait(self, timeout=None):
+        """Block until every job has finished; returns True if they all did."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        return not self.running
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def snapshot(self):
+        """Return the results table as a list of row dicts."""
+        with self._lock:
+            return [job.to_row() for job in self.jobs]
+
+    def _limiter(self, bus):
+        if not self.bus_bandwidth:
+            return None
+        with self._lock:
+            limiter = self._limiters.get(bus)
+            if limiter is None:
+                limiter = self._limiters[bus] = BandwidthLimiter(self.bus_bandwidth)
+            return limiter
+
+    def _run(self, job):
+        with self._slots:
+            job.state = RUNNING
+            job.started = time.time()
+            limiter = self._limiter(job.bus)
+            last = [0]
+
+            def on_pass(index, wipe_pass):
+                last[0] = 0
+
+            def on_progress(index, done, total):
+                limiter.consume(done - last[0])
+                last[0] = done
+
+            try:
+                if self.prepare:
+                    self.prepare(job)
+                if self.probe:
+                    job.capacity = capacity.probe(job.device_path)
+                options = {}
+                if self.tune:
+                    with self._tune_lock:
+                        job.tuning = tuning.tune(job.device_path, journal.identify(job.device_path))
+                    options = job.tuning.options()
+                job.erase = erase.erase(job.device_path, job.algorithm, job.passes,
+                                        self.erase_strategy, direct=self.direct,
+                                        verify=self.verify, tracker=job.tracker,
+                                        on_pass=on_pass if limiter else None,
+                                        on_progress=on_progress if limiter else None,
+                                        **options)
+                job.results = job.erase.results
+                if wipe.verification_failed(job.results):
+                    raise verifier.VerificationError("Read-back verification failed")
+                if self.finish:
+                    self.finish(job)
+                if job.capacity is not None and job.capacity.fake:
+                    raise capacity.FakeCapacityError(job.capacity.describe())
+                job.state = DONE
+            except Exception as e:
+                job.error = str(e)
+                job.state = FAILED
+            finally:
+                job.finished = time.time()
+
+
+def format_table(rows):
+    """Render snapshot() rows as a fixed-width text table."""
+    lines = [f"{'DEVICE':<16} {'BUS':<14} {'STATE':<8} {'PASS':>7} {'DONE':>6} {'MB/s':>8} "
+             f"{'ETA':>9}  ERROR"]
+    for row in rows:
+        mb_s = "" if row["mb_per_s"] is None else f"{row['mb_per_s']:.1f}"
+        eta = format_eta(row["eta_seconds"]) if row["eta_seconds"] is not None else ""
+        lines.append(
+            f"{row['device']:<16} {row['bus']:<14} {row['state']:<8} "
+            f"{row['pass']:>3}/{row['passes']:<3} {row['percent']:>5.1f}% {mb_s:>8} {eta:>9}  "
+            f"{row['error'] or ''}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,206 @@
+"""Ed25519 signatures for wipe logs.
+
+A bare SHA-256 of the log shows accidental damage but anyone who edits a
+log can recompute it. Each station therefore signs its logs with an Ed25519
+key kept in KEY_DIR, created on first use, with the private key readable by
+the owner only. The .sig next to a log holds the SHA-256 line as before, the
+signature over the exact bytes of the .json file and the public key:
+
+    sha256: <hex>
+    ed25519: <base64 signature>
+    key: <hex public key>
+
+Auditors trust a station by its public key (the .pub file); verify_logs()
+checks thousands of logs across all cores and sorts them into valid,
+tampered, unsigned and signed by an unknown key. The key in a .sig is only
+used to check the signature: anyone who edits a log can re-sign it with a
+key of their own, so a log is only valid if that key is a trusted one.
+
+Signing needs the cryptography package. Without it logs get the SHA-256
+line only, as before, and show up as unsigned.
+"""
+
+import base64
+import concurrent.futures
+import functools
+import glob
+import hashlib
+import importlib.util
+import os
+
+KEY_DIR = "keys"
+PRIVATE_KEY_NAME = "usbzero_ed25519.pem"
+PUBLIC_KEY_NAME = "usbzero_ed25519.pub"
+
+STATUS_VALID = "valid"
+STATUS_TAMPERED = "tampered"
+STATUS_UNSIGNED = "unsigned"
+STATUS_UNTRUSTED = "untrusted"  # Valid signature, but not by a trusted key
+STATUS_MISSING = "missing"      # No .sig file
+STATUS_UNREADABLE = "unreadable"
+STATUSES = (STATUS_VALID, STATUS_TAMPERED, STATUS_UNSIGNED, STATUS_UNTRUSTED, STATUS_MISSING,
+            STATUS_UNREADABLE)
+
+LOG_PATTERN = "usbzero_log_*.json"
+_CHUNK = 64  # Logs per task handed to a worker process
+
+
+class SigningError(Exception):
+    """Raised when a signing key cannot be loaded or created."""
+
+
+def available():
+    """Return True if Ed25519 signing is possible here."""
+    return importlib.util.find_spec("cryptography") is not None
+
+
+def _ed25519():
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+    return ed25519
+
+
+def _raw_public(public_key):
+    from cryptography.hazmat.primitives import serialization
+    return public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+def load_key(key_dir=KEY_DIR, create=True):
+    """Return the station's Ed25519 private key, creating it if needed."""
+    from cryptography.hazmat.primitives import serialization
+
+    path = os.path.join(key_dir, PRIVATE_KEY_NAME)
+    try:
+        with open(path, "rb") as f:
+            return serialization.load_pem_private_key(f.read(), password=None)
+    except FileNotFoundError:
+        if not create:
+            raise SigningError(f"No signing key in {key_dir}")
+    except (OSError, ValueError) as e:
+        raise SigningError(f"Could not load the signing key {path}: {e}")
+
+    key = _ed25519().Ed25519PrivateKey.generate()
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    try:
+        os.makedirs(key_dir, mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        with open(os.path.join(key_dir, PUBLIC_KEY_NAME), "w") as f:
+            f.write(_raw_public(key.public_key()).hex() + "\n")
+    except FileExistsError:
+        # Another job created it first
+        return load_key(key_dir, create=False)
+    except OSError as e:
+        raise SigningError(f"Could not create the signing key {path}: {e}")
+    return key
+
+
+def read_public_key(path):
+    """Read a .pub file (hex public key) and return the hex string."""
+    with open(path) as f:
+        key = f.read().strip().lower()
+    if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+        raise SigningError(f"{path} is not an Ed25519 public key")
+    return key
+
+
+def sign(data, key_dir=KEY_DIR):
+    """Return the .sig contents for data, the bytes of a .json log.
+
+    With key_dir=None, or without cryptography, only the SHA-256 line is
+    written.
+    """
+    text = f"sha256: {hashlib.sha256(data).hexdigest()}\n"
+    if key_dir is None or not available():
+        return text
+    key = load_key(key_dir)
+    signature = base64.b64encode(key.sign(data)).decode()
+    return text + f"ed25519: {signature}\nkey: {_raw_public(key.public_key()).hex()}\n"
+
+
+def parse_signature(text):
+    """Turn .sig contents into a dict of their "name: value" lines."""
+    fields = {}
+    for line in text.splitlines():
+        name, sep, value = line.partition(":")
+        if sep:
+            fields[name.strip()] = value.strip()
+    return fields
+
+
+def signature_path(log_path):
+    return os.path.splitext(log_path)[0] + ".sig"
+
+
+def verify_log(log_path, trusted=None):
+    """Check one log against its .sig. Returns (log_path, status, key).
+
+    trusted is a collection of hex public keys. The signature is checked
+    against the key recorded in the .sig, and is reported as untrusted
+    unless that key is in trusted, so with no trusted keys no log is valid.
+    """
+    try:
+        with open(log_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return log_path, STATUS_UNREADABLE, None
+    try:
+        with open(signature_path(log_path), encoding="utf-8") as f:
+            fields = parse_signature(f.read())
+    except FileNotFoundError:
+        return log_path, STATUS_MISSING, None
+    except (OSError, UnicodeDecodeError):
+        return log_path, STATUS_UNREADABLE, None
+
+    digest = fields.get("sha256")
+    if digest is not None and digest != hashlib.sha256(data).hexdigest():
+        return log_path, STATUS_TAMPERED, fields.get("key")
+    if "ed25519" not in fields:
+        return log_path, STATUS_UNSIGNED if digest else STATUS_TAMPERED, None
+
+    from cryptography.exceptions import InvalidSignature
+
+    key = fields.get("key", "").lower()
+    try:
+        public_key = _ed25519().Ed25519PublicKey.from_public_bytes(bytes.fromhex(key))
+        public_key.verify(base64.b64decode(fields["ed25519"], validate=True), data)
+    except (ValueError, InvalidSignature):
+        return log_path, STATUS_TAMPERED, key or None
+    if not trusted or key not in trusted:
+        return log_path, STATUS_UNTRUSTED, key
+    return log_path, STATUS_VALID, key
+
+
+def _verify_chunk(paths, trusted):
+    return [verify_log(path, trusted) for path in paths]
+
+
+def find_logs(paths):
+    """Expand directories to the log files in them; files are kept as given."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, LOG_PATTERN))))
+        else:
+            found.append(path)
+    return found
+
+
+def verify_logs(paths, trusted=None, workers=None):
+    """Verify many logs in parallel worker processes.
+
+    Yields (log_path, status, key) in the order of paths. Signature checks
+    are CPU-bound, so the logs are split into chunks spread over workers
+    processes (default: one per core).
+    """
+    trusted = frozenset(key.lower() for key in trusted or ())
+    workers = workers or os.cpu_count() or 1
+    chunks = [paths[i:i + _CHUNK] for i in range(0, len(paths), _CHUNK)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _verify_chunk(chunk, trusted)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        for results in pool.map(functools.partial(_verify_chunk, trusted=trusted), chunks):
+            yield from results
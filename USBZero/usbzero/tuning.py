@@ -0,0 +1,208 @@
+"""Per-device calibration of block size, buffers in flight and stripes.
+
+USB controllers differ a lot: many peak with 4-16 MiB writes, and cheap
+ones slow down when too much is in flight. Before a wipe, calibrate()
+writes TRIAL_BYTES at the start of the device with each candidate block
+size (at DEFAULT_DEPTH buffers), then with each candidate depth at the
+fastest block size, then with each stripe count (see engine.write_pass),
+and keeps the fastest combination. The trial data is random and is
+overwritten by the first pass.
+
+Calibration never runs when an interrupted wipe is resumed: the resumed
+pass only rewrites from its checkpoint onward, so trial data at the start
+would survive the wipe. A resumed wipe uses the settings recorded in its
+journal instead (see for_resume()).
+
+Results are cached in TUNING_FILE under the drive's serial number and under
+its model and capacity, so the next stick of a batch of identical ones
+skips calibration. Image files and drives without a model are calibrated
+every time, which costs a few seconds.
+"""
+
+import json
+import os
+import threading
+import time
+
+from usbzero import engine, pipeline, rng
+from usbzero.buffers import BufferPool
+from usbzero.logs import LOG_DIR
+
+TUNING_FILE = os.path.join(LOG_DIR, "tuning.json")
+
+MIB = 1024 * 1024
+BLOCK_SIZES = (1 * MIB, 4 * MIB, 16 * MIB)
+DEPTHS = (1, 2, 4)
+STRIPES = (1, 2, 4)
+DEFAULT_DEPTH = engine.PIPELINE_DEPTH
+TRIAL_BYTES = 64 * MIB
+
+_cache_lock = threading.Lock()
+
+
+class Tuning:
+    """The block size, depth and stripe count chosen for a device."""
+
+    def __init__(self, block_size, depth, mb_per_s=None, trials=None, cached=False,
+                 stripes=engine.STRIPES):
+        self.block_size = block_size
+        self.depth = depth
+        self.stripes = stripes
+        self.mb_per_s = mb_per_s
+        self.trials = trials or []  # [{"block_size", "depth", "stripes", "mb_per_s"}, ...]
+        self.cached = cached
+
+    @classmethod
+    def from_dict(cls, data, cached=False):
+        return cls(data["block_size"], data["depth"], data.get("mb_per_s"), data.get("trials"),
+                   cached, data.get("stripes", engine.STRIPES))
+
+    def options(self):
+        """Keyword arguments for wipe.run_passes() / engine.write_pass()."""
+        return {"block_size": self.block_size, "depth": self.depth, "stripes": self.stripes}
+
+    def describe(self):
+        source = "cached" if self.cached else f"calibrated, {self.mb_per_s:.1f} MB/s"
+        stripes = f", {self.stripes} stripes" if self.stripes > 1 else ""
+        return f"{self.block_size // MIB} MiB blocks, {self.depth} in flight{stripes} ({source})"
+
+    def to_dict(self):
+        return {
+            "block_size": self.block_size,
+            "depth": self.depth,
+            "stripes": self.stripes,
+            "mb_per_s": self.mb_per_s,
+            "cached": self.cached,
+            "trials": self.trials,
+        }
+
+
+def cache_keys(identity):
+    """Return the cache keys of a journal.identify() identity, best first."""
+    keys = []
+    if identity.get("serial"):
+        keys.append(f"serial:{identity['serial']}")
+    if identity.get("model") and identity["model"] != "Unknown":
+        keys.append(f"model:{identity['model']}|{identity['size']}")
+    return keys
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def lookup(identity, path=TUNING_FILE):
+    """Return the cached Tuning for a device, or None."""
+    cache = _load_cache(path)
+    for key in cache_keys(identity):
+        if key in cache:
+            return Tuning.from_dict(cache[key], cached=True)
+    return None
+
+
+def store(identity, tuning, path=TUNING_FILE):
+    keys = cache_keys(identity)
+    if not keys:
+        return
+    entry = dict(tuning.to_dict(), model=identity.get("model"), size=identity.get("size"),
+                 updated=time.time())
+    entry.pop("cached")
+    with _cache_lock:
+        cache = _load_cache(path)
+        for key in keys:
+            cache[key] = entry
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp, path)
+
+
+def _trial(device_path, fill, block_size, depth, stripes, length):
+    fd, _ = engine.open_device(device_path, direct=True)
+    errors = []
+
+    def run(begin, end):
+        try:
+            with BufferPool(depth, block_size) as pool:
+                pipeline.run(end, fill, lambda chunk, offset: engine.write_at(fd, chunk, offset),
+                             pool, start_offset=begin)
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=run, args=r, daemon=True)
+                   for r in engine.stripe_ranges(0, length, block_size, stripes)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        os.fsync(fd)
+        seconds = time.perf_counter() - start
+    finally:
+        os.close(fd)
+    return length / seconds / 1e6
+
+
+def calibrate(device_path, size, block_sizes=BLOCK_SIZES, depths=DEPTHS, stripes=STRIPES,
+              trial_bytes=TRIAL_BYTES, on_status=None):
+    """Measure candidate settings on device_path and return the best Tuning."""
+    fill = rng.KeyedStream().fill
+    trials = []
+
+    def run(block_size, depth, stripe_count=1):
+        length = min(size - size % block_size, max(trial_bytes, 2 * block_size * stripe_count))
+        if length <= 0:
+            return 0.0
+        if on_status:
+            on_status(f"Calibrating: {block_size // MIB} MiB blocks, {depth} in flight, "
+                      f"{stripe_count} stripes...")
+        mb_per_s = _trial(device_path, fill, block_size, depth, stripe_count, length)
+        trials.append({"block_size": block_size, "depth": depth, "stripes": stripe_count,
+                       "mb_per_s": round(mb_per_s, 1)})
+        return mb_per_s
+
+    # Block size first, then the depth at the best block size, then stripes
+    results = {(bs, DEFAULT_DEPTH, 1): run(bs, DEFAULT_DEPTH) for bs in block_sizes}
+    best_block = max(results, key=results.get)[0]
+    for depth in depths:
+        if (best_block, depth, 1) not in results:
+            results[(best_block, depth, 1)] = run(best_block, depth)
+    best_block, best_depth, _ = max(results, key=results.get)
+    for count in stripes:
+        if (best_block, best_depth, count) not in results:
+            results[(best_block, best_depth, count)] = run(best_block, best_depth, count)
+    (block_size, depth, stripe_count), mb_per_s = max(results.items(), key=lambda item: item[1])
+    return Tuning(block_size, depth, round(mb_per_s, 1), trials, stripes=stripe_count)
+
+
+def for_resume(journal, identity, path=TUNING_FILE):
+    """Return the Tuning for resuming journal's wipe without calibrating.
+
+    That is the Tuning recorded when the wipe started, else the cached one
+    for the drive, else None (the engine defaults).
+    """
+    if journal.info.get("tuning"):
+        return Tuning.from_dict(journal.info["tuning"], cached=True)
+    return lookup(identity, path)
+
+
+def tune(device_path, identity, path=TUNING_FILE, on_status=None, recalibrate=False):
+    """Return the Tuning for a device, calibrating and caching it if needed.
+
+    identity is the dict from journal.identify().
+    """
+    if not recalibrate:
+        cached = lookup(identity, path)
+        if cached is not None:
+            return cached
+    tuning = calibrate(device_path, identity["size"], on_status=on_status)
+    store(identity, tuning, path)
+    return tuning
@@ -0,0 +1,401 @@
+"""Read-back verification of overwrite passes.
+
+The device is read sequentially in large blocks and compared against the
+data the pass was supposed to write. The expected data comes from the same
+fill function the pass used: fixed patterns are copied from their shared
+buffer, and random passes are regenerated from the keyed stream's seed, so
+nothing written has to be kept in memory.
+
+Reads use O_DIRECT where possible so the check sees the media and not the
+page cache. Otherwise the cached pages are dropped first and sequential
+readahead is requested.
+
+sample_pass() is the quick variant for large drives: it reads a configurable
+number of randomly placed blocks, one from each equal slice of the LBA range,
+plus the areas that always matter (the first two and last MiB, which hold the
+MBR, both GPT copies and the first superblock of a filesystem such as ext4).
+
+Both take skip, the byte ranges a tolerant pass could not write (see
+badblocks.py), and check only the data around them. A block that fails to
+read with a media error is recorded as unreadable and the read-back goes
+on; the result is then not ok.
+"""
+
+import errno
+import math
+import os
+import random
+import time
+
+from usbzero import badblocks, engine
+from usbzero.buffers import BufferPool
+
+VERIFY_LAST = "last"
+VERIFY_ALL = "all"
+VERIFY_SAMPLE = "sample"  # Sampled check of the final pass
+VERIFY_MODES = (VERIFY_LAST, VERIFY_ALL, VERIFY_SAMPLE)
+
+MAX_RANGES = 1000  # Cap on mismatch ranges kept in a result
+
+DEFAULT_SAMPLES = 256
+SAMPLE_SIZE = 1024 * 1024
+HEAD_BYTES = 2 * 1024 * 1024  # Protective MBR, primary GPT and the ext4 superblock at 1 MiB
+TAIL_BYTES = 1024 * 1024      # Backup GPT
+DEFAULT_UNWIPED_FRACTION = 0.001
+
+
+class VerificationError(Exception):
+    """Raised when read-back data does not match what was written."""
+
+
+class VerifyResult:
+    """Outcome of reading back one pass."""
+
+    def __init__(self, device_path, bytes_checked, seconds, mismatches, mismatch_bytes,
+                 unreadable=None, unreadable_bytes=0):
+        self.device_path = device_path
+        self.bytes_checked = bytes_checked
+        self.seconds = seconds
+        self.mismatches = mismatches  # [(start, end), ...] byte ranges
+        self.mismatch_bytes = mismatch_bytes  # Size of the mismatching sectors
+        self.unreadable = unreadable or []  # [(start, end), ...] blocks that failed with EIO
+        self.unreadable_bytes = unreadable_bytes
+
+    @classmethod
+    def from_dict(cls, device_path, data):
+        """Rebuild a result recorded by to_dict(), e.g. from a checkpoint journal."""
+        def byte_ranges(sectors):
+            return [(first * engine.SECTOR_SIZE, (last + 1) * engine.SECTOR_SIZE)
+                    for first, last in sectors]
+
+        return cls(device_path, data["bytes_checked"], data["seconds"],
+                   byte_ranges(data["mismatch_sectors"]), data["mismatch_bytes"],
+                   byte_ranges(data.get("unreadable_sectors", [])),
+                   data.get("unreadable_bytes", 0))
+
+    @property
+    def ok(self):
+        return self.mismatch_bytes == 0 and self.unreadable_bytes == 0
+
+    @property
+    def mb_per_s(self):
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes_checked / self.seconds / 1e6
+
+    def to_dict(self):
+        return {
+            "mode": "full",
+            "ok": self.ok,
+            "bytes_checked": self.bytes_checked,
+            "seconds": round(self.seconds, 3),
+            "mb_per_s": round(self.mb_per_s, 1),
+            "mismatch_bytes": self.mismatch_bytes,
+            "mismatch_sectors": _sectors(self.mismatches),
+            "unreadable_bytes": self.unreadable_bytes,
+            "unreadable_sectors": _sectors(self.unreadable),
+        }
+
+
+def _sectors(ranges):
+    return [[start // engine.SECTOR_SIZE, -(-end // engine.SECTOR_SIZE) - 1]
+            for start, end in ranges]
+
+
+def open_for_read(device_path):
+    """Open device_path for reading, bypassing the page cache if possible.
+
+    Returns (fd, direct).
+    """
+    flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+    o_direct = getattr(os, "O_DIRECT", 0)
+    if o_direct:
+        try:
+            return os.open(device_path, flags | o_direct), True
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+    fd = os.open(device_path, flags)
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    return fd, False
+
+
+def read_at(fd, buf, offset):
+    """Fill buf from offset, retrying short reads. Returns bytes read."""
+    view = memoryview(buf)
+    total = 0
+    while total < len(view):
+        if hasattr(os, "preadv"):
+            n = os.preadv(fd, [view[total:]], offset + total)
+        else:
+            os.lseek(fd, offset + total, os.SEEK_SET)
+            n = os.readv(fd, [view[total:]])
+        if n == 0:
+            break
+        total += n
+    return total
+
+
+def _add_range(ranges, start, end):
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    elif len(ranges) < MAX_RANGES:
+        ranges.append((start, end))
+
+
+def _locate(actual, expected, offset, ranges):
+    """Record the mismatching sectors of a block. Returns bytes affected."""
+    bad = 0
+    step = engine.SECTOR_SIZE
+    for pos in range(0, len(actual), step):
+        end = min(pos + step, len(actual))
+        if expected[pos:end] != actual[pos:end]:
+            _add_range(ranges, offset + pos, offset + end)
+            bad += end - pos
+    return bad
+
+
+def check_range(fd, fill, offset, length, read_buf, expected, ranges, direct=False,
+                device_path=None):
+    """Compare length bytes at offset against fill. Returns mismatching bytes."""
+    actual = read_buf[:length]
+    try:
+        if direct and (offset % engine.DIRECT_ALIGN or length % engine.DIRECT_ALIGN):
+            # O_DIRECT cannot read an unaligned range
+            tail_fd = os.open(device_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            try:
+                got = read_at(tail_fd, actual, offset)
+            finally:
+                os.close(tail_fd)
+        else:
+            got = read_at(fd, actual, offset)
+
+        want = memoryview(expected)[:length]
+        fill(want, offset)
+        want.release()
+        # bytearray == buffer is a single memcmp; memoryview == memoryview is per item
+        same = got == length and (expected == actual if length == len(expected)
+                                  else expected[:length] == actual)
+        if same:
+            return 0
+        bad = _locate(actual[:got], expected, offset, ranges)
+        if got < length:
+            _add_range(ranges, offset + got, offset + length)
+            bad += length - got
+        return bad
+    finally:
+        actual.release()
+
+
+def outside(offset, length, skip):
+    """Yield the (offset, length) pieces of a range not covered by skip.
+
+    skip is a sorted list of (start, end) byte ranges.
+    """
+    end = offset + length
+    for start, stop in skip or ():
+        if stop <= offset:
+            continue
+        if start >= end:
+            break
+        if start > offset:
+            yield offset, start - offset
+        offset = max(offset, stop)
+    if offset < end:
+        yield offset, end - offset
+
+
+def _check(fd, fill, offset, length, read_buf, expected, ranges, direct, device_path, skip,
+           unreadable):
+    # Returns (mismatching bytes, unreadable bytes)
+    bad = lost = 0
+    for piece, piece_length in outside(offset, length, skip):
+        try:
+            bad += check_range(fd, fill, piece, piece_length, read_buf, expected, ranges, direct,
+                               device_path)
+        except OSError as e:
+            if e.errno not in badblocks.MEDIA_ERRORS:
+                raise
+            _add_range(unreadable, piece, piece + piece_length)
+            lost += piece_length
+    return bad, lost
+
+
+def verify_pass(device_path, fill, block_size=engine.BLOCK_SIZE, on_progress=None, skip=None):
+    """Read the whole device back and compare it with fill(buf, offset).
+
+    Byte ranges in skip are not checked.
+    """
+    fd, direct = open_for_read(device_path)
+    try:
+        size = engine.get_device_size(fd)
+        ranges = []
+        unreadable = []
+        mismatch_bytes = unreadable_bytes = 0
+        expected = bytearray(block_size)
+        with BufferPool(1, block_size) as pool:
+            read_buf = pool.acquire()
+            start = time.perf_counter()
+            offset = 0
+            while offset < size:
+                length = min(block_size, size - offset)
+                bad, lost = _check(fd, fill, offset, length, read_buf, expected, ranges, direct,
+                                   device_path, skip, unreadable)
+                mismatch_bytes += bad
+                unreadable_bytes += lost
+                offset += length
+                if on_progress:
+                    on_progress(offset, size)
+            seconds = time.perf_counter() - start
+            pool.release(read_buf)
+        return VerifyResult(device_path, size, seconds, ranges, mismatch_bytes, unreadable,
+                            unreadable_bytes)
+    finally:
+        os.close(fd)
+
+
+class SampleResult(VerifyResult):
+    """Outcome of a sampled read-back, with its statistical strength."""
+
+    def __init__(self, device_path, device_size, samples, bytes_checked, seconds, mismatches,
+                 mismatch_bytes, unwiped_fraction=DEFAULT_UNWIPED_FRACTION, unreadable=None,
+                 unreadable_bytes=0):
+        super().__init__(device_path, bytes_checked, seconds, mismatches, mismatch_bytes,
+                         unreadable, unreadable_bytes)
+        self.device_size = device_size
+        self.samples = samples
+        self.unwiped_fraction = unwiped_fraction
+
+    @property
+    def coverage(self):
+        """Fraction of the device that was actually read."""
+        return self.bytes_checked / self.device_size if self.device_size else 0.0
+
+    @property
+    def confidence(self):
+        """Probability that the random samples would have caught a wipe that
+        missed unwiped_fraction of the device.
+
+        On small devices the samples can cover every byte, and then nothing
+        was left to chance.
+        """
+        if self.fully_covered:
+            return 1.0
+        return 1.0 - (1.0 - self.unwiped_fraction) ** self.samples
+
+    @property
+    def fully_covered(self):
+        return bool(self.device_size) and self.bytes_checked >= self.device_size
+
+    def detectable_fraction(self, confidence=0.95):
+        """Smallest unwiped fraction detected with the given confidence."""
+        if self.fully_covered:
+            return 0.0
+        if not self.samples:
+            return 1.0
+        return 1.0 - (1.0 - confidence) ** (1.0 / self.samples)
+
+    def to_dict(self):
+        data = super().to_dict()
+        data.update({
+            "mode": "sampled",
+            "samples": self.samples,
+            "coverage": round(self.coverage, 6),
+            "unwiped_fraction": self.unwiped_fraction,
+            "confidence": round(self.confidence, 6),
+            "detectable_fraction_95": round(self.detectable_fraction(), 6),
+        })
+        return data
+
+
+def sample_regions(size, samples=DEFAULT_SAMPLES, sample_size=SAMPLE_SIZE, rng=None):
+    """Return sorted, non-overlapping (offset, length) regions to read.
+
+    The fixed head and tail areas come first; the remaining range is cut
+    into samples equal slices with one randomly placed, aligned block each.
+    When the slices are no larger than a block the whole range is read, as
+    the samples would cover it anyway except for alignment gaps.
+    """
+    rng = rng or random.SystemRandom()
+    align = engine.DIRECT_ALIGN
+    head = min(HEAD_BYTES, size)
+    tail_start = max(head, size - TAIL_BYTES)
+    regions = [(0, head)]
+    if tail_start < size:
+        regions.append((tail_start, size - tail_start))
+
+    span = tail_start - head
+    if samples and 0 < span <= samples * sample_size:
+        regions.append((head, span))
+    elif samples and span > 0:
+        stride = span / samples
+        for i in range(samples):
+            lo = -(-(head + int(i * stride)) // align) * align
+            hi = head + int((i + 1) * stride)
+            length = min(sample_size, hi - lo)
+            if length <= 0:
+                continue
+            offset = lo + rng.randrange((hi - lo - length) // align + 1) * align
+            regions.append((offset, length))
+
+    regions.sort()
+    merged = []
+    for offset, length in regions:
+        if merged and offset <= merged[-1][0] + merged[-1][1]:
+            start = merged[-1][0]
+            merged[-1] = (start, max(merged[-1][1], offset + length - start))
+        else:
+            merged.append((offset, length))
+    return merged
+
+
+def sample_pass(device_path, fill, samples=DEFAULT_SAMPLES, sample_size=SAMPLE_SIZE,
+                unwiped_fraction=DEFAULT_UNWIPED_FRACTION, rng=None, on_progress=None,
+                skip=None):
+    """Read back randomly chosen blocks and the partition-table areas.
+
+    Byte ranges in skip are not checked.
+    """
+    fd, direct = open_for_read(device_path)
+    try:
+        size = engine.get_device_size(fd)
+        regions = sample_regions(size, samples, sample_size, rng)
+        total = sum(length for _, length in regions)
+        block_size = max(sample_size, engine.BLOCK_SIZE)
+        block_size -= block_size % engine.DIRECT_ALIGN
+        ranges = []
+        unreadable = []
+        mismatch_bytes = unreadable_bytes = 0
+        checked = 0
+        expected = bytearray(block_size)
+        with BufferPool(1, block_size) as pool:
+            read_buf = pool.acquire()
+            start = time.perf_counter()
+            for offset, length in regions:
+                end = offset + length
+                while offset < end:
+                    chunk = min(block_size, end - offset)
+                    bad, lost = _check(fd, fill, offset, chunk, read_buf, expected, ranges,
+                                       direct, device_path, skip, unreadable)
+                    mismatch_bytes += bad
+                    unreadable_bytes += lost
+                    offset += chunk
+                    checked += chunk
+                    if on_progress:
+                        on_progress(checked, total)
+            seconds = time.perf_counter() - start
+            pool.release(read_buf)
+        return SampleResult(device_path, size, samples, checked, seconds, ranges,
+                            mismatch_bytes, unwiped_fraction, unreadable, unreadable_bytes)
+    finally:
+        os.close(fd)
+
+
+def samples_for_confidence(confidence, unwiped_fraction=DEFAULT_UNWIPED_FRACTION):
+    """Number of random samples needed to reach confidence for unwiped_fraction."""
+    return math.ceil(math.log(1.0 - confidence) / math.log(1.0 - unwiped_fraction))
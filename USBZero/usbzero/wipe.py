@@ -0,0 +1,158 @@
+"""Runs an algorithm's pass schedule over one device.
+
+This is the single place where a wipe is driven pass by pass; the GUI, the
+batch scheduler and the CLI all go through run_passes().
+"""
+
+from usbzero import badblocks, engine, patterns, progress, verify as verifier
+
+
+def run_passes(device_path, algorithm, passes, direct=True, on_pass=None, on_progress=None,
+               verify=None, on_verify=None, samples=verifier.DEFAULT_SAMPLES, tracker=None,
+               journal=None, merkle=True, rng_backend=None, tolerate_errors=True,
+               **engine_options):
+    """Overwrite device_path with every pass of algorithm's schedule.
+
+    on_pass(index, wipe_pass) is called before each pass and
+    on_progress(index, bytes_done, total_bytes) after every block. verify is
+    None, "last", "all" or "sample" and selects which passes are read back
+    ("sample" checks samples random blocks of the final pass); each verified
+    PassResult gets a .verify result, and on_verify(index) is called before
+    the read-back starts. tracker, a progress.ProgressTracker, is kept up to
+    date for front ends that poll it. Extra keyword arguments go to
+    engine.write_pass. Returns the list of PassResult objects; the first
+    failing pass raises.
+
+    journal, a journal.Journal, is checkpointed as the wipe runs. If it
+    already records progress the wipe resumes from there: finished passes
+    are taken from the journal and the interrupted one continues from its
+    last durable offset with its original seed.
+
+    merkle hashes the blocks of the final pass into a Merkle tree (see
+    merkle.py), available as that PassResult's .merkle. rng_backend
+    selects the rng backend for random passes (default: the fastest).
+
+    tolerate_errors maps sectors that fail with I/O errors and carries on
+    (see badblocks.py); each PassResult's .bad_regions holds what could not
+    be written, and verification skips those ranges.
+    """
+    if verify not in (None,) + verifier.VERIFY_MODES:
+        raise ValueError(f"Unknown verify mode: {verify}")
+    schedule = patterns.build_schedule(algorithm, passes)
+    results = []
+    if journal:
+        for data in journal.completed:
+            result = engine.PassResult.from_dict(device_path, data)
+            if data.get("verify"):
+                result.verify = verifier.VerifyResult.from_dict(device_path, data["verify"])
+            results.append(result)
+    block_size = engine_options.get("block_size", engine.BLOCK_SIZE)
+    try:
+        for index, wipe_pass in enumerate(schedule):
+            if index < len(results):
+                continue
+            start_offset, seed = 0, None
+            if journal and journal.pass_index == index:
+                # Resume on a block boundary even if the block size changed
+                start_offset = journal.offset - journal.offset % block_size
+                seed = journal.seed
+            if on_pass:
+                on_pass(index, wipe_pass)
+            if tracker:
+                tracker.begin(index, 0, progress.PHASE_WRITE, wipe_pass.label, done=start_offset)
+            fill, seed = wipe_pass.make_fill(seed, rng_backend)
+            if journal:
+                journal.start_pass(index, seed)
+
+            def pass_progress(done, total, index=index):
+                if tracker:
+                    tracker.update(done, total)
+                if on_progress:
+                    on_progress(index, done, total)
+
+            result = engine.write_pass(device_path, fill, direct=direct,
+                                       on_progress=pass_progress if on_progress or tracker else None,
+                                       start_offset=start_offset,
+                                       on_checkpoint=journal.checkpoint if journal else None,
+                                       merkle=merkle and index == len(schedule) - 1,
+                                       tolerate_errors=tolerate_errors, **engine_options)
+            result.pass_index = index
+            result.label = wipe_pass.label
+            result.seed = seed
+            results.append(result)
+
+            if verify == verifier.VERIFY_ALL or (verify and index == len(schedule) - 1):
+                if on_verify:
+                    on_verify(index)
+                if tracker:
+                    tracker.begin(index, 0, progress.PHASE_VERIFY, wipe_pass.label)
+                verify_progress = tracker.update if tracker else None
+                skip = result.bad_regions.ranges if result.bad_regions is not None else None
+                if verify == verifier.VERIFY_SAMPLE:
+                    result.verify = verifier.sample_pass(device_path, fill, samples=samples,
+                                                         on_progress=verify_progress, skip=skip)
+                else:
+                    result.verify = verifier.verify_pass(device_path, fill, block_size=block_size,
+                                                         on_progress=verify_progress, skip=skip)
+            if journal:
+                journal.complete_pass(result)
+    except BaseException:
+        if tracker:
+            tracker.finish(completed=False)
+        raise
+    if tracker:
+        tracker.finish()
+    return results
+
+
+def verification_failed(results):
+    """Return True if any verified pass read back different data."""
+    return any(r.verify is not None and not r.verify.ok for r in results)
+
+
+def final_merkle(results):
+    """Return the Merkle tree of the final pass, or None."""
+    return results[-1].merkle if results else None
+
+
+def unwritable(results):
+    """Return the log summary of the sectors no pass could write, or None.
+
+    A sector bad in any pass may still hold old data, so the ranges of all
+    passes are combined.
+    """
+    passes = [r.bad_regions for r in results if r.bad_regions is not None]
+    if not any(bad.ranges for bad in passes):
+        return None
+    combined = badblocks.BadRegions(passes[0].sector_size)
+    for bad in passes:
+        for start, end in bad.ranges:
+            combined.add(start, end)
+    data = combined.to_dict()
+    return {"bytes": data["bytes"], "sector_size": data["sector_size"],
+            "sectors": data["sectors"]}
+
+
+def summarize(results):
+    """Return the per-pass lines recorded in the log's deleted_files field."""
+    lines = []
+    for r in results:
+        lines.append(f"Pass {r.pass_index + 1} complete ({r.label}, {r.bytes_written} bytes, "
+                     f"{r.mb_per_s:.1f} MB/s)")
+        if r.verify is not None:
+            outcome = "OK" if r.verify.ok else f"{r.verify.mismatch_bytes} bytes differ"
+            if r.verify.unreadable_bytes:
+                outcome += f", {r.verify.unreadable_bytes} bytes unreadable"
+            if isinstance(r.verify, verifier.SampleResult):
+                outcome += (f", {r.verify.samples} samples, {r.verify.coverage:.2%} coverage, "
+                            f"{r.verify.confidence:.1%} confidence")
+            lines.append(f"Pass {r.pass_index + 1} verified: {outcome} ({r.verify.mb_per_s:.1f} MB/s)")
+        if r.bad_regions is not None and r.bad_regions.ranges:
+            bad = r.bad_regions
+            lines.append(f"Pass {r.pass_index + 1} could not write {bad.bytes} bytes in "
+                         f"{len(bad.ranges)} ranges ({bad.errors} write errors, "
+                         f"{bad.seconds:.1f} s)")
+        if r.merkle is not None:
+            lines.append(f"Pass {r.pass_index + 1} Merkle root ({r.merkle.count} blocks): "
+                         f"{r.merkle.root().hex()}")
+    return lines
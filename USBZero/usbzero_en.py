@@ -1,20 +1,19 @@
 # usbzero_en.py - USBZero English Version with Integrated Icon and Embedded PNG for EXE
 
 import os
+import datetime
 import psutil
 import subprocess
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import messagebox
 import threading
 import time
 import json
-import uuid
-import hashlib
-from datetime import datetime
 from PIL import Image
 import sys
-import glob
 import webbrowser # Ensure this import is present
+from usbzero import logs, logstore, patterns
 
 # PyInstaller-compatible path resolver
 def resource_path(relative_path):
@@ -37,9 +36,17 @@ def list_removable_drives():
                 continue
     return drives or ["No USB found"]
 
+# Drive letter -> model; wmic is slow, so each drive is only asked once
+_model_cache = {}
+
 def get_usb_model_by_letter(drive_letter):
+    drive_letter = drive_letter.replace(':', '')
+    if drive_letter not in _model_cache:
+        _model_cache[drive_letter] = _query_usb_model(drive_letter)
+    return _model_cache[drive_letter]
+
+def _query_usb_model(drive_letter):
     try:
-        drive_letter = drive_letter.replace(':', '')
         partitions = subprocess.check_output("wmic path Win32_LogicalDiskToPartition get *", shell=True).decode().splitlines()
         index = None
         for line in partitions:
@@ -77,16 +84,19 @@ def format_usb(drive_letter):
         messagebox.showerror("Format Error", f"Error during formatting: {e}")
         return False
 
-def overwrite_drive(drive_path, pass_index):
+def overwrite_drive(drive_path, pass_index, wipe_pass):
     deleted_files = []
     try:
         # The function now performs a single pass using the given pass_index for unique naming
         dummy_file = os.path.join(drive_path, f"usbzero_wipe_pass_{pass_index}.bin") # Use pass_index in filename
         try:
+            fill, seed = wipe_pass.make_fill()  # Random passes are seeded once from os.urandom
+            chunk = memoryview(bytearray(1024 * 1024))  # Reused for every chunk
             with open(dummy_file, "wb") as f:
                 # Writing 100MB, can be adjusted or made configurable
-                for _ in range(100): # Loop for writing chunks
-                    f.write(os.urandom(1024 * 1024))
+                for i in range(100): # Loop for writing chunks
+                    fill(chunk, i * len(chunk))
+                    f.write(chunk)
             deleted_files.append(dummy_file)
             os.remove(dummy_file)
         except Exception as e:
@@ -98,36 +108,38 @@ def overwrite_drive(drive_path, pass_index):
         return False, deleted_files
 
 def save_log(drive_path, algorithm, passes, deleted_files, hpa_dco_status, drive_letter_for_model):
-    log = {
-        "uuid": str(uuid.uuid4()),
-        "drive": drive_path,
-        "timestamp": datetime.now().isoformat(),
-        "algorithm": algorithm,
-        "passes": passes,
-        "deleted_files": deleted_files,
-        "hpa_dco_cleaned": hpa_dco_status,
-        "device_model": get_usb_model_by_letter(drive_letter_for_model)
-    }
-    json_data = json.dumps(log, indent=4)
-    # Ensure logs are saved in a 'logs' subdirectory
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    filename = os.path.join(log_dir, f"usbzero_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-    with open(filename, "w") as f:
-        f.write(json_data)
-    hash_val = hashlib.sha256(json_data.encode()).hexdigest()
-    with open(filename.replace(".json", ".sig"), "w") as f:
-        f.write(f"sha256: {hash_val}\n")
+    # Logs are saved in a 'logs' subdirectory
+    logs.save_log(drive_path, algorithm, passes, deleted_files, hpa_dco_status,
+                  get_usb_model_by_letter(drive_letter_for_model), on_status=print)
 
 def update_drive_list():
     drives = list_removable_drives()
+    # Forget models of drives that were unplugged; the letter may be reused
+    for letter in list(_model_cache):
+        if not any(d.upper().startswith(letter.upper()) for d in drives):
+            del _model_cache[letter]
     drive_combo.configure(values=drives)
+    if drive_combo.get() in drives:
+        return  # Keep the user's choice when another drive comes or goes
     if drives and drives[0] != "No USB found":
         drive_combo.set(drives[0])
     else:
         drive_combo.set("No USB found")
 
+# How often the drive list is checked for plugged/unplugged drives
+DRIVE_POLL_MS = 1000
+shown_drives = None
+
+def poll_drives():
+    # psutil lists volumes without spawning processes, so this is cheap
+    global shown_drives
+    if start_btn.cget("state") == "normal":
+        drives = list_removable_drives()
+        if drives != shown_drives:
+            shown_drives = drives
+            update_drive_list()
+    app.after(DRIVE_POLL_MS, poll_drives)
+
 def on_algo_change(choice=None):
     algo = algo_combo.get()
     if algo == "Gutmann (35-pass)":
@@ -216,9 +228,9 @@ def start_process():
         if format_usb(selected_drive_letter):
             update_status("Starting data overwrite ({} passes)...".format(passes))
             success, files = True, []
-            for p in range(passes):
-                update_status(f"Pass {p+1}/{passes}: Writing random data...")
-                ok, del_files = overwrite_drive(selected_drive_path, p)
+            for p, wipe_pass in enumerate(patterns.build_schedule(algorithm, passes)):
+                update_status(f"Pass {p+1}/{passes}: Writing {wipe_pass.label} data...")
+                ok, del_files = overwrite_drive(selected_drive_path, p, wipe_pass)
                 files.extend(del_files)
                 if not ok:
                     success = False
@@ -230,7 +242,6 @@ def start_process():
                 update_status("Wipe process completed.")
                 progress.stop()
                 progress.set(1.0)
-                populate_log_files_list()
                 messagebox.showinfo("Success", f"Drive {selected_drive_path} was successfully wiped.")
             else:
                 update_status("Data overwrite failed.")
@@ -318,7 +329,7 @@ config_frame.grid(row=1, column=0, padx=30, pady=10, sticky="ew")
 config_frame.grid_columnconfigure(1, weight=1)
 ctk.CTkLabel(config_frame, text="Wipe Configuration", font=("Arial", 15, "bold"), anchor="w").grid(row=0, column=0, columnspan=2, sticky="w", padx=15, pady=(10, 2))
 ctk.CTkLabel(config_frame, text="Wipe Algorithm:", font=("Arial", 13)).grid(row=1, column=0, sticky="e", padx=(15,5), pady=5)
-algo_combo = ctk.CTkComboBox(config_frame, values=["Random (Recommended)", "0x00", "0xFF", "DoD 5220.22-M", "Gutmann (35-pass)"], command=on_algo_change, width=220, font=("Arial", 13))
+algo_combo = ctk.CTkComboBox(config_frame, values=patterns.ALGORITHMS, command=on_algo_change, width=220, font=("Arial", 13))
 algo_combo.grid(row=1, column=1, sticky="w", padx=(5,15), pady=5)
 ctk.CTkLabel(config_frame, text="Pass Count (1–35):", font=("Arial", 13)).grid(row=2, column=0, sticky="e", padx=(15,5), pady=5)
 passes_entry = ctk.CTkEntry(config_frame, width=80, font=("Arial", 13))
@@ -349,120 +360,166 @@ status_label.grid(row=2, column=0, sticky="w", padx=15, pady=(5, 10))
 
 tab_log.grid_rowconfigure(0, weight=0)
 tab_log.grid_rowconfigure(1, weight=1)
+tab_log.grid_rowconfigure(2, weight=0)
+tab_log.grid_rowconfigure(3, weight=2)
 tab_log.grid_columnconfigure(0, weight=1)
-tab_log.grid_columnconfigure(1, weight=0)
-
-def get_log_files():
-    log_dir = "./logs"
-    if not os.path.exists(log_dir):
-        # If ./logs doesn't exist, try to create it or fallback to current dir for reading
-        # For saving, save_log function now creates ./logs
-        # For reading, if it's not there, it means no logs were saved in the subdir yet.
-        # Fallback to current directory for compatibility if logs were saved there before subdir logic.
-        if not os.path.isdir(log_dir): # Check if it's not a dir (could be a file)
-             # Try checking current directory as a fallback for existing logs
-            files_current_dir = sorted(
-                glob.glob("usbzero_log_*.json"),
-                key=os.path.getmtime,
-                reverse=True
-            )
-            if files_current_dir:
-                return files_current_dir # Return logs from current dir if found
-            return [] # No logs in ./logs and no logs in current dir
-
-    files = sorted(
-        glob.glob(os.path.join(log_dir, "usbzero_log_*.json")),
-        key=os.path.getmtime,
-        reverse=True
-    )
-    # If no logs in ./logs, check current directory as a fallback
-    if not files:
-        files_current_dir = sorted(
-            glob.glob("usbzero_log_*.json"),
-            key=os.path.getmtime,
-            reverse=True
-        )
-        return files_current_dir
-    return files
-
-def load_selected_log(selected_file_name):
-    # selected_file_name is just the basename, we need to find its full path
-    log_files_paths = get_log_files() # This returns full paths
-    path_to_load = None
-    for p in log_files_paths:
-        if os.path.basename(p) == selected_file_name:
-            path_to_load = p
-            break
 
+# The viewer pages through the indexed log store; only one page of rows is
+# ever fetched and put into the list
+log_store = logstore.open_store(logs.LOG_DIR)
+log_pager = logstore.LogPager(log_store)
+ALL_FILTER = "All"
+
+def parse_filter_date(text, label):
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        datetime.date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"{label} must be a date like 2025-01-31.")
+    return text
+
+def search_logs(event=None):
+    try:
+        since = parse_filter_date(log_from_entry.get(), "From")
+        until = parse_filter_date(log_to_entry.get(), "To")
+    except ValueError as e:
+        messagebox.showerror("Log Filter", str(e))
+        return
+    algorithm = log_algo_combo.get()
+    result = log_result_combo.get()
+    log_pager.search(serial=log_serial_entry.get().strip(), since=since, until=until,
+                     algorithm=None if algorithm == ALL_FILTER else algorithm,
+                     result=None if result == ALL_FILTER else result)
+    show_log_page()
+
+def show_log_page():
+    log_listbox.delete(0, "end")
+    for row in log_pager.rows:
+        log_listbox.insert("end", logstore.format_row(row))
+    log_page_label.configure(text=log_pager.describe())
+    log_prev_btn.configure(state="normal" if log_pager.offset else "disabled")
+    log_next_btn.configure(state="normal" if log_pager.page < log_pager.pages else "disabled")
+
+def show_previous_logs():
+    log_pager.previous()
+    show_log_page()
+
+def show_next_logs():
+    log_pager.next()
+    show_log_page()
+
+def selected_log_id():
+    selection = log_listbox.curselection()
+    if not selection or selection[0] >= len(log_pager.rows):
+        return None
+    return log_pager.rows[selection[0]]["id"]
+
+def populate_log_files_list():
+    """Reload the current page, keeping the selected log if it is still on it."""
+    selected = selected_log_id()
+    log_pager.load()
+    show_log_page()
+    ids = [row["id"] for row in log_pager.rows]
+    if selected in ids:
+        log_listbox.selection_set(ids.index(selected))
+
+def load_selected_log(log_id):
     log_display.configure(state="normal")
     log_display.delete("1.0", "end")
-    if path_to_load and os.path.exists(path_to_load):
-        try:
-            with open(path_to_load, "r", encoding="utf-8") as f:
-                data = json.load(f)
+    try:
+        data = log_store.get(log_id)
+        if data is None:
+            log_display.insert("end", f"Log {log_id} not found.")
+        else:
             log_display.insert("end", json.dumps(data, indent=4, ensure_ascii=False))
-        except Exception as e:
-            log_display.insert("end", f"Error loading log: {selected_file_name}\n{e}")
-    elif selected_file_name == "No log files found":
-        log_display.insert("end", "No log files found.")
-    else:
-        log_display.insert("end", f"Log file '{selected_file_name}' not found or path is incorrect.")
+    except Exception as e:
+        log_display.insert("end", f"Error loading log {log_id}:\n{e}")
     log_display.configure(state="disabled")
 
-def populate_log_files_list():
-    current_selection_name = None
-    try:
-        # Get the name of the currently selected item, not its full path
-        current_selection_name = log_optionmenu.get()
-        if current_selection_name == "No log files found": # Treat as no specific file selected
-            current_selection_name = None
-    except Exception:
-        pass # log_optionmenu might not be fully initialized on first call
-
-    log_file_paths = get_log_files()
-    file_names_for_menu = [os.path.basename(f) for f in log_file_paths] or ["No log files found"]
-    
-    log_optionmenu.configure(values=file_names_for_menu)
-
-    if current_selection_name and current_selection_name in file_names_for_menu:
-        log_optionmenu.set(current_selection_name)
-        # load_selected_log(current_selection_name) # on_log_option_change will handle this
-    elif file_names_for_menu[0] != "No log files found":
-        log_optionmenu.set(file_names_for_menu[0])
-        # load_selected_log(file_names_for_menu[0]) # on_log_option_change will handle this
-    else:
-        log_optionmenu.set("No log files found")
-        # load_selected_log("No log files found") # on_log_option_change will handle this
-    
-    # If the set value didn't change, on_log_option_change might not fire.
-    # Explicitly load if the value set is the same as before but content needs refresh (e.g. file updated)
-    # However, on_log_option_change should always be called by .set() if the value is valid.
-    # The on_log_option_change will call load_selected_log with the final set value.
-
-def on_log_option_change(choice): # choice is a file name (basename)
-    load_selected_log(choice)
+def on_log_select(event=None):
+    log_id = selected_log_id()
+    if log_id is not None:
+        load_selected_log(log_id)
+
+# Filters
+log_filter_frame = ctk.CTkFrame(tab_log, fg_color="transparent")
+log_filter_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=(20, 5))
+ctk.CTkLabel(log_filter_frame, text="Serial:", font=("Arial", 12)).grid(row=0, column=0, padx=(0, 5))
+log_serial_entry = ctk.CTkEntry(log_filter_frame, width=140, font=("Arial", 12))
+log_serial_entry.grid(row=0, column=1, padx=(0, 10))
+ctk.CTkLabel(log_filter_frame, text="From:", font=("Arial", 12)).grid(row=0, column=2, padx=(0, 5))
+log_from_entry = ctk.CTkEntry(log_filter_frame, width=100, placeholder_text="YYYY-MM-DD", font=("Arial", 12))
+log_from_entry.grid(row=0, column=3, padx=(0, 10))
+ctk.CTkLabel(log_filter_frame, text="To:", font=("Arial", 12)).grid(row=0, column=4, padx=(0, 5))
+log_to_entry = ctk.CTkEntry(log_filter_frame, width=100, placeholder_text="YYYY-MM-DD", font=("Arial", 12))
+log_to_entry.grid(row=0, column=5, padx=(0, 10))
+log_algo_combo = ctk.CTkComboBox(log_filter_frame, values=[ALL_FILTER] + patterns.ALGORITHMS, width=170, font=("Arial", 12))
+log_algo_combo.set(ALL_FILTER)
+log_algo_combo.grid(row=0, column=6, padx=(0, 10))
+log_result_combo = ctk.CTkComboBox(log_filter_frame, values=[ALL_FILTER] + list(logstore.RESULTS), width=90, font=("Arial", 12))
+log_result_combo.set(ALL_FILTER)
+log_result_combo.grid(row=0, column=7, padx=(0, 10))
+ctk.CTkButton(log_filter_frame, text="Search", command=search_logs, width=80).grid(row=0, column=8)
+for entry in (log_serial_entry, log_from_entry, log_to_entry):
+    entry.bind("<Return>", search_logs)
+
+# Result list: one page of rows
+log_list_frame = ctk.CTkFrame(tab_log, fg_color="transparent")
+log_list_frame.grid(row=1, column=0, sticky="nsew", padx=20, pady=5)
+log_list_frame.grid_rowconfigure(0, weight=1)
+log_list_frame.grid_columnconfigure(0, weight=1)
+log_listbox = tk.Listbox(log_list_frame, font=("Consolas", 12), bg="#1d1e1e", fg="#dce4ee",
+                         selectbackground="#1f6aa5", highlightthickness=0, borderwidth=0,
+                         activestyle="none", exportselection=False, height=10)
+log_listbox.grid(row=0, column=0, sticky="nsew")
+log_scrollbar = ctk.CTkScrollbar(log_list_frame, command=log_listbox.yview)
+log_scrollbar.grid(row=0, column=1, sticky="ns")
+log_listbox.configure(yscrollcommand=log_scrollbar.set)
+log_listbox.bind("<<ListboxSelect>>", on_log_select)
+
+# Paging
+log_pager_frame = ctk.CTkFrame(tab_log, fg_color="transparent")
+log_pager_frame.grid(row=2, column=0, sticky="ew", padx=20)
+log_prev_btn = ctk.CTkButton(log_pager_frame, text="< Previous", command=show_previous_logs, width=100)
+log_prev_btn.grid(row=0, column=0)
+log_page_label = ctk.CTkLabel(log_pager_frame, text="", font=("Arial", 12))
+log_page_label.grid(row=0, column=1, padx=15)
+log_next_btn = ctk.CTkButton(log_pager_frame, text="Next >", command=show_next_logs, width=100)
+log_next_btn.grid(row=0, column=2)
+refresh_logs_btn = ctk.CTkButton(log_pager_frame, text="Refresh Logs", command=populate_log_files_list, width=120)
+refresh_logs_btn.grid(row=0, column=3, padx=(15, 0))
+
+log_display = ctk.CTkTextbox(tab_log, width=820, height=300, font=("Consolas", 12))
+log_display.grid(row=3, column=0, sticky="nsew", padx=20, pady=15)
+log_display.insert("end", "Logs will appear here after the wipe operation.")
+log_display.configure(state="disabled")
 
-log_optionmenu = ctk.CTkOptionMenu(tab_log, values=["No log files found"], command=on_log_option_change, width=300, font=("Arial", 13))
-log_optionmenu.grid(row=0, column=0, sticky="ew", padx=(20, 5), pady=(20, 0))
+# Refresh when a wipe adds a log instead of polling: store callbacks come
+# from worker threads, so they are handed to the Tk loop, and a hidden Log
+# Viewer is only marked stale and reloaded when it is opened
+LOG_TAB = "📄 Log Viewer"
+logs_stale = False
 
-refresh_logs_btn = ctk.CTkButton(tab_log, text="Refresh Logs", command=populate_log_files_list, width=120)
-refresh_logs_btn.grid(row=0, column=1, sticky="ew", padx=(5,20), pady=(20,0))
+def on_logs_added():
+    global logs_stale
+    if tabs.get() == LOG_TAB:
+        populate_log_files_list()
+    else:
+        logs_stale = True
 
-log_display = ctk.CTkTextbox(tab_log, width=820, height=400, font=("Consolas", 12))
-log_display.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=20, pady=15)
-log_display.insert("end", "Logs will appear here after the wipe operation.")
-log_display.configure(state="disabled")
+def on_tab_change():
+    global logs_stale
+    if tabs.get() == LOG_TAB and logs_stale:
+        logs_stale = False
+        populate_log_files_list()
 
-def poll_tab_change():
-    try:
-        if tabs.get() == "📄 Log Viewer":
-            populate_log_files_list()
-    except Exception:
-        pass
-    app.after(1000, poll_tab_change)
+logstore.subscribe(lambda path: app.after(0, on_logs_added))
+tabs.configure(command=on_tab_change)
 
 populate_log_files_list()
-poll_tab_change()
+poll_drives()
 
 # --- About Tab ---
 
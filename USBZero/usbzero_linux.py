@@ -1,20 +1,22 @@
 import os
-import psutil
-import subprocess
+import datetime
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import messagebox
 import threading
-import time
 import json
-import uuid
-import hashlib
-from datetime import datetime
 from PIL import Image
 import sys
-import glob
 import webbrowser
-import re
 import platform
+from usbzero import capacity, drives, engine, erase, inventory, journal, logs, logstore, patterns, scheduler, tuning, verify, wipe
+from usbzero.drives import check_hdparm_availability, check_sudo_privileges, get_device_model
+from usbzero.progress import ProgressTracker, format_status
+
+# How often the GUI reads wipe progress; the writer never touches Tk itself
+PROGRESS_POLL_MS = 250
+# How often the GUI checks the drive inventory for hotplug changes
+DRIVE_POLL_MS = 500
 
 # Ensure we're running on Linux
 if platform.system() != 'Linux':
@@ -29,174 +31,99 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def check_hdparm_availability():
-    """Check if hdparm is installed."""
-    try:
-        subprocess.run(['which', 'hdparm'], check=True, capture_output=True)
-        return True
-    except subprocess.CalledProcessError:
-        return False
-
-def check_sudo_privileges():
-    """Check if the script has sudo privileges."""
-    try:
-        subprocess.run(['sudo', '-n', 'true'], check=True, capture_output=True)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+# Kept current from kernel hotplug events by a background thread
+drive_inventory = inventory.shared()
 
 def list_removable_drives():
     """List available removable drives on Linux."""
-    drives = []
-    try:
-        # Get list of block devices
-        result = subprocess.run(['lsblk', '-dpno', 'NAME,RM,TYPE'], 
-                              capture_output=True, text=True, check=True)
-        
-        for line in result.stdout.splitlines():
-            if not line.strip():
-                continue
-            parts = line.split()
-            if len(parts) >= 3:
-                device, removable, dev_type = parts
-                # Check if device is removable (RM=1) and is a disk
-                if removable == "1" and dev_type == "disk":
-                    drives.append(device)
-    except subprocess.CalledProcessError:
-        pass
-    
-    return drives or ["No USB found"]
-
-def get_device_model(device_path):
-    """Get device model information on Linux."""
-    try:
-        # Use udevadm to get device information
-        result = subprocess.run(
-            ['udevadm', 'info', '--query=property', '--name=' + device_path],
-            capture_output=True, text=True, check=True
-        )
-        
-        # Look for ID_MODEL or ID_MODEL_ID in the output
-        for line in result.stdout.splitlines():
-            if line.startswith('ID_MODEL='):
-                return line.split('=')[1].replace('_', ' ')
-        
-        return "Unknown"
-    except subprocess.CalledProcessError:
-        return "Unknown"
+    return [drive.path for drive in drive_inventory.drives()] or ["No USB found"]
 
 def remove_hpa_dco(device_path, update_status):
     """Remove HPA and DCO from the device."""
     try:
-        # First, restore DCO
-        update_status("Restoring DCO configuration...")
-        result = subprocess.run(['sudo', 'hdparm', '--dco-restore', device_path],
-                              capture_output=True, text=True, check=True)
-        
-        # Get current max sectors
-        update_status("Reading maximum sector count...")
-        result = subprocess.run(['sudo', 'hdparm', '-N', device_path],
-                              capture_output=True, text=True, check=True)
-        
-        # Parse the max sectors from output
-        match = re.search(r'max sectors\s+=\s+(\d+)', result.stdout)
-        if not match:
-            raise Exception("Could not determine maximum sector count")
-        
-        max_sectors = match.group(1)
-        
-        # Set HPA to maximum (effectively removing it)
-        update_status("Removing HPA configuration...")
-        result = subprocess.run(['sudo', 'hdparm', f'-N', f'p{max_sectors}', device_path],
-                              capture_output=True, text=True, check=True)
-        
+        drives.remove_hpa_dco(device_path, update_status)
         return True
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Error during HPA/DCO removal: {e.stderr}"
-        messagebox.showerror("Error", error_msg)
-        return False
-    except Exception as e:
-        error_msg = f"Error during HPA/DCO removal: {str(e)}"
-        messagebox.showerror("Error", error_msg)
+    except drives.DriveError as e:
+        messagebox.showerror("Error", str(e))
         return False
 
-def format_drive(device_path):
-    """Format the drive using Linux commands."""
+def format_drive(device_path, profile=drives.FORMAT_EXT4):
+    """Format the drive using Linux commands; returns the timings, or False on failure."""
     try:
-        # Create a new partition table
-        subprocess.run(['sudo', 'parted', '-s', device_path, 'mklabel', 'gpt'],
-                     check=True, capture_output=True)
-        
-        # Create a new partition
-        subprocess.run(['sudo', 'parted', '-s', device_path, 'mkpart', 'primary', '0%', '100%'],
-                     check=True, capture_output=True)
-        
-        # Wait for the system to recognize the new partition
-        time.sleep(2)
-        
-        # Format the partition with ext4
-        partition = device_path + "1"  # First partition
-        subprocess.run(['sudo', 'mkfs.ext4', '-F', partition],
-                     check=True, capture_output=True)
-        
-        return True
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Format error: {e.stderr.decode() if e.stderr else str(e)}"
-        messagebox.showerror("Format Error", error_msg)
+        return drives.format_drive(device_path, profile)
+    except drives.DriveError as e:
+        messagebox.showerror("Format Error", str(e))
         return False
 
-def overwrite_drive(device_path, pass_index):
-    """Overwrite the drive with random data."""
-    deleted_files = []
-    try:
-        # Use dd to write random data
-        block_size = "1M"
-        count = 100  # Write 100MB per pass
-        
-        subprocess.run(
-            ['sudo', 'dd', 'if=/dev/urandom', f'of={device_path}',
-             f'bs={block_size}', f'count={count}', 'conv=fsync'],
-            check=True, capture_output=True
-        )
-        
-        return True, [f"Pass {pass_index + 1} complete"]
-    except subprocess.CalledProcessError as e:
-        print(f"Overwrite error during pass {pass_index}: {e}")
-        return False, deleted_files
-
-def save_log(device_path, algorithm, passes, deleted_files, hpa_dco_status):
-    log = {
-        "uuid": str(uuid.uuid4()),
-        "drive": device_path,
-        "timestamp": datetime.now().isoformat(),
-        "algorithm": algorithm,
-        "passes": passes,
-        "deleted_files": deleted_files,
-        "hpa_dco_cleaned": hpa_dco_status,
-        "device_model": get_device_model(device_path)
-    }
-    
-    json_data = json.dumps(log, indent=4)
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    filename = os.path.join(log_dir, f"usbzero_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-    with open(filename, "w") as f:
-        f.write(json_data)
-    
-    hash_val = hashlib.sha256(json_data.encode()).hexdigest()
-    with open(filename.replace(".json", ".sig"), "w") as f:
-        f.write(f"sha256: {hash_val}\n")
+def save_log(device_path, algorithm, passes, deleted_files, hpa_dco_status, extra=None, results=None):
+    drive = drive_inventory.get(device_path)
+    model = drive.model if drive else get_device_model(device_path)
+    if drive and drive.serial:
+        extra = dict(extra or {}, serial=drive.serial)
+    logs.save_log(device_path, algorithm, passes, deleted_files, hpa_dco_status, model, extra=extra,
+                  merkle_tree=wipe.final_merkle(results), on_status=print)
 
 def update_drive_list():
-    drives = list_removable_drives()
-    drive_combo.configure(values=drives)
-    if drives and drives[0] != "No USB found":
-        drive_combo.set(drives[0])
+    drive_list = list_removable_drives()
+    drive_combo.configure(values=drive_list)
+    update_batch_drives(drive_list)
+    if drive_combo.get() in drive_list:
+        return  # Keep the user's choice when another drive comes or goes
+    if drive_list and drive_list[0] != "No USB found":
+        drive_combo.set(drive_list[0])
     else:
         drive_combo.set("No USB found")
 
+shown_drive_version = None
+
+def poll_drives():
+    # Only reads the cached version counter; the inventory thread does the I/O
+    global shown_drive_version
+    if drive_inventory.version != shown_drive_version and start_btn.cget("state") == "normal":
+        shown_drive_version = drive_inventory.version
+        update_drive_list()
+    app.after(DRIVE_POLL_MS, poll_drives)
+
+# Batch selection: path -> (BooleanVar, checkbox); new drives start ticked
+batch_drive_vars = {}
+
+def update_batch_drives(drive_list):
+    drive_list = [path for path in drive_list if path != "No USB found"]
+    for path in list(batch_drive_vars):
+        if path not in drive_list:
+            batch_drive_vars.pop(path)[1].destroy()
+    for path in drive_list:
+        if path not in batch_drive_vars:
+            var = ctk.BooleanVar(value=True)
+            box = ctk.CTkCheckBox(batch_drives_frame, text=path, variable=var, font=("Arial", 12))
+            batch_drive_vars[path] = (var, box)
+    for row, path in enumerate(drive_list):
+        batch_drive_vars[path][1].grid(row=row, column=0, sticky="w", padx=5, pady=2)
+
+def selected_batch_drives():
+    return [path for path, (var, _) in batch_drive_vars.items() if var.get()]
+
+def read_batch_limits():
+    """Return (max_workers, bus bytes per second or None), or None after an error."""
+    try:
+        max_workers = int(workers_entry.get())
+    except ValueError:
+        max_workers = 0
+    if max_workers < 1:
+        messagebox.showerror("Error", "Parallel wipes must be a whole number of at least 1.")
+        return None
+    text = bus_limit_entry.get().strip()
+    if not text:
+        return max_workers, None
+    try:
+        bus_mb_s = float(text)
+    except ValueError:
+        bus_mb_s = 0
+    if bus_mb_s <= 0:
+        messagebox.showerror("Error", "The per-hub limit must be a positive number of MB/s, or empty for none.")
+        return None
+    return max_workers, bus_mb_s * 1e6
+
 def on_algo_change(choice=None):
     algo = algo_combo.get()
     if algo == "Gutmann (35-pass)":
@@ -228,6 +155,14 @@ def set_controls_state(state):
     start_btn.configure(state=state)
     hpa_dco_var.set(False)  # Reset HPA/DCO checkbox when controls are re-enabled
     hpa_dco_checkbox.configure(state=state)
+    batch_checkbox.configure(state=state)
+    workers_entry.configure(state=state)
+    bus_limit_entry.configure(state=state)
+    for _, box in batch_drive_vars.values():
+        box.configure(state=state)
+    verify_checkbox.configure(state=state)
+    erase_checkbox.configure(state=state)
+    format_combo.configure(state=state)
 
 def validate_user_inputs():
     selected_drive = drive_combo.get()
@@ -278,6 +213,93 @@ def confirm_wipe(selected_drive, algorithm, passes):
     
     return messagebox.askyesno("Confirm", warning)
 
+def start_batch_process(algorithm, passes):
+    """Wipe the drives ticked in the Batch Jobs tab concurrently and show the jobs table."""
+    targets = selected_batch_drives()
+    if not targets:
+        messagebox.showerror("Error", "No drives are selected in the Batch Jobs tab.")
+        tabs.set("📋 Batch Jobs")
+        set_controls_state("normal")
+        return
+    limits = read_batch_limits()
+    if limits is None:
+        tabs.set("📋 Batch Jobs")
+        set_controls_state("normal")
+        return
+    max_workers, bus_bandwidth = limits
+
+    enable_log = log_var.get()
+    hpa_dco_enabled = hpa_dco_var.get()
+    verify_mode = verify.VERIFY_LAST if verify_var.get() else None
+    erase_strategy = erase.STRATEGY_AUTO if erase_var.get() else erase.STRATEGY_OVERWRITE
+    format_profile = format_combo.get()
+    warning = (f"WARNING: All data on the following {len(targets)} drives will be PERMANENTLY DELETED:\n\n"
+               + "\n".join(targets) + "\n\n")
+    if hpa_dco_enabled:
+        warning += "Additionally, HPA/DCO will be permanently removed.\n\n"
+    warning += "This operation cannot be undone. Are you sure you want to continue?"
+    if not messagebox.askyesno("Confirm", warning):
+        set_controls_state("normal")
+        return
+
+    def prepare(job):
+        if hpa_dco_enabled and not remove_hpa_dco(job.device_path, lambda msg: None):
+            raise RuntimeError("HPA/DCO removal failed")
+
+    def finish(job):
+        formatted = None
+        fake = job.capacity is not None and job.capacity.fake
+        if format_profile != drives.FORMAT_NONE and not fake:
+            formatted = format_drive(job.device_path, format_profile)
+            if formatted is False:
+                raise RuntimeError("Formatting failed")
+        if enable_log:
+            extra = {"erase": job.erase.to_dict()}
+            if job.tuning:
+                extra["tuning"] = job.tuning.to_dict()
+            if job.capacity:
+                extra["capacity"] = job.capacity.to_dict()
+            if formatted:
+                extra["format"] = formatted
+            if verify_mode:
+                extra["verified"] = True
+            unwritable = wipe.unwritable(job.erase.results)
+            if unwritable:
+                extra["unwritable"] = unwritable
+            save_log(job.device_path, *job.erase.method(algorithm, passes), job.erase.summarize(),
+                     hpa_dco_enabled, extra, job.erase.results)
+
+    batch = scheduler.Scheduler(max_workers, bus_bandwidth, verify=verify_mode, prepare=prepare,
+                                finish=finish, erase_strategy=erase_strategy, tune=True, probe=True)
+    for target in targets:
+        batch.add(target, algorithm, passes)
+
+    def poll_jobs():
+        rows = batch.snapshot()
+        jobs_display.configure(state="normal")
+        jobs_display.delete("1.0", "end")
+        jobs_display.insert("end", scheduler.format_table(rows))
+        jobs_display.configure(state="disabled")
+        progress.set(sum(row["percent"] for row in rows) / len(rows) / 100)
+        if batch.running:
+            app.after(PROGRESS_POLL_MS, poll_jobs)
+            return
+
+        failed = [row["device"] for row in rows if row["state"] == scheduler.FAILED]
+        set_controls_state("normal")
+        if failed:
+            status_label.configure(text=f"Batch finished: {len(failed)} of {len(rows)} drives failed.")
+            messagebox.showerror("Error", "Wiping failed on:\n" + "\n".join(failed))
+        else:
+            status_label.configure(text=f"Batch finished: {len(rows)} drives wiped.")
+            messagebox.showinfo("Success", f"All {len(rows)} drives were successfully processed.")
+
+    status_label.configure(text=f"Wiping {len(targets)} drives in parallel...")
+    progress.set(0)
+    tabs.set("📋 Batch Jobs")
+    batch.start()
+    poll_jobs()
+
 def start_process():
     set_controls_state("disabled")
     validated = validate_user_inputs()
@@ -286,17 +308,40 @@ def start_process():
         return
     
     selected_drive, algorithm, passes = validated
+    if batch_var.get():
+        start_batch_process(algorithm, passes)
+        return
+
     enable_log = log_var.get()
     hpa_dco_enabled = hpa_dco_var.get()
+    verify_mode = verify.VERIFY_LAST if verify_var.get() else None
+    erase_strategy = erase.STRATEGY_AUTO if erase_var.get() else erase.STRATEGY_OVERWRITE
+    format_profile = format_combo.get()
     hpa_dco_status = False
 
     if not confirm_wipe(selected_drive, algorithm, passes):
         set_controls_state("normal")
         return
 
+    # Offer to continue an interrupted wipe of the same drive
+    try:
+        identity = journal.identify(selected_drive)
+        resumed = journal.Journal.load(identity)
+    except (OSError, journal.JournalError):
+        identity = resumed = None
+    if resumed and messagebox.askyesno(
+            "Resume",
+            f"An interrupted {resumed.algorithm} wipe of this drive was found "
+            f"({resumed.fraction():.0%} done).\n\nResume it instead of starting over?"):
+        algorithm, passes = resumed.algorithm, resumed.passes
+        hpa_dco_status = resumed.info.get("hpa_dco_cleaned", False)
+    else:
+        resumed = None
+
     status_label.configure(text="Starting process...")
     progress.set(0)
     progress.start()
+    tracker = ProgressTracker(passes)
 
     def update_status(msg):
         app.after(0, lambda: status_label.configure(text=msg))
@@ -308,7 +353,7 @@ def start_process():
         nonlocal hpa_dco_status
         
         # HPA/DCO removal if enabled
-        if hpa_dco_enabled:
+        if hpa_dco_enabled and not resumed:
             update_status("Removing HPA/DCO...")
             hpa_dco_status = remove_hpa_dco(selected_drive, update_status)
             if not hpa_dco_status:
@@ -317,43 +362,131 @@ def start_process():
                 enable_controls()
                 return
 
-        # Format drive
-        update_status("Formatting drive...")
-        if format_drive(selected_drive):
-            update_status(f"Writing random data (Pass 1/{passes})...")
-            success, files = True, []
-            
-            for p in range(passes):
-                update_status(f"Pass {p+1}/{passes}: Writing random data...")
-                ok, del_files = overwrite_drive(selected_drive, p)
-                files.extend(del_files)
-                if not ok:
-                    success = False
-                    break
-            
-            if success:
-                update_status("Saving log and finalizing...")
-                if enable_log:
-                    save_log(selected_drive, algorithm, passes, files, hpa_dco_status)
+        update_status(f"Writing data (Pass 1/{passes})...")
+        success, files = True, []
+
+        verified = True
+        extra = {}
+        logged = (algorithm, passes)  # What the log records as the wipe method
+        formatted = None
+
+        def on_pass(p, wipe_pass):
+            update_status(f"Pass {p+1}/{passes}: Writing {wipe_pass.label} data...")
+
+        def on_verify(p):
+            update_status(f"Pass {p+1}/{passes}: Verifying written data...")
+
+        # Counterfeit sticks report more space than they have; this takes seconds
+        probed = None
+        if not resumed:
+            try:
+                probed = capacity.probe(selected_drive, on_status=update_status)
+                update_status(probed.describe())
+                extra["capacity"] = probed.to_dict()
+            except OSError as e:
+                print(f"Capacity probe error: {e}")
+        fake = probed is not None and probed.fake
+
+        # Block size and depth for this drive model, calibrated on first use.
+        # Never on resume: the trial data at offset 0 would not be overwritten.
+        options = {}
+        tuned = None
+        if resumed:
+            tuned = tuning.for_resume(resumed, identity)
+        elif identity:
+            try:
+                tuned = tuning.tune(selected_drive, identity, on_status=update_status)
+            except OSError as e:
+                print(f"Calibration error: {e}")
+        if tuned:
+            options = tuned.options()
+            extra["tuning"] = tuned.to_dict()
+
+        try:
+            checkpoints = resumed
+            if checkpoints is None and identity:
+                checkpoints = journal.Journal.create(identity, algorithm, passes,
+                                                     hpa_dco_cleaned=hpa_dco_status,
+                                                     tuning=tuned.to_dict() if tuned else None)
+            if resumed:
+                results = wipe.run_passes(selected_drive, algorithm, passes, on_pass=on_pass,
+                                          verify=verify_mode, on_verify=on_verify,
+                                          tracker=tracker, journal=checkpoints, **options)
+                files = wipe.summarize(results)
+            else:
+                outcome = erase.erase(selected_drive, algorithm, passes, erase_strategy,
+                                      on_status=update_status, on_pass=on_pass,
+                                      verify=verify_mode, on_verify=on_verify,
+                                      tracker=tracker, journal=checkpoints, **options)
+                results = outcome.results
+                files = outcome.summarize()
+                extra["erase"] = outcome.to_dict()
+                logged = outcome.method(algorithm, passes)
+            verified = not wipe.verification_failed(results)
+        except (OSError, engine.OverwriteError, erase.EraseError) as e:
+            print(f"Overwrite error: {e}")
+            success = False
+
+        # Create the filesystem on the wiped drive
+        if success and verified and format_profile != drives.FORMAT_NONE and not fake:
+            update_status(f"Formatting drive ({format_profile})...")
+            formatted = format_drive(selected_drive, format_profile)
+
+        if success and not verified:
+            update_status("Error: Read-back verification failed.")
+            progress.stop()
+            progress.set(1.0)
+            messagebox.showerror("Error", "The data read back from the drive does not match what was written.")
+        elif formatted is False:
+            update_status("Formatting failed.")
+            progress.stop()
+            progress.set(1.0)
+        elif success:
+            update_status("Saving log and finalizing...")
+            unwritable = wipe.unwritable(results)
+            if enable_log:
+                if verify_mode:
+                    extra["verified"] = True
+                if formatted:
+                    extra["format"] = formatted
+                if unwritable:
+                    extra["unwritable"] = unwritable
+                save_log(selected_drive, *logged, files, hpa_dco_status, extra, results)
+            if checkpoints:
+                checkpoints.remove()
+            progress.stop()
+            progress.set(1.0)
+            if fake:
+                update_status(probed.describe())
+                messagebox.showwarning("Warning", f"{probed.describe()}. The drive was wiped but "
+                                       "not formatted.")
+            elif unwritable:
+                update_status(f"Completed with {unwritable['bytes']} unwritable bytes.")
+                messagebox.showwarning("Warning", f"{unwritable['bytes']} bytes of {selected_drive} "
+                                       "could not be written and may still hold old data.")
+            else:
                 update_status("Process completed successfully.")
-                progress.stop()
-                progress.set(1.0)
-                populate_log_files_list()
                 messagebox.showinfo("Success", f"Drive {selected_drive} was successfully processed.")
-            else:
-                update_status("Error: Data overwrite failed.")
-                progress.stop()
-                progress.set(1.0)
-                messagebox.showerror("Error", "Overwrite operation failed.")
-
         else:
-            update_status("Formatting failed.")
+            update_status("Error: Data overwrite failed.")
             progress.stop()
             progress.set(1.0)
-            messagebox.showerror("Format Error", "Formatting the drive failed.")
+            messagebox.showerror("Error", "Overwrite operation failed.")
         enable_controls()
 
-    threading.Thread(target=process).start()
+    worker = threading.Thread(target=process)
+
+    def poll_progress():
+        if tracker.active:
+            snapshot = tracker.snapshot()
+            progress.stop()
+            progress.set(snapshot["overall_fraction"])
+            status_label.configure(text=format_status(snapshot))
+        if worker.is_alive():
+            app.after(PROGRESS_POLL_MS, poll_progress)
+
+    worker.start()
+    poll_progress()
 
 # --- GUI Section ---
 ctk.set_appearance_mode("dark")
@@ -397,6 +530,7 @@ app.grid_columnconfigure(0, weight=0)
 app.grid_columnconfigure(1, weight=1)
 
 tab_main = tabs.add("🧹 Wipe USB")
+tab_jobs = tabs.add("📋 Batch Jobs")
 tab_log = tabs.add("📄 Log Viewer")
 tab_about = tabs.add("ℹ️ About")
 
@@ -425,7 +559,7 @@ ctk.CTkLabel(config_frame, text="Wipe Configuration", font=("Arial", 15, "bold")
 
 # Algorithm selection
 ctk.CTkLabel(config_frame, text="Wipe Algorithm:", font=("Arial", 13)).grid(row=1, column=0, sticky="e", padx=(15,5), pady=5)
-algo_combo = ctk.CTkComboBox(config_frame, values=["Random (Recommended)", "0x00", "0xFF", "DoD 5220.22-M", "Gutmann (35-pass)"], command=on_algo_change, width=220, font=("Arial", 13))
+algo_combo = ctk.CTkComboBox(config_frame, values=patterns.ALGORITHMS, command=on_algo_change, width=220, font=("Arial", 13))
 algo_combo.grid(row=1, column=1, sticky="w", padx=(5,15), pady=5)
 
 # Pass count
@@ -443,7 +577,31 @@ hpa_dco_checkbox.grid(row=3, column=0, columnspan=2, sticky="w", padx=15, pady=5
 
 # Log checkbox
 log_var = ctk.BooleanVar(value=True)
-ctk.CTkCheckBox(config_frame, text="Create log file", variable=log_var, font=("Arial", 12)).grid(row=4, column=0, columnspan=2, sticky="w", padx=15, pady=(5, 10))
+ctk.CTkCheckBox(config_frame, text="Create log file", variable=log_var, font=("Arial", 12)).grid(row=4, column=0, columnspan=2, sticky="w", padx=15, pady=5)
+
+# Verify checkbox
+verify_var = ctk.BooleanVar(value=False)
+verify_checkbox = ctk.CTkCheckBox(config_frame, text="Verify written data after the final pass",
+                                  variable=verify_var, font=("Arial", 12))
+verify_checkbox.grid(row=5, column=0, columnspan=2, sticky="w", padx=15, pady=5)
+
+# Batch checkbox
+batch_var = ctk.BooleanVar(value=False)
+batch_checkbox = ctk.CTkCheckBox(config_frame, text="Wipe the drives selected under Batch Jobs in parallel",
+                                 variable=batch_var, font=("Arial", 12))
+batch_checkbox.grid(row=6, column=0, columnspan=2, sticky="w", padx=15, pady=5)
+
+# Hardware erase checkbox
+erase_var = ctk.BooleanVar(value=False)
+erase_checkbox = ctk.CTkCheckBox(config_frame, text="Use sanitize / secure discard when the drive supports it",
+                                 variable=erase_var, font=("Arial", 12))
+erase_checkbox.grid(row=7, column=0, columnspan=2, sticky="w", padx=15, pady=5)
+
+# Filesystem created after the wipe
+ctk.CTkLabel(config_frame, text="Format After Wipe:", font=("Arial", 13)).grid(row=8, column=0, sticky="e", padx=(15,5), pady=(5, 10))
+format_combo = ctk.CTkComboBox(config_frame, values=list(drives.FORMAT_PROFILES), width=120, font=("Arial", 13))
+format_combo.set(drives.FORMAT_EXT4)
+format_combo.grid(row=8, column=1, sticky="w", padx=(5,15), pady=(5, 10))
 
 # Operation Controls Frame
 controls_frame = ctk.CTkFrame(tab_main, fg_color="#23272e", border_width=2, border_color="#3a3f4b")
@@ -463,107 +621,192 @@ progress.grid(row=1, column=0, sticky="ew", padx=15, pady=5)
 status_label = ctk.CTkLabel(progress_frame, text="", font=("Arial", 12, "italic"))
 status_label.grid(row=2, column=0, sticky="w", padx=15, pady=(5, 10))
 
+# Batch Jobs Tab
+tab_jobs.grid_rowconfigure(0, weight=0)
+tab_jobs.grid_rowconfigure(1, weight=1)
+tab_jobs.grid_columnconfigure(0, weight=1)
+batch_settings_frame = ctk.CTkFrame(tab_jobs, fg_color="#23272e", border_width=2, border_color="#3a3f4b")
+batch_settings_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=(15, 5))
+batch_settings_frame.grid_columnconfigure(0, weight=1)
+ctk.CTkLabel(batch_settings_frame, text="Drives to wipe", font=("Arial", 13, "bold"), anchor="w").grid(row=0, column=0, sticky="w", padx=15, pady=(10, 2))
+batch_drives_frame = ctk.CTkScrollableFrame(batch_settings_frame, height=90, fg_color="transparent")
+batch_drives_frame.grid(row=1, column=0, rowspan=2, sticky="ew", padx=10, pady=(0, 10))
+ctk.CTkLabel(batch_settings_frame, text="Parallel wipes:", font=("Arial", 12)).grid(row=1, column=1, sticky="e", padx=(15, 5), pady=5)
+workers_entry = ctk.CTkEntry(batch_settings_frame, width=80, font=("Arial", 12))
+workers_entry.insert(0, str(scheduler.DEFAULT_MAX_WORKERS))
+workers_entry.grid(row=1, column=2, sticky="w", padx=(5, 15), pady=5)
+ctk.CTkLabel(batch_settings_frame, text="Limit per USB hub (MB/s):", font=("Arial", 12)).grid(row=2, column=1, sticky="e", padx=(15, 5), pady=5)
+bus_limit_entry = ctk.CTkEntry(batch_settings_frame, width=80, font=("Arial", 12), placeholder_text="none")
+bus_limit_entry.grid(row=2, column=2, sticky="w", padx=(5, 15), pady=5)
+jobs_display = ctk.CTkTextbox(tab_jobs, width=820, height=300, font=("Consolas", 12))
+jobs_display.grid(row=1, column=0, sticky="nsew", padx=20, pady=(5, 15))
+jobs_display.insert("end", "Tick the drives above and enable 'Wipe the drives selected under Batch Jobs in parallel' to run a batch.")
+jobs_display.configure(state="disabled")
+update_batch_drives(list_removable_drives())
+
 # Log Tab
 tab_log.grid_rowconfigure(0, weight=0)
 tab_log.grid_rowconfigure(1, weight=1)
+tab_log.grid_rowconfigure(2, weight=0)
+tab_log.grid_rowconfigure(3, weight=2)
 tab_log.grid_columnconfigure(0, weight=1)
-tab_log.grid_columnconfigure(1, weight=0)
-
-def get_log_files():
-    log_dir = "./logs"
-    if not os.path.exists(log_dir):
-        if not os.path.isdir(log_dir):
-            files_current_dir = sorted(
-                glob.glob("usbzero_log_*.json"),
-                key=os.path.getmtime,
-                reverse=True
-            )
-            if files_current_dir:
-                return files_current_dir
-            return []
-
-    files = sorted(
-        glob.glob(os.path.join(log_dir, "usbzero_log_*.json")),
-        key=os.path.getmtime,
-        reverse=True
-    )
-    if not files:
-        files_current_dir = sorted(
-            glob.glob("usbzero_log_*.json"),
-            key=os.path.getmtime,
-            reverse=True
-        )
-        return files_current_dir
-    return files
-
-def load_selected_log(selected_file_name):
-    log_files_paths = get_log_files()
-    path_to_load = None
-    for p in log_files_paths:
-        if os.path.basename(p) == selected_file_name:
-            path_to_load = p
-            break
 
+# The viewer pages through the indexed log store; only one page of rows is
+# ever fetched and put into the list
+log_store = logstore.open_store(logs.LOG_DIR)
+log_pager = logstore.LogPager(log_store)
+ALL_FILTER = "All"
+
+def parse_filter_date(text, label):
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        datetime.date.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"{label} must be a date like 2025-01-31.")
+    return text
+
+def search_logs(event=None):
+    try:
+        since = parse_filter_date(log_from_entry.get(), "From")
+        until = parse_filter_date(log_to_entry.get(), "To")
+    except ValueError as e:
+        messagebox.showerror("Log Filter", str(e))
+        return
+    algorithm = log_algo_combo.get()
+    result = log_result_combo.get()
+    log_pager.search(serial=log_serial_entry.get().strip(), since=since, until=until,
+                     algorithm=None if algorithm == ALL_FILTER else algorithm,
+                     result=None if result == ALL_FILTER else result)
+    show_log_page()
+
+def show_log_page():
+    log_listbox.delete(0, "end")
+    for row in log_pager.rows:
+        log_listbox.insert("end", logstore.format_row(row))
+    log_page_label.configure(text=log_pager.describe())
+    log_prev_btn.configure(state="normal" if log_pager.offset else "disabled")
+    log_next_btn.configure(state="normal" if log_pager.page < log_pager.pages else "disabled")
+
+def show_previous_logs():
+    log_pager.previous()
+    show_log_page()
+
+def show_next_logs():
+    log_pager.next()
+    show_log_page()
+
+def selected_log_id():
+    selection = log_listbox.curselection()
+    if not selection or selection[0] >= len(log_pager.rows):
+        return None
+    return log_pager.rows[selection[0]]["id"]
+
+def populate_log_files_list():
+    """Reload the current page, keeping the selected log if it is still on it."""
+    selected = selected_log_id()
+    log_pager.load()
+    show_log_page()
+    ids = [row["id"] for row in log_pager.rows]
+    if selected in ids:
+        log_listbox.selection_set(ids.index(selected))
+
+def load_selected_log(log_id):
     log_display.configure(state="normal")
     log_display.delete("1.0", "end")
-    if path_to_load and os.path.exists(path_to_load):
-        try:
-            with open(path_to_load, "r", encoding="utf-8") as f:
-                data = json.load(f)
+    try:
+        data = log_store.get(log_id)
+        if data is None:
+            log_display.insert("end", f"Log {log_id} not found.")
+        else:
             log_display.insert("end", json.dumps(data, indent=4, ensure_ascii=False))
-        except Exception as e:
-            log_display.insert("end", f"Error loading log: {selected_file_name}\n{e}")
-    elif selected_file_name == "No log files found":
-        log_display.insert("end", "No log files found.")
-    else:
-        log_display.insert("end", f"Log file '{selected_file_name}' not found or path is incorrect.")
+    except Exception as e:
+        log_display.insert("end", f"Error loading log {log_id}:\n{e}")
     log_display.configure(state="disabled")
 
-def populate_log_files_list():
-    current_selection_name = None
-    try:
-        current_selection_name = log_optionmenu.get()
-        if current_selection_name == "No log files found":
-            current_selection_name = None
-    except Exception:
-        pass
+def on_log_select(event=None):
+    log_id = selected_log_id()
+    if log_id is not None:
+        load_selected_log(log_id)
+
+# Filters
+log_filter_frame = ctk.CTkFrame(tab_log, fg_color="transparent")
+log_filter_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=(20, 5))
+ctk.CTkLabel(log_filter_frame, text="Serial:", font=("Arial", 12)).grid(row=0, column=0, padx=(0, 5))
+log_serial_entry = ctk.CTkEntry(log_filter_frame, width=140, font=("Arial", 12))
+log_serial_entry.grid(row=0, column=1, padx=(0, 10))
+ctk.CTkLabel(log_filter_frame, text="From:", font=("Arial", 12)).grid(row=0, column=2, padx=(0, 5))
+log_from_entry = ctk.CTkEntry(log_filter_frame, width=100, placeholder_text="YYYY-MM-DD", font=("Arial", 12))
+log_from_entry.grid(row=0, column=3, padx=(0, 10))
+ctk.CTkLabel(log_filter_frame, text="To:", font=("Arial", 12)).grid(row=0, column=4, padx=(0, 5))
+log_to_entry = ctk.CTkEntry(log_filter_frame, width=100, placeholder_text="YYYY-MM-DD", font=("Arial", 12))
+log_to_entry.grid(row=0, column=5, padx=(0, 10))
+log_algo_combo = ctk.CTkComboBox(log_filter_frame, values=[ALL_FILTER] + patterns.ALGORITHMS + list(erase.FAST_STRATEGIES), width=170, font=("Arial", 12))
+log_algo_combo.set(ALL_FILTER)
+log_algo_combo.grid(row=0, column=6, padx=(0, 10))
+log_result_combo = ctk.CTkComboBox(log_filter_frame, values=[ALL_FILTER] + list(logstore.RESULTS), width=90, font=("Arial", 12))
+log_result_combo.set(ALL_FILTER)
+log_result_combo.grid(row=0, column=7, padx=(0, 10))
+ctk.CTkButton(log_filter_frame, text="Search", command=search_logs, width=80).grid(row=0, column=8)
+for entry in (log_serial_entry, log_from_entry, log_to_entry):
+    entry.bind("<Return>", search_logs)
+
+# Result list: one page of rows
+log_list_frame = ctk.CTkFrame(tab_log, fg_color="transparent")
+log_list_frame.grid(row=1, column=0, sticky="nsew", padx=20, pady=5)
+log_list_frame.grid_rowconfigure(0, weight=1)
+log_list_frame.grid_columnconfigure(0, weight=1)
+log_listbox = tk.Listbox(log_list_frame, font=("Consolas", 12), bg="#1d1e1e", fg="#dce4ee",
+                         selectbackground="#1f6aa5", highlightthickness=0, borderwidth=0,
+                         activestyle="none", exportselection=False, height=10)
+log_listbox.grid(row=0, column=0, sticky="nsew")
+log_scrollbar = ctk.CTkScrollbar(log_list_frame, command=log_listbox.yview)
+log_scrollbar.grid(row=0, column=1, sticky="ns")
+log_listbox.configure(yscrollcommand=log_scrollbar.set)
+log_listbox.bind("<<ListboxSelect>>", on_log_select)
+
+# Paging
+log_pager_frame = ctk.CTkFrame(tab_log, fg_color="transparent")
+log_pager_frame.grid(row=2, column=0, sticky="ew", padx=20)
+log_prev_btn = ctk.CTkButton(log_pager_frame, text="< Previous", command=show_previous_logs, width=100)
+log_prev_btn.grid(row=0, column=0)
+log_page_label = ctk.CTkLabel(log_pager_frame, text="", font=("Arial", 12))
+log_page_label.grid(row=0, column=1, padx=15)
+log_next_btn = ctk.CTkButton(log_pager_frame, text="Next >", command=show_next_logs, width=100)
+log_next_btn.grid(row=0, column=2)
+refresh_logs_btn = ctk.CTkButton(log_pager_frame, text="Refresh Logs", command=populate_log_files_list, width=120)
+refresh_logs_btn.grid(row=0, column=3, padx=(15, 0))
+
+log_display = ctk.CTkTextbox(tab_log, width=820, height=300, font=("Consolas", 12))
+log_display.grid(row=3, column=0, sticky="nsew", padx=20, pady=15)
+log_display.insert("end", "Logs will appear here after the wipe operation.")
+log_display.configure(state="disabled")
 
-    log_file_paths = get_log_files()
-    file_names_for_menu = [os.path.basename(f) for f in log_file_paths] or ["No log files found"]
-    
-    log_optionmenu.configure(values=file_names_for_menu)
+# Refresh when a wipe adds a log instead of polling: store callbacks come
+# from worker threads, so they are handed to the Tk loop, and a hidden Log
+# Viewer is only marked stale and reloaded when it is opened
+LOG_TAB = "📄 Log Viewer"
+logs_stale = False
 
-    if current_selection_name and current_selection_name in file_names_for_menu:
-        log_optionmenu.set(current_selection_name)
-    elif file_names_for_menu[0] != "No log files found":
-        log_optionmenu.set(file_names_for_menu[0])
+def on_logs_added():
+    global logs_stale
+    if tabs.get() == LOG_TAB:
+        populate_log_files_list()
     else:
-        log_optionmenu.set("No log files found")
-
-def on_log_option_change(choice):
-    load_selected_log(choice)
+        logs_stale = True
 
-log_optionmenu = ctk.CTkOptionMenu(tab_log, values=["No log files found"], command=on_log_option_change, width=300, font=("Arial", 13))
-log_optionmenu.grid(row=0, column=0, sticky="ew", padx=(20, 5), pady=(20, 0))
+def on_tab_change():
+    global logs_stale
+    if tabs.get() == LOG_TAB and logs_stale:
+        logs_stale = False
+        populate_log_files_list()
 
-refresh_logs_btn = ctk.CTkButton(tab_log, text="Refresh Logs", command=populate_log_files_list, width=120)
-refresh_logs_btn.grid(row=0, column=1, sticky="ew", padx=(5,20), pady=(20,0))
-
-log_display = ctk.CTkTextbox(tab_log, width=820, height=400, font=("Consolas", 12))
-log_display.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=20, pady=15)
-log_display.insert("end", "Logs will appear here after the wipe operation.")
-log_display.configure(state="disabled")
-
-def poll_tab_change():
-    try:
-        if tabs.get() == "📄 Log Viewer":
-            populate_log_files_list()
-    except Exception:
-        pass
-    app.after(1000, poll_tab_change)
+logstore.subscribe(lambda path: app.after(0, on_logs_added))
+tabs.configure(command=on_tab_change)
 
 populate_log_files_list()
-poll_tab_change()
+poll_drives()
 
 # About Tab
 try: